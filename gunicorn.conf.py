@@ -0,0 +1,50 @@
+import os
+import gc
+import glob
+
+# Configuración de producción del servidor Dash (la lee gunicorn desde la raíz del proyecto).
+# Uso: gunicorn --chdir scripts Visual_UOA:server
+# Prueba de carga: python scripts/UOA_load_test.py --url http://127.0.0.1:8000
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# Varios workers: un callback lento ya no bloquea a los demás usuarios
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+threads = int(os.getenv("UOA_WORKER_THREADS", "2"))
+timeout = 120
+
+# El dataset se carga una sola vez en el proceso maestro (al importar Visual_UOA) y
+# los workers lo comparten con copy-on-write en lugar de parsearlo cada uno.
+# Con UOA_FAST_START=1 el maestro solo importa la aplicación y abre el puerto enseguida;
+# cada worker carga el dataset en segundo plano desde el cache binario (data/UOAcache)
+preload_app = True
+
+# Métricas de todos los workers: cada proceso escribe las suyas en esta carpeta y /metrics
+# devuelve la suma (modo multiproceso de prometheus_client). Se define aquí porque la
+# variable tiene que existir antes de que el maestro importe la aplicación; los archivos
+# de una ejecución anterior se borran para no sumarlos a los nuevos.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR",
+                      os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "UOAmetrics"))
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+for metrics_file in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+    os.remove(metrics_file)
+
+
+def pre_fork(server, worker):
+    # Los objetos ya cargados pasan a la generación permanente: el recolector de basura
+    # no los recorre en los workers y sus páginas de memoria no se copian
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Los hilos no sobreviven al fork: cada worker inicia su propia recarga en caliente
+    # (y con UOA_FAST_START, su carga inicial)
+    import Visual_UOA
+    from UOA_dataset import start_watcher
+    start_watcher(Visual_UOA.file_path, initial_load=Visual_UOA.FAST_START)
+
+
+def child_exit(server, worker):
+    # Los valores propios de un worker que terminó (p. ej. bytes del cache) dejan de contar en /metrics
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
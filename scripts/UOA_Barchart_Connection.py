@@ -1,8 +1,12 @@
 import os
+import json
 import time
+import queue
+import threading
 import random
 from datetime import datetime
-import pandas as pd
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -13,6 +17,10 @@ from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 import platform
+from UOA_snapshot_store import SnapshotWriter
+from UOA_ingest import ingest_csv, new_counters, format_counters, CsvSink
+from UOA_download_waiter import DownloadWaiter
+from UOA_http_fetcher import load_cookies, save_cookies, create_http_session, fetch_datasets
 
 # Directorio raíz del proyecto
 project_root = os.path.abspath(os.path.dirname(__file__))
@@ -30,6 +38,28 @@ data_folder = os.path.join(project_root, "..", "data")
 download_folder = os.path.join(data_folder, "downloads")
 uoa_folder = os.path.join(data_folder, "UOAdataToVisualize")
 
+# URL base de Barchart (se puede apuntar a un servidor local de pruebas)
+base_url = os.getenv("BARCHART_BASE_URL", "https://www.barchart.com").rstrip("/")
+
+# Número de sesiones de navegador que descargan en paralelo
+download_sessions = int(os.getenv("UOA_DOWNLOAD_SESSIONS", "3"))
+
+# Backend de descarga: "http" (sesión HTTP con las cookies del login, Selenium como respaldo) o "selenium"
+fetch_backend = os.getenv("UOA_FETCH_BACKEND", "http")
+
+# Escribir también el CSV plano UOA_<timestamp>.csv: el dashboard en modo CSV (la configuración por
+# defecto) solo ve los snapshots nuevos por este archivo. UOA_WRITE_CSV=0 deja solo el store
+write_csv = os.getenv("UOA_WRITE_CSV", "1") == "1"
+
+# Desglose de tiempos de espera por descarga (también en download_metrics.jsonl)
+download_metrics = {}
+metrics_file = os.path.join(download_folder, "download_metrics.jsonl")
+metrics_lock = threading.Lock()
+
+# Cookies del login de Selenium reutilizadas por el backend HTTP
+cookies_file = os.path.join(download_folder, "barchart_cookies.json")
+http_folder = os.path.join(download_folder, "http")
+
 # Crear directorios si no existen
 os.makedirs(download_folder, exist_ok=True)
 os.makedirs(uoa_folder, exist_ok=True)
@@ -47,20 +77,26 @@ user_agents = [
 random_user_agent = random.choice(user_agents)
 
 # Configura las opciones de Chrome
-chrome_options = Options()
-chrome_options.add_argument(f"user-agent={random_user_agent}")
-chrome_options.add_argument('--disable-gpu')
-chrome_options.add_argument('--no-sandbox')
-chrome_options.add_argument("--disable-software-rasterizer")
-chrome_options.add_argument('--ignore-certificate-errors')
-chrome_options.add_argument('--ignore-ssl-errors=yes')
-chrome_options.add_argument('--disable-dev-shm-usage')
-chrome_options.add_experimental_option("prefs", {
-    "download.default_directory": os.path.abspath(download_folder),
-    "download.prompt_for_download": False,
-    "download.directory_upgrade": True,
-    "safebrowsing.enabled": True
-})
+def build_chrome_options(target_folder):
+    """Opciones de Chrome que descargan en la carpeta indicada."""
+    options = Options()
+    options.add_argument(f"user-agent={random_user_agent}")
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument("--disable-software-rasterizer")
+    options.add_argument('--ignore-certificate-errors')
+    options.add_argument('--ignore-ssl-errors=yes')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_experimental_option("prefs", {
+        "download.default_directory": os.path.abspath(target_folder),
+        "download.prompt_for_download": False,
+        "download.directory_upgrade": True,
+        "safebrowsing.enabled": True
+    })
+    return options
+
+
+chrome_options = build_chrome_options(download_folder)
 
 
 # Función para cerrar anuncios y banners
@@ -76,7 +112,7 @@ def close_ads(driver):
 
 # Función para realizar el login en Barchart
 def login_to_barchart(driver):
-    login_url = "https://www.barchart.com/login"
+    login_url = f"{base_url}/login"
     driver.get(login_url)
 
     try:
@@ -87,7 +123,7 @@ def login_to_barchart(driver):
         driver.find_element(By.XPATH, "//input[@placeholder='Login with email']").send_keys(username)
         driver.find_element(By.XPATH, "//input[@placeholder='Password']").send_keys(password)
         driver.find_element(By.XPATH, "//button[contains(text(), 'Log In')]").click()
-        WebDriverWait(driver, 15).until(EC.url_contains("barchart.com"))
+        WebDriverWait(driver, 15).until(EC.url_contains(urlparse(base_url).netloc))
         print("Inicio de sesión exitoso en Barchart.")
     except TimeoutException as login_error:
         print(f"Error: No se pudo completar el inicio de sesión en Barchart: {login_error}")
@@ -95,81 +131,204 @@ def login_to_barchart(driver):
         raise
 
 
+# Función para registrar los tiempos de espera de cada descarga
+def record_download_metrics(temp_filename, metrics):
+    """Guarda el desglose de tiempos de una descarga en memoria y en download_metrics.jsonl."""
+    download_metrics[temp_filename] = metrics
+    with metrics_lock, open(metrics_file, 'a') as file:
+        file.write(json.dumps({"dataset": temp_filename, "time": datetime.now().isoformat(timespec='seconds'), **metrics}) + "\n")
+    print(f"Tiempos de {temp_filename}: " + ", ".join(f"{name} {seconds:.2f} s" for name, seconds in metrics.items()))
+
+
 # Función para descargar datos
-def download_data(web_driver, target_url, temp_filename):
+def download_data(web_driver, target_url, temp_filename, target_folder=download_folder):
+    metrics = {}
+    start = time.perf_counter()
     web_driver.get(target_url)
-    time.sleep(5)
 
     try:
+        # Esperar a que la página termine de cargar en lugar de una pausa fija
+        WebDriverWait(web_driver, 15).until(
+            lambda driver: driver.execute_script("return document.readyState") == "complete"
+        )
+        metrics["page_load"] = time.perf_counter() - start
+
+        step_start = time.perf_counter()
         download_button = WebDriverWait(web_driver, 15).until(
             EC.visibility_of_element_located((By.XPATH, "//a[contains(@class, 'download')]"))
         )
-        web_driver.execute_script("arguments[0].click();", download_button)
-        print(f"Descargando datos para {temp_filename}.")
-
-        timeout = 30
-        while timeout > 0:
-            downloaded_files = [f for f in os.listdir(download_folder) if isinstance(f, str) and f.endswith('.csv')]
-            if downloaded_files:
-                latest_file = max([os.path.join(download_folder, f) for f in downloaded_files],
-                                  key=os.path.getctime)
-                if latest_file.endswith('.csv') and not latest_file.endswith('.crdownload'):
-                    final_path = os.path.join(download_folder, temp_filename)
-                    os.replace(latest_file, final_path)
-                    print(f"{temp_filename} descargado y renombrado exitosamente.")
-                    return final_path
-            time.sleep(1)
-            timeout -= 1
+        metrics["button_wait"] = time.perf_counter() - step_start
+
+        # La espera se arma antes del clic para no perder el evento del archivo terminado
+        step_start = time.perf_counter()
+        with DownloadWaiter(target_folder) as waiter:
+            web_driver.execute_script("arguments[0].click();", download_button)
+            print(f"Descargando datos para {temp_filename}.")
+            latest_file = waiter.wait(timeout=30)
+        metrics["download_wait"] = time.perf_counter() - step_start
+
+        if latest_file:
+            final_path = os.path.join(target_folder, temp_filename)
+            os.replace(latest_file, final_path)
+            print(f"{temp_filename} descargado y renombrado exitosamente.")
+            return final_path
+        print(f"La descarga de {temp_filename} no terminó en 30 s.")
     except TimeoutException as download_error:
         print(f"No se pudo descargar los datos para {temp_filename}: {download_error}")
+    finally:
+        metrics["total"] = time.perf_counter() - start
+        record_download_metrics(temp_filename, metrics)
 
     return None
 
 
-def clean_data(input_file_path):
-    with open(input_file_path, 'r') as file:
-        lines = file.readlines()
-    cleaned_lines = [line for line in lines if "Downloaded from Barchart.com" not in line]
-    with open(input_file_path, 'w') as file:
-        file.writelines(cleaned_lines)
-
-
 # URLs para descarga
 urls = {
-    "Stocks": "https://www.barchart.com/options/unusual-activity/stocks",
-    "ETFs": "https://www.barchart.com/options/unusual-activity/etfs",
-    "Indices": "https://www.barchart.com/options/unusual-activity/indices"
+    "Stocks": f"{base_url}/options/unusual-activity/stocks",
+    "ETFs": f"{base_url}/options/unusual-activity/etfs",
+    "Indices": f"{base_url}/options/unusual-activity/indices"
 }
 
+
+# Función para abrir una sesión del pool
+def start_session(driver_path, session_id):
+    """Abre un navegador con su propia carpeta de descargas e inicia sesión en Barchart."""
+    session_folder = os.path.join(download_folder, f"session_{session_id}")
+    os.makedirs(session_folder, exist_ok=True)
+    driver = webdriver.Chrome(service=Service(driver_path), options=build_chrome_options(session_folder))
+    login_to_barchart(driver)
+    return driver, session_folder
+
+
+# Función para descargar varios datasets en paralelo
+def download_datasets(datasets, sessions=download_sessions):
+    """Descarga los datasets con un pool de sesiones y devuelve (rutas, tiempos en segundos).
+
+    Cada sesión tiene su propia carpeta de descargas, así la búsqueda del último .csv
+    en download_data nunca toma el archivo de otro dataset.
+    """
+    sessions = max(1, min(sessions, len(datasets)))
+    driver_path = ChromeDriverManager().install()
+    available_sessions = queue.Queue()
+    drivers = []
+    dataset_paths = {}
+    timings = {}
+
+    def download_with_pool(dataset_name, dataset_url):
+        driver, session_folder = available_sessions.get()
+        try:
+            start = time.perf_counter()
+            dataset_path = download_data(driver, dataset_url, f"{dataset_name}.csv", session_folder)
+            return dataset_name, dataset_path, time.perf_counter() - start
+        finally:
+            available_sessions.put((driver, session_folder))
+
+    try:
+        with ThreadPoolExecutor(max_workers=sessions) as executor:
+            start = time.perf_counter()
+            session_futures = [executor.submit(start_session, driver_path, session_id) for session_id in range(sessions)]
+            for session_future in session_futures:
+                try:
+                    driver, session_folder = session_future.result()
+                except Exception as session_error:
+                    print(f"No se pudo abrir una sesión: {session_error}")
+                    continue
+                drivers.append(driver)
+                available_sessions.put((driver, session_folder))
+            timings["login"] = time.perf_counter() - start
+            if not drivers:
+                raise RuntimeError("No se pudo abrir ninguna sesión de Barchart.")
+            print(f"{len(drivers)} sesiones listas en {timings['login']:.1f} s.")
+
+            download_futures = [executor.submit(download_with_pool, name, url) for name, url in datasets.items()]
+            for download_future in download_futures:
+                dataset_name, dataset_path, seconds = download_future.result()
+                dataset_paths[dataset_name] = dataset_path
+                timings[dataset_name] = seconds
+                print(f"{dataset_name}: descarga en {seconds:.1f} s.")
+    finally:
+        for driver in drivers:
+            driver.quit()
+
+    return dataset_paths, timings
+
+
+# Función para capturar las cookies de una sesión autenticada
+def capture_session_cookies():
+    """Inicia sesión una vez con Selenium y devuelve las cookies del navegador."""
+    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+    login_to_barchart(driver)
+    try:
+        return driver.get_cookies()
+    finally:
+        driver.quit()
+
+
+# Función para descargar por HTTP sin navegador
+def fetch_with_http(datasets):
+    """Descarga los datasets con una sesión HTTP autenticada; devuelve (rutas, tiempos)."""
+    cookies = load_cookies(cookies_file)
+    if not cookies:
+        print("No hay cookies guardadas: iniciando sesión con Selenium para capturarlas.")
+        cookies = capture_session_cookies()
+        save_cookies(cookies, cookies_file)
+
+    session = create_http_session(cookies, random_user_agent, pool_size=len(datasets))
+    try:
+        dataset_paths, timings, session_expired = fetch_datasets(session, datasets, http_folder)
+    finally:
+        session.close()
+    if session_expired:
+        # En la próxima ejecución se vuelve a capturar la sesión
+        os.remove(cookies_file)
+        print("Las cookies guardadas expiraron y fueron descartadas.")
+    return dataset_paths, timings
+
+
 def main():
     print(f"Iniciando proceso de descarga en {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
-    data_frames = []
+    start = time.perf_counter()
 
     try:
-        main_driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
-        login_to_barchart(main_driver)
-
-        for dataset_name, dataset_url in urls.items():
-            temp_file = f"{dataset_name}.csv"
-            dataset_path = download_data(main_driver, dataset_url, temp_file)
-            if dataset_path and os.path.isfile(dataset_path):
-                clean_data(dataset_path)
-                df = pd.read_csv(dataset_path)
-                data_frames.append(df)
-                os.remove(dataset_path)
-                print(f"{dataset_name}: {len(df)} filas añadidas.")
-
-        if data_frames:
-            final_data = pd.concat(data_frames, ignore_index=True)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_file = os.path.join(uoa_folder, f"UOA_{timestamp}.csv")
-            final_data.to_csv(output_file, index=False)
-            print(f"Datos consolidados y guardados en {output_file} con un total de {len(final_data)} filas.")
+        dataset_paths, timings = {}, {}
+        if fetch_backend == "http":
+            try:
+                dataset_paths, timings = fetch_with_http(urls)
+            except Exception as http_error:
+                print(f"Error en la descarga HTTP: {http_error}")
+
+        # Selenium como respaldo para lo que no se pudo descargar por HTTP
+        pending = {name: url for name, url in urls.items() if not dataset_paths.get(name)}
+        if pending:
+            selenium_paths, selenium_timings = download_datasets(pending)
+            dataset_paths.update(selenium_paths)
+            timings.update(selenium_timings)
+
+        downloaded = {name: path for name, path in dataset_paths.items() if path and os.path.isfile(path)}
+        if downloaded:
+            # Ingesta en streaming: cada descarga se filtra y parsea por chunks directo al snapshot
+            snapshot_time = datetime.now()
+            counters = new_counters()
+            with SnapshotWriter(snapshot_time) as writer:
+                sinks = [writer]
+                if write_csv:
+                    timestamp = snapshot_time.strftime('%Y%m%d_%H%M%S')
+                    sinks.append(CsvSink(os.path.join(uoa_folder, f"UOA_{timestamp}.csv")))
+                for dataset_name, dataset_path in downloaded.items():
+                    rows_before = counters['rows']
+                    ingest_csv(dataset_path, sinks, counters=counters)
+                    os.remove(dataset_path)
+                    print(f"{dataset_name}: {counters['rows'] - rows_before} filas añadidas.")
+            print(f"Datos consolidados y guardados en {writer.output_file} con un total de {writer.rows} filas.")
+            if write_csv:
+                print(f"Copia CSV guardada en {sinks[-1].output_file}.")
+            print(f"Ingesta: {format_counters(counters)}.")
         else:
             print("No se encontraron datos para consolidar.")
 
-        main_driver.quit()
+        print(f"Tiempos por dataset: {', '.join(f'{name} {seconds:.1f} s' for name, seconds in timings.items())}; "
+              f"total {time.perf_counter() - start:.1f} s.")
     except Exception as general_error:
         print(f"Error durante el proceso: {general_error}")
 
@@ -0,0 +1,88 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from UOA_fill_side import add_fill_side
+from UOA_data_index import SortedFrameIndex
+from UOA_analytics import add_analytics_columns
+from UOA_metrics import logger
+
+# Claves del cubo de Premium (una fila por combinación)
+CUBE_KEYS = ['Symbol', 'Type', 'Year', 'Qtr', 'Month', 'Month_Sort', 'Day', 'Strike', 'Color']
+
+# Claves de los gráficos que consumen el cubo
+GRAPH2_KEYS = ['Type', 'Year', 'Qtr', 'Month', 'Month_Sort']
+GRAPH2_SORT = ['Year', 'Qtr', 'Month_Sort', 'Type']
+PARETO_KEYS = ['Day', 'Strike', 'Color']
+
+# Orden del cubo: un prefijo (Symbol, Type, Year, Month_Sort) deja las filas ya ordenadas por PARETO_KEYS
+CUBE_INDEX_KEYS = ['Symbol', 'Type', 'Year', 'Month_Sort'] + PARETO_KEYS
+
+
+def add_derived_columns(data):
+    """Materializa una sola vez Premium, Side/Color, las columnas derivadas de Exp Date y las métricas por contrato."""
+    exp_date = pd.to_datetime(data['Exp Date'], errors='coerce')
+    data['Exp Date'] = exp_date
+    data['Year'] = exp_date.dt.year.astype('Int64')
+    data['Month'] = exp_date.dt.strftime('%b')
+    data['Month_Sort'] = exp_date.dt.month.astype('Int64')
+    data['Qtr'] = "Q" + ((data['Month_Sort'] - 1) // 3 + 1).astype(str)
+    data['Day'] = exp_date.dt.day.astype('Int64')
+    # Volume es Int32 (con faltantes): Premium queda en float64 plano, no en Float64 con máscara
+    data['Premium'] = (data['Last'] * 100) * data['Volume'].astype('float64')
+    # Lado del fill (categórico) clasificado de forma vectorizada
+    data = add_fill_side(data)
+    # Notional, Delta Premium, Moneyness, Unusual Score, etc. (UOA_analytics)
+    data = add_analytics_columns(data)
+    return data
+
+
+def month_number(month_abbr):
+    """Número de mes (1-12) de una abreviatura '%b' como 'Dec' (None si no es válida)."""
+    try:
+        return datetime.strptime(month_abbr, '%b').month
+    except ValueError:
+        return None
+
+
+def split_top_n(data, n, column='Premium'):
+    """Las n filas con mayor column (ordenadas de mayor a menor) y el resto, sin ordenar.
+
+    Usa selección parcial (argpartition, O(len)) y solo ordena las n elegidas.
+    """
+    if n >= len(data):
+        return data.sort_values(by=column, ascending=False, kind='stable'), data.iloc[0:0]
+    values = data[column].to_numpy(dtype='float64')
+    top = np.argpartition(-values, n - 1)[:n] if n > 0 else np.array([], dtype=int)
+    top = top[np.argsort(-values[top], kind='stable')]
+    rest = np.ones(len(data), dtype=bool)
+    rest[top] = False
+    return data.iloc[top], data.iloc[rest]
+
+
+def build_premium_cube(data):
+    """Precalcula las sumas de Premium indexadas para los Gráficos 2, 3 y 4.
+
+    Devuelve un diccionario con:
+      - 'cube': suma de Premium por CUBE_KEYS, indexada por (Symbol, Type, Year, Month_Sort);
+        un slice por (Symbol, Type, Year, Month_Sort) ya es el dato de los Gráficos 3 y 4.
+      - 'graph2': suma de Premium por Symbol y GRAPH2_KEYS (con x_label), indexada por Symbol.
+    """
+    cube = data.groupby(CUBE_KEYS, as_index=False, observed=True).agg({'Premium': 'sum'})
+
+    graph2 = cube.groupby(['Symbol'] + GRAPH2_KEYS, as_index=False, observed=True).agg({'Premium': 'sum'})
+    # Etiquetas jerárquicas para el eje X del Gráfico 2
+    graph2['x_label'] = graph2['Month'] + " (" + graph2['Year'].astype(str) + ")"
+
+    premium_cube = {
+        'cube': SortedFrameIndex(cube, CUBE_INDEX_KEYS),
+        'graph2': SortedFrameIndex(graph2, ['Symbol'] + GRAPH2_SORT),
+    }
+    logger.debug(f"Cubo de Premium: {len(cube)} celdas, {len(premium_cube['graph2'].values())} symbols.")
+    return premium_cube
+
+
+def empty_premium_cube():
+    """Cubo vacío para cuando no se pudieron cargar los datos."""
+    columns = {key: pd.Series(dtype=object) for key in CUBE_KEYS}
+    columns['Premium'] = pd.Series(dtype=float)
+    return build_premium_cube(pd.DataFrame(columns))
@@ -0,0 +1,87 @@
+import os
+import numpy as np
+import pandas as pd
+from UOA_fill_side import ABOVE_ASK, BELOW_BID
+
+# Columnas de Barchart que el dataset conserva para las métricas por contrato (IV y DTE se usan tal cual)
+ANALYTICS_INPUTS = ['Price~', 'DTE', 'Open Int', 'Vol/OI', 'IV', 'Delta']
+
+# Columnas que agrega add_analytics_columns
+ANALYTICS_COLUMNS = ['Notional', 'Delta Premium', 'Delta Notional', 'Moneyness', 'OTM Pct',
+                     'Unusual Score', 'Aggressive Opening']
+
+# Vol/OI mínimo para marcar un fill agresivo como apertura (volumen mayor al interés abierto)
+OPENING_VOL_OI = float(os.getenv("UOA_OPENING_VOL_OI", "1.0"))
+
+
+def column_values(data, column):
+    """Valores de column como float64 (NaN si el origen no trae la columna)."""
+    if column not in data.columns:
+        return np.full(len(data), np.nan)
+    return pd.to_numeric(data[column], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+
+def group_zscore(values, codes, group_count):
+    """Puntaje z de values dentro de cada grupo (codes de 0 a group_count - 1), con bincount.
+
+    Los NaN no cuentan para la media ni el desvío y quedan en NaN; un grupo sin
+    dispersión da 0.
+    """
+    valid = ~np.isnan(values) & (codes >= 0)
+    safe_codes = np.where(valid, codes, 0)
+    weights = valid.astype('float64')
+    filled = np.where(valid, values, 0.0)
+    counts = np.bincount(safe_codes, weights=weights, minlength=group_count)
+    sums = np.bincount(safe_codes, weights=filled, minlength=group_count)
+    squares = np.bincount(safe_codes, weights=filled * filled, minlength=group_count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = sums / counts
+        stds = np.sqrt(np.maximum(squares / counts - means * means, 0.0))
+        scores = (values - means[safe_codes]) / stds[safe_codes]
+    scores[stds[safe_codes] == 0] = 0.0
+    scores[~valid] = np.nan
+    return scores
+
+
+def add_analytics_columns(data):
+    """Métricas por contrato calculadas una sola vez y guardadas como columnas.
+
+    - Notional: Price~ x 100 x Volume (valor del subyacente que controlan los contratos)
+    - Delta Premium / Delta Notional: Premium y Notional ponderados por Delta (con signo)
+    - Moneyness: Strike / Price~; OTM Pct: distancia fuera del dinero (negativa si está ITM)
+    - Unusual Score: puntaje z de log(1 + Vol/OI) entre los contratos del mismo Symbol
+    - Aggressive Opening: fill por fuera del spread con Volume > Open Int (aproxima un sweep
+      de apertura; el snapshot no trae los prints individuales)
+    Requiere Premium y Side (add_derived_columns). IV ya llega como fracción desde el esquema.
+    """
+    price = column_values(data, 'Price~')
+    strike = column_values(data, 'Strike')
+    volume = column_values(data, 'Volume')
+    delta = column_values(data, 'Delta')
+    premium = data['Premium'].to_numpy(dtype='float64', na_value=np.nan)
+    is_call = (data['Type'] == 'Call').to_numpy()
+
+    notional = price * 100 * volume
+    data['Notional'] = notional
+    data['Delta Premium'] = premium * delta
+    data['Delta Notional'] = notional * delta
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        moneyness = np.where(price > 0, strike / price, np.nan)
+    data['Moneyness'] = moneyness.astype('float32')
+    data['OTM Pct'] = np.where(is_call, moneyness - 1, 1 - moneyness).astype('float32')
+
+    # Vol/OI exacto cuando hay Open Int; si no, el que publica Barchart
+    open_interest = column_values(data, 'Open Int')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vol_oi = np.where(open_interest > 0, volume / open_interest, column_values(data, 'Vol/OI'))
+    symbols = data['Symbol'].astype('category').cat
+    data['Unusual Score'] = group_zscore(np.log1p(vol_oi), symbols.codes.to_numpy(),
+                                         len(symbols.categories)).astype('float32')
+
+    if 'Side' in data.columns:
+        aggressive = data['Side'].isin([ABOVE_ASK, BELOW_BID]).to_numpy()
+    else:
+        aggressive = np.zeros(len(data), dtype=bool)
+    data['Aggressive Opening'] = aggressive & (vol_oi > OPENING_VOL_OI)
+    return data
@@ -0,0 +1,246 @@
+import io
+import os
+import json
+import time
+import argparse
+import platform
+import contextlib
+import subprocess
+import tracemalloc
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+# Benchmark de carga, agregados y callbacks sobre datos sintéticos con el esquema de Barchart.
+# Uso: python UOA_benchmark.py [--sizes 10k,1m,10m] [--repeat 3]
+#      python UOA_benchmark.py --compare resultados_antes.json resultados_despues.json
+# Los resultados quedan en data/benchmarks/benchmark_<commit>_<timestamp>.json.
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BENCHMARK_FOLDER = os.path.join(BASE_DIR, "data", "benchmarks")
+
+# Symbols reales al frente de la distribución (los más consultados), luego tickers sintéticos
+POPULAR_SYMBOLS = ['SPY', 'QQQ', 'NVDA', 'TSLA', '$SPX', 'AAPL', 'IWM', 'AMZN', 'META', 'AMD', 'MSFT', 'PLTR']
+
+# Exponente de la ley de Zipf para la frecuencia de cada Symbol (1 = muy sesgado)
+ZIPF_EXPONENT = 1.1
+
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+
+def synthetic_symbols(count, rng):
+    """count tickers: los populares y luego combinaciones de 3-4 letras."""
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    symbols = list(POPULAR_SYMBOLS[:count])
+    seen = set(symbols)
+    while len(symbols) < count:
+        symbol = "".join(rng.choice(letters, size=rng.integers(3, 5)))
+        if symbol not in seen:
+            seen.add(symbol)
+            symbols.append(symbol)
+    return np.array(symbols)
+
+
+def make_synthetic_uoa(rows, seed=0, as_of=datetime(2024, 12, 20)):
+    """DataFrame crudo con las columnas y formatos de un CSV de Barchart (IV en %, fechas en texto)."""
+    rng = np.random.default_rng(seed)
+    symbol_count = int(min(5000, max(50, rows // 20)))
+    symbols = synthetic_symbols(symbol_count, rng)
+    weights = 1.0 / np.arange(1, symbol_count + 1) ** ZIPF_EXPONENT
+    symbol_codes = rng.choice(symbol_count, size=rows, p=weights / weights.sum())
+
+    # Precio por Symbol y vencimientos (viernes) concentrados en las próximas semanas
+    prices = np.round(rng.lognormal(4.0, 1.0, symbol_count), 2)
+    price = prices[symbol_codes]
+    fridays = np.array([as_of + timedelta(days=(4 - as_of.weekday()) % 7 + 7 * week) for week in range(104)])
+    expiry_weights = 1.0 / np.arange(1, len(fridays) + 1)
+    expiry_codes = rng.choice(len(fridays), size=rows, p=expiry_weights / expiry_weights.sum())
+    exp_dates = fridays[expiry_codes]
+    dte = np.array([(expiry - as_of).days for expiry in fridays])[expiry_codes]
+
+    option_type = np.where(rng.random(rows) < 0.55, 'Call', 'Put')
+    strike = np.round(price * rng.uniform(0.7, 1.3, rows) * 2) / 2
+    bid = np.round(rng.gamma(1.5, 2.0, rows), 2)
+    ask = np.round(bid + rng.uniform(0.01, 0.5, rows), 2)
+    last = np.round(bid + (ask - bid) * rng.uniform(-0.2, 1.2, rows), 2).clip(0.01)
+    volume = rng.pareto(1.5, rows).astype(np.int64) * 100 + rng.integers(100, 1000, rows)
+    open_interest = rng.integers(1, 50_000, rows)
+    delta = np.round(np.where(option_type == 'Call', 1, -1) * rng.uniform(0.01, 0.99, rows), 6)
+
+    return pd.DataFrame({
+        'Symbol': symbols[symbol_codes],
+        'Price~': price,
+        'Type': option_type,
+        'Strike': strike,
+        'Exp Date': pd.DatetimeIndex(exp_dates).strftime('%Y-%m-%d'),
+        'DTE': dte,
+        'Bid': bid,
+        'Mid': np.round((bid + ask) / 2, 2),
+        'Ask': ask,
+        'Last': last,
+        'Volume': volume,
+        'Open Int': open_interest,
+        'Vol/OI': np.round(volume / open_interest, 2),
+        'IV': pd.Series(rng.uniform(10, 150, rows)).map('{:.2f}%'.format).to_numpy(),
+        'Delta': delta,
+        'Time': as_of.strftime('%Y-%m-%d'),
+    })
+
+
+def synthetic_csv(rows, seed=0, folder=BENCHMARK_FOLDER):
+    """Ruta del CSV sintético de rows filas (se genera una sola vez y se reutiliza)."""
+    os.makedirs(folder, exist_ok=True)
+    file_path = os.path.join(folder, f"synthetic_{rows}_{seed}.csv")
+    if not os.path.exists(file_path):
+        print(f"Generando {rows} filas sintéticas en {file_path}...")
+        make_synthetic_uoa(rows, seed).to_csv(file_path, index=False)
+    return file_path
+
+
+def measure(function, repeat=3):
+    """Tiempos de function() (mínimo y mediana) y pico de memoria de una ejecución con tracemalloc."""
+    seconds = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = function()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            function()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {
+        'seconds_min': min(seconds),
+        'seconds_median': float(np.median(seconds)),
+        'peak_mb': peak_bytes / 1e6,
+    }
+
+
+def callback_targets(dataset, count=3):
+    """Symbols con más filas y, para cada uno, el primer 'Mes (Año)' del Gráfico 2."""
+    graph2 = dataset.premium_cube['graph2']
+    symbols = dataset.data['Symbol'].value_counts().index[:count]
+    targets = []
+    for symbol in symbols:
+        labels = graph2.slice(symbol)['x_label']
+        if len(labels):
+            targets.append((str(symbol), labels.iloc[0]))
+    return targets
+
+
+def benchmark_size(label, rows, repeat=3, seed=0):
+    """Mide cada etapa para un tamaño; devuelve una lista de resultados."""
+    from UOA_schema import load_uoa_csv
+    from UOA_aggregates import add_derived_columns
+    from UOA_analytics import add_analytics_columns
+    from UOA_dataset import UOADataset, build_graph1_data, set_dataset, source_version, MODE_SNAPSHOT
+    import Visual_UOA
+
+    file_path = synthetic_csv(rows, seed)
+    results = []
+
+    def record(stage, function, stage_repeat=repeat):
+        result, metrics = measure(function, stage_repeat)
+        results.append({'size': label, 'rows': rows, 'stage': stage, **metrics})
+        print(f"{label:>4} {stage:<24} {metrics['seconds_min'] * 1000:>10.1f} ms  pico {metrics['peak_mb']:>9.1f} MB")
+        return result
+
+    raw = record('csv_load', lambda: load_uoa_csv(file_path))
+    record('premium', lambda: (raw['Last'] * 100) * raw['Volume'])
+    data = record('derived_columns', lambda: add_derived_columns(raw.copy()))
+    record('analytics', lambda: add_analytics_columns(data.copy()))
+    record('graph1_groupby', lambda: build_graph1_data(data))
+    dataset = record('dataset_build', lambda: UOADataset(data, source_version(MODE_SNAPSHOT, [file_path]), MODE_SNAPSHOT, [file_path]), 1)
+    set_dataset(dataset)
+
+    cache = Visual_UOA.figure_cache
+    for symbol, month_year in callback_targets(dataset):
+        symbol_click = {'points': [{'x': symbol}]}
+        month_click = {'points': [{'x': month_year}]}
+        callbacks = {
+            'update_graph2': lambda: Visual_UOA.update_graph2(symbol),
+            'update_graph3': lambda: Visual_UOA.pareto_figure(symbol_click, month_click, 'Call'),
+            'update_graph4': lambda: Visual_UOA.pareto_figure(symbol_click, month_click, 'Put'),
+        }
+        for name, callback in callbacks.items():
+            # Sin cache (figura nueva) y con cache (clic repetido)
+            record(f"{name}[{symbol}]", lambda: (cache.invalidate(), callback()))
+            record(f"{name}[{symbol}]:cached", callback)
+    return results
+
+
+def git_commit():
+    """Commit actual del repositorio (None si no hay git)."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes=('10k', '1m'), repeat=3, seed=0, output_file=None):
+    """Ejecuta el benchmark para cada tamaño y guarda los resultados en JSON."""
+    # Visual_UOA carga un archivo al importarse: se le da el sintético más chico
+    os.environ['DEFAULT_FILE_PATH'] = synthetic_csv(SIZES['10k'], seed)
+    os.environ.setdefault('UOA_WATCH_INTERVAL', '0')
+    with contextlib.redirect_stdout(io.StringIO()):
+        import Visual_UOA
+
+    results = []
+    for label in sizes:
+        results.extend(benchmark_size(label, SIZES[label], repeat, seed))
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'seed': seed,
+        'results': results,
+    }
+    if output_file is None:
+        os.makedirs(BENCHMARK_FOLDER, exist_ok=True)
+        output_file = os.path.join(BENCHMARK_FOLDER, f"benchmark_{commit or 'local'}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output_file, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Resultados guardados en {output_file}")
+    return report
+
+
+def compare_reports(before_file, after_file):
+    """Compara dos archivos de resultados etapa por etapa (tiempo mínimo y pico de memoria)."""
+    with open(before_file) as file:
+        before = {(result['size'], result['stage']): result for result in json.load(file)['results']}
+    with open(after_file) as file:
+        after = json.load(file)['results']
+    print(f"{'tamaño':>6} {'etapa':<32} {'antes ms':>10} {'después ms':>11} {'cambio':>8} {'pico MB':>9}")
+    for result in after:
+        previous = before.get((result['size'], result['stage']))
+        if previous is None:
+            continue
+        ratio = result['seconds_min'] / previous['seconds_min'] if previous['seconds_min'] else float('nan')
+        print(f"{result['size']:>6} {result['stage']:<32} {previous['seconds_min'] * 1000:>10.1f} "
+              f"{result['seconds_min'] * 1000:>11.1f} {ratio:>7.2f}x {result['peak_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de Visual_UOA sobre datos sintéticos.")
+    parser.add_argument("--sizes", default="10k,1m", help="Tamaños separados por coma: 10k, 1m, 10m")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Archivo JSON de resultados")
+    parser.add_argument("--compare", nargs=2, metavar=("ANTES", "DESPUES"), help="Compara dos archivos de resultados")
+    args = parser.parse_args()
+    if args.compare:
+        compare_reports(*args.compare)
+    else:
+        run_benchmarks([size.strip() for size in args.sizes.split(",")], args.repeat, args.seed, args.output)
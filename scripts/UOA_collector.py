@@ -0,0 +1,182 @@
+import os
+import time
+import argparse
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from webdriver_manager.chrome import ChromeDriverManager
+from UOA_Barchart_Connection import (
+    urls, fetch_backend, cookies_file, http_folder, random_user_agent,
+    start_session, login_to_barchart, download_data,
+)
+from UOA_http_fetcher import load_cookies, save_cookies, create_http_session, fetch_datasets
+from UOA_collector_store import (
+    COLLECTOR_FOLDER, load_collector_log, read_collected_snapshot, contract_state, collect_snapshot,
+)
+
+# Recolector intradía: descarga cada COLLECT_INTERVAL minutos en horario de mercado,
+# con una sesión que se mantiene abierta entre ciclos, y guarda solo lo que cambió.
+# Uso: python UOA_collector.py [--interval 15] [--once]
+
+# Horario de mercado (hora de Nueva York por defecto)
+MARKET_TIMEZONE = os.getenv("UOA_MARKET_TIMEZONE", "America/New_York")
+MARKET_OPEN = os.getenv("UOA_MARKET_OPEN", "09:30")
+MARKET_CLOSE = os.getenv("UOA_MARKET_CLOSE", "16:00")
+
+# Minutos entre ciclos
+COLLECT_INTERVAL = int(os.getenv("UOA_COLLECT_INTERVAL", "15"))
+
+
+def parse_clock(text):
+    """'HH:MM' a datetime.time."""
+    return datetime.strptime(text, "%H:%M").time()
+
+
+def next_run_time(now, interval_minutes, market_open, market_close):
+    """Próximo ciclo: múltiplos del intervalo desde la apertura, de lunes a viernes, hasta el cierre."""
+    day = now
+    while True:
+        if day.weekday() < 5:
+            opening = datetime.combine(day.date(), market_open, tzinfo=now.tzinfo)
+            closing = datetime.combine(day.date(), market_close, tzinfo=now.tzinfo)
+            if now <= opening:
+                return opening
+            if now <= closing:
+                elapsed = (now - opening).total_seconds()
+                slots = -(-elapsed // (interval_minutes * 60))
+                run_time = opening + timedelta(minutes=interval_minutes * slots)
+                if run_time <= closing:
+                    return run_time
+        day = datetime.combine(day.date() + timedelta(days=1), datetime.min.time(), tzinfo=now.tzinfo)
+        now = max(now, day)
+
+
+class WarmSession:
+    """Sesión de Barchart que sobrevive entre ciclos.
+
+    La sesión HTTP (con las cookies del login) y, si hace falta, un único navegador
+    quedan abiertos; el navegador solo se inicia cuando las cookies expiran o una
+    descarga HTTP falla, y se reutiliza en los ciclos siguientes.
+    """
+
+    def __init__(self):
+        self.http_session = None
+        self.driver = None
+        self.driver_folder = None
+
+    def browser(self):
+        """Navegador con sesión iniciada (se abre una sola vez)."""
+        if self.driver is None:
+            self.driver, self.driver_folder = start_session(ChromeDriverManager().install(), "collector")
+        return self.driver
+
+    def renew_cookies(self):
+        """Vuelve a iniciar sesión en el navegador y recrea la sesión HTTP con sus cookies."""
+        driver = self.browser()
+        login_to_barchart(driver)
+        cookies = driver.get_cookies()
+        save_cookies(cookies, cookies_file)
+        self.open_http(cookies)
+
+    def open_http(self, cookies):
+        if self.http_session is not None:
+            self.http_session.close()
+        self.http_session = create_http_session(cookies, random_user_agent, pool_size=len(urls))
+
+    def download(self, datasets):
+        """Descarga los datasets y devuelve {nombre: ruta}; usa HTTP y el navegador como respaldo."""
+        dataset_paths = {}
+        if fetch_backend == "http":
+            if self.http_session is None:
+                cookies = load_cookies(cookies_file)
+                if cookies:
+                    self.open_http(cookies)
+                else:
+                    self.renew_cookies()
+            dataset_paths, _, session_expired = fetch_datasets(self.http_session, datasets, http_folder)
+            if session_expired:
+                print("La sesión HTTP expiró: renovando las cookies.")
+                self.renew_cookies()
+                pending = {name: url for name, url in datasets.items() if not dataset_paths.get(name)}
+                retried, _, _ = fetch_datasets(self.http_session, pending, http_folder)
+                dataset_paths.update(retried)
+
+        for dataset_name, dataset_url in datasets.items():
+            if not dataset_paths.get(dataset_name):
+                driver = self.browser()
+                dataset_paths[dataset_name] = download_data(driver, dataset_url, f"{dataset_name}.csv", self.driver_folder)
+        return dataset_paths
+
+    def close(self):
+        if self.http_session is not None:
+            self.http_session.close()
+            self.http_session = None
+        if self.driver is not None:
+            self.driver.quit()
+            self.driver = None
+
+
+class Collector:
+    """Ciclo de descarga y diff contra el snapshot anterior."""
+
+    def __init__(self, store_folder=COLLECTOR_FOLDER):
+        self.store_folder = store_folder
+        self.session = WarmSession()
+        self.state, self.previous_time = self.resume_state()
+
+    def resume_state(self):
+        """Estado del último snapshot guardado, para seguir comparando tras un reinicio."""
+        log = load_collector_log(self.store_folder)
+        if not log:
+            return None, None
+        data = read_collected_snapshot(store_folder=self.store_folder)
+        print(f"Reanudando desde el ciclo de {log[-1]['time']}: {len(data)} contratos.")
+        return contract_state(data), log[-1]['time']
+
+    def run_cycle(self):
+        start = time.perf_counter()
+        snapshot_time = datetime.now()
+        dataset_paths = self.session.download(urls)
+        file_paths = [path for path in dataset_paths.values() if path and os.path.isfile(path)]
+        if not file_paths:
+            print("No se descargó ningún dataset en este ciclo.")
+            return None
+
+        self.state, entry = collect_snapshot(file_paths, self.state, snapshot_time, self.store_folder, self.previous_time)
+        self.previous_time = entry['time']
+        for file_path in file_paths:
+            os.remove(file_path)
+        summary = ", ".join(f"{name} {entry[name]}" for name in ('new', 'changed', 'removed') if name in entry)
+        print(f"Ciclo {entry['time']:%H:%M:%S} ({entry['kind']}): {entry['rows']} filas, "
+              f"{entry['written']} guardadas{'; ' + summary if summary else ''}; {time.perf_counter() - start:.1f} s.")
+        return entry
+
+    def run_forever(self, interval_minutes=COLLECT_INTERVAL):
+        market_zone = ZoneInfo(MARKET_TIMEZONE)
+        market_open, market_close = parse_clock(MARKET_OPEN), parse_clock(MARKET_CLOSE)
+        try:
+            while True:
+                run_time = next_run_time(datetime.now(market_zone), interval_minutes, market_open, market_close)
+                print(f"Próximo ciclo: {run_time:%Y-%m-%d %H:%M} ({MARKET_TIMEZONE}).")
+                time.sleep(max(0.0, (run_time - datetime.now(market_zone)).total_seconds()))
+                try:
+                    self.run_cycle()
+                except Exception as cycle_error:
+                    print(f"Error durante el ciclo: {cycle_error}")
+        finally:
+            self.session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recolector intradía de Unusual Options Activity.")
+    parser.add_argument("--interval", type=int, default=COLLECT_INTERVAL, help="Minutos entre ciclos")
+    parser.add_argument("--store", default=COLLECTOR_FOLDER, help="Carpeta del store del recolector")
+    parser.add_argument("--once", action="store_true", help="Ejecuta un solo ciclo ahora y termina")
+    args = parser.parse_args()
+    collector = Collector(args.store)
+    if args.once:
+        try:
+            collector.run_cycle()
+        finally:
+            collector.session.close()
+    else:
+        collector.run_forever(args.interval)
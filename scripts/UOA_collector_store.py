@@ -0,0 +1,264 @@
+import os
+import json
+from datetime import datetime
+import pandas as pd
+from UOA_snapshot_store import BASE_DIR, SNAPSHOT_COLUMN, SNAPSHOT_FORMAT, SnapshotWriter, read_snapshots, ensure_folder_exists
+from UOA_file_selector import hash_rows
+from UOA_schema import FILL_COLUMNS, hashable_frame, hashable_columns
+from UOA_ingest import ingest_csv, new_counters
+
+# Store del recolector: mismo layout que el store de snapshots, pero cada día tiene un
+# snapshot completo (part-<timestamp>.parquet) y luego solo deltas (delta-<timestamp>.parquet)
+COLLECTOR_FOLDER = os.path.join(BASE_DIR, "data", "UOAcollectorStore")
+
+# Registro de ciclos (empieza con "_" para que pyarrow no lo lea como dato)
+COLLECTOR_LOG = "_collector_log.jsonl"
+
+# Un contrato de opciones; Time no forma parte de la clave porque cambia con cada trade
+CONTRACT_KEY = ['Symbol', 'Type', 'Strike', 'Exp Date']
+
+# Campos del subyacente: cambian en cada ciclo para todos los contratos del símbolo, así que
+# no entran en el diff y se guardan aparte, una fila por Symbol y ciclo
+UNDERLYING_COLUMNS = ['Price~']
+UNDERLYING_FOLDER = "_underlying"
+
+# Tipos de ciclo registrados
+ENTRY_BASE = 'base'
+ENTRY_DELTA = 'delta'
+ENTRY_UNCHANGED = 'unchanged'
+
+
+def collector_log_path(store_folder=COLLECTOR_FOLDER):
+    """Ruta del registro de ciclos del store del recolector."""
+    return os.path.join(store_folder, COLLECTOR_LOG)
+
+
+def load_collector_log(store_folder=COLLECTOR_FOLDER):
+    """Ciclos registrados, en orden, con 'time' convertido a datetime."""
+    log_file = collector_log_path(store_folder)
+    if not os.path.exists(log_file):
+        return []
+    entries = []
+    with open(log_file, 'r') as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                entry['time'] = datetime.strptime(entry['time'], SNAPSHOT_FORMAT)
+                entries.append(entry)
+    return entries
+
+
+def log_record(entry):
+    """Línea JSON de un ciclo del registro."""
+    return json.dumps(dict(entry, time=entry['time'].strftime(SNAPSHOT_FORMAT))) + "\n"
+
+
+def append_collector_log(entry, store_folder=COLLECTOR_FOLDER):
+    """Agrega un ciclo al registro (una línea JSON por ciclo)."""
+    ensure_folder_exists(store_folder)
+    with open(collector_log_path(store_folder), 'a') as file:
+        file.write(log_record(entry))
+
+
+def save_collector_log(entries, store_folder=COLLECTOR_FOLDER):
+    """Reescribe el registro completo de forma atómica (compactación de días viejos)."""
+    temp_file = os.path.join(store_folder, f".{COLLECTOR_LOG}.tmp")
+    with open(temp_file, 'w') as file:
+        file.writelines(log_record(entry) for entry in entries)
+    os.replace(temp_file, collector_log_path(store_folder))
+
+
+def collected_times(store_folder=COLLECTOR_FOLDER):
+    """Momentos de los ciclos que escribieron datos (base o delta), ordenados."""
+    return [entry['time'] for entry in load_collector_log(store_folder)
+            if entry['kind'] in (ENTRY_BASE, ENTRY_DELTA)]
+
+
+def contract_hashes(data):
+    """Hash de la clave de contrato y hash de los campos del fill (FILL_COLUMNS), fila por fila.
+
+    Price~, IV, Delta y DTE cambian en cada ciclo sin que haya un fill nuevo; si entraran
+    en el hash casi todo el snapshot saldría como modificado en cada delta.
+    """
+    fill_columns = [column for column in FILL_COLUMNS if column in data.columns]
+    return hash_rows(hashable_columns(data, CONTRACT_KEY)), hash_rows(hashable_columns(data, fill_columns))
+
+
+def contract_state(data, hashes=None):
+    """Estado de un snapshot para comparar: claves y hash de fila, indexado por hash de clave."""
+    key_hash, row_hash = hashes or contract_hashes(data)
+    state = data[CONTRACT_KEY].reset_index(drop=True)
+    state['Row Hash'] = row_hash
+    state.index = pd.Index(key_hash, name='Key Hash')
+    return state[~state.index.duplicated(keep='last')]
+
+
+class SnapshotDiff:
+    """Sink de ingest_csv que compara cada chunk contra el snapshot anterior.
+
+    Solo los contratos nuevos o con un fill distinto pasan al writer; al terminar, los
+    contratos del snapshot anterior que no aparecieron se informan como eliminados.
+    Sin estado anterior, todos los contratos son nuevos (snapshot base). Los campos
+    del subyacente se acumulan por Symbol para la tabla aparte.
+    """
+
+    def __init__(self, previous_state, writer):
+        self.previous_state = previous_state
+        self.writer = writer
+        self.new = 0
+        self.changed = 0
+        self._states = []
+        self._underlying = []
+
+    def write(self, data):
+        key_hash, row_hash = contract_hashes(data)
+        self._states.append(contract_state(data, (key_hash, row_hash)))
+        underlying_columns = [column for column in UNDERLYING_COLUMNS if column in data.columns]
+        if underlying_columns:
+            self._underlying.append(data[['Symbol'] + underlying_columns].drop_duplicates('Symbol', keep='last'))
+
+        if self.previous_state is None:
+            self.new += len(data)
+            self.writer.write(data)
+            return
+        positions = self.previous_state.index.get_indexer(key_hash)
+        is_new = positions < 0
+        is_changed = ~is_new & (self.previous_state['Row Hash'].to_numpy()[positions] != row_hash)
+        self.new += int(is_new.sum())
+        self.changed += int(is_changed.sum())
+        if (is_new | is_changed).any():
+            self.writer.write(data[is_new | is_changed])
+
+    def finish(self):
+        """Estado del snapshot completo y claves eliminadas respecto del anterior."""
+        if self._states:
+            state = pd.concat(self._states)
+            state = state[~state.index.duplicated(keep='last')]
+        else:
+            state = pd.DataFrame(columns=CONTRACT_KEY + ['Row Hash'])
+        if self.previous_state is None:
+            return state, []
+        removed = self.previous_state[~self.previous_state.index.isin(state.index)]
+        return state, removed_keys(removed)
+
+    def underlying(self):
+        """Campos del subyacente del ciclo, una fila por Symbol (None si no vinieron)."""
+        if not self._underlying:
+            return None
+        data = pd.concat(self._underlying, ignore_index=True)
+        return data.drop_duplicates('Symbol', keep='last').reset_index(drop=True)
+
+
+def removed_keys(removed):
+    """Claves eliminadas en formato JSON compacto: [Symbol, Type, Strike, 'YYYY-MM-DD']."""
+    return [[str(symbol), str(option_type), float(strike), pd.Timestamp(exp_date).strftime('%Y-%m-%d')]
+            for symbol, option_type, strike, exp_date in removed[CONTRACT_KEY].itertuples(index=False)]
+
+
+def underlying_path(snapshot_time, store_folder=COLLECTOR_FOLDER):
+    """Tabla del subyacente de un ciclo (la carpeta empieza con "_": pyarrow no la lee como dato)."""
+    return os.path.join(store_folder, UNDERLYING_FOLDER,
+                        f"underlying-{snapshot_time.strftime(SNAPSHOT_FORMAT)}.parquet")
+
+
+def write_underlying(data, snapshot_time, store_folder=COLLECTOR_FOLDER):
+    """Guarda la tabla del subyacente de un ciclo de forma atómica."""
+    output_file = underlying_path(snapshot_time, store_folder)
+    ensure_folder_exists(os.path.dirname(output_file))
+    temp_file = os.path.join(os.path.dirname(output_file), f".{os.path.basename(output_file)}.tmp")
+    data.to_parquet(temp_file, index=False)
+    os.replace(temp_file, output_file)
+    return output_file
+
+
+def read_underlying(snapshot_time, store_folder=COLLECTOR_FOLDER):
+    """Tabla del subyacente de un ciclo indexada por Symbol (None si el ciclo no la tiene)."""
+    input_file = underlying_path(snapshot_time, store_folder)
+    if not os.path.exists(input_file):
+        return None
+    return pd.read_parquet(input_file).set_index('Symbol')
+
+
+def collect_snapshot(file_paths, previous_state, snapshot_time, store_folder=COLLECTOR_FOLDER,
+                     previous_time=None):
+    """Ingiere las descargas de un ciclo y persiste solo lo que cambió.
+
+    El primer ciclo de cada día (o sin estado anterior) escribe el snapshot completo;
+    los demás escriben un delta con los contratos nuevos o con un fill distinto, o solo
+    una marca 'unchanged' en el registro si no cambió ningún fill. Los campos del
+    subyacente (UNDERLYING_COLUMNS) se guardan en cada ciclo en una tabla por Symbol.
+    Devuelve (estado, entrada).
+    """
+    snapshot_time = snapshot_time.replace(microsecond=0)
+    is_base = previous_state is None or previous_time is None or previous_time.date() != snapshot_time.date()
+    counters = new_counters()
+    with SnapshotWriter(snapshot_time, store_folder, kind="part" if is_base else "delta") as writer:
+        diff = SnapshotDiff(None if is_base else previous_state, writer)
+        for file_path in file_paths:
+            ingest_csv(file_path, [diff], counters=counters)
+        state, removed = diff.finish()
+
+    entry = {'time': snapshot_time, 'rows': counters['rows'], 'written': writer.rows}
+    if is_base:
+        entry['kind'] = ENTRY_BASE
+    else:
+        entry.update(new=diff.new, changed=diff.changed, removed=len(removed))
+        entry['kind'] = ENTRY_DELTA if writer.rows or removed else ENTRY_UNCHANGED
+        if removed:
+            entry['removed_keys'] = removed
+    underlying = diff.underlying()
+    if underlying is not None:
+        write_underlying(underlying, snapshot_time, store_folder)
+    append_collector_log(entry, store_folder)
+    return state, entry
+
+
+def read_collected_snapshot(snapshot_time=None, columns=None, store_folder=COLLECTOR_FOLDER):
+    """Reconstruye el snapshot completo a snapshot_time (el último si es None).
+
+    Lee el snapshot base del día y los deltas posteriores de una sola partición; cada
+    contrato se queda con su última versión salvo que un ciclo posterior lo elimine.
+    Los campos del subyacente se toman de la tabla del último ciclo (también si fue
+    'unchanged'); IV y Delta quedan con el valor de la última versión guardada del
+    contrato, la de su último fill.
+    """
+    cycles = [entry for entry in load_collector_log(store_folder)
+              if snapshot_time is None or entry['time'] <= pd.Timestamp(snapshot_time)]
+    entries = [entry for entry in cycles if entry['kind'] in (ENTRY_BASE, ENTRY_DELTA)]
+    bases = [index for index, entry in enumerate(entries) if entry['kind'] == ENTRY_BASE]
+    if not bases:
+        raise FileNotFoundError(f"No hay snapshots en el store del recolector: {store_folder}")
+    entries = entries[bases[-1]:]
+    base_time = entries[0]['time']
+
+    read_columns = None
+    if columns is not None:
+        read_columns = list(dict.fromkeys(list(columns) + CONTRACT_KEY + [SNAPSHOT_COLUMN]))
+    data = read_snapshots(start_date=base_time, end_date=base_time, columns=read_columns, store_folder=store_folder)
+    times = [pd.Timestamp(entry['time']) for entry in entries]
+    data = data[data[SNAPSHOT_COLUMN].isin(times)]
+    data = data.sort_values(SNAPSHOT_COLUMN, kind='stable')
+    data = data.drop_duplicates(subset=CONTRACT_KEY, keep='last')
+
+    # Un contrato eliminado después de su última versión ya no forma parte del snapshot
+    removals = [[*key, pd.Timestamp(entry['time'])] for entry in entries for key in entry.get('removed_keys', [])]
+    if removals:
+        removed = pd.DataFrame(removals, columns=CONTRACT_KEY + ['Removed Time'])
+        removed['Exp Date'] = pd.to_datetime(removed['Exp Date'])
+        removed = removed.groupby(CONTRACT_KEY, as_index=False)['Removed Time'].max()
+        keys = hashable_frame(data[CONTRACT_KEY].astype({'Symbol': str, 'Type': str}))
+        removed_at = pd.Series(removed['Removed Time'].to_numpy(),
+                               index=hash_rows(hashable_frame(removed[CONTRACT_KEY]), CONTRACT_KEY))
+        removed_at = removed_at.reindex(hash_rows(keys, CONTRACT_KEY)).to_numpy()
+        data = data[pd.isna(removed_at) | (data[SNAPSHOT_COLUMN].to_numpy() > removed_at)]
+
+    underlying = read_underlying(cycles[-1]['time'], store_folder)
+    if underlying is not None:
+        for column in underlying.columns.intersection(data.columns):
+            latest = data['Symbol'].astype(str).map(underlying[column])
+            data[column] = latest.fillna(data[column]).astype(data[column].dtype)
+
+    data = data.sort_index(kind='stable').reset_index(drop=True)
+    if columns is not None:
+        data = data[list(columns)]
+    return data
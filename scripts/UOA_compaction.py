@@ -0,0 +1,429 @@
+import os
+import re
+import json
+import shutil
+import argparse
+from datetime import date, datetime, timedelta
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from UOA_snapshot_store import (SnapshotWriter, parse_snapshot_time, ensure_folder_exists, BASE_DIR, CSV_FOLDER,
+                                STORE_FOLDER, SNAPSHOT_COLUMN, SNAPSHOT_FORMAT, PARTITION_COLUMN, PARTITION_MANIFEST,
+                                ROW_GROUP_SIZE)
+from UOA_collector_store import (CONTRACT_KEY, COLLECTOR_FOLDER, ENTRY_BASE, load_collector_log, save_collector_log,
+                                 read_underlying, underlying_path)
+from UOA_ingest import ingest_csv, new_counters, format_counters
+from UOA_file_selector import file_hash
+from UOA_schema import apply_schema
+
+# Archivo histórico: los UOA_<timestamp>.csv se juntan en un Parquet comprimido por día.
+# Los días dentro de la ventana de retención guardan todas las capturas (nivel "full");
+# los más viejos se reducen al último estado de cada contrato en el día (nivel "eod").
+# _index.json dice dónde está cada día: los lectores no listan ni abren otros archivos.
+# Los stores Parquet (snapshots y recolector) reciben los mismos niveles: cada partición
+# snapshot_date= de un día cerrado queda en un único archivo, y las anteriores a la
+# retención se reducen al cierre de cada contrato.
+# Uso: python UOA_compaction.py [--retention-days 30] [--delete-sources]
+
+ARCHIVE_FOLDER = os.path.join(BASE_DIR, "data", "UOAarchive")
+ARCHIVE_INDEX = "_index.json"
+
+# Días (contando hacia atrás desde hoy) que conservan todas las capturas intradía
+RETENTION_DAYS = int(os.getenv("UOA_RETENTION_DAYS", "30"))
+
+TIER_FULL = "full"
+TIER_EOD = "eod"
+TIER_FILES = {TIER_FULL: "snapshots.parquet", TIER_EOD: "eod.parquet"}
+
+# Consolidados viejos con timestamp (el consolidado incremental UOA_Combined.csv no se toca)
+LEGACY_COMBINED_PATTERN = re.compile(r"^UOA_Combined_\d{8}_\d{6}\.csv$")
+
+
+def archive_index_path(archive_folder=ARCHIVE_FOLDER):
+    return os.path.join(archive_folder, ARCHIVE_INDEX)
+
+
+def temp_path(output_file):
+    """Temporal oculto y propio del proceso junto a output_file: dos compactaciones a la vez no se pisan."""
+    return os.path.join(os.path.dirname(output_file), f".{os.path.basename(output_file)}.{os.getpid()}.tmp")
+
+
+def load_archive_index(archive_folder=ARCHIVE_FOLDER):
+    """Índice del archivo: {'days': {fecha: entrada}, 'legacy': {archivo: entrada}}."""
+    index_file = archive_index_path(archive_folder)
+    if not os.path.exists(index_file):
+        return {"days": {}, "legacy": {}}
+    with open(index_file, 'r') as file:
+        return json.load(file)
+
+
+def save_archive_index(index, archive_folder=ARCHIVE_FOLDER):
+    """Guarda el índice de forma atómica."""
+    ensure_folder_exists(archive_folder)
+    index["updated"] = datetime.now().isoformat(timespec='seconds')
+    index_file = archive_index_path(archive_folder)
+    temp_file = temp_path(index_file)
+    with open(temp_file, 'w') as file:
+        json.dump(index, file, indent=2, sort_keys=True)
+    os.replace(temp_file, index_file)
+
+
+def day_key(day):
+    """'YYYY-MM-DD' de una fecha, datetime o texto."""
+    return pd.Timestamp(day).strftime('%Y-%m-%d')
+
+
+def day_file(day, tier):
+    """Ruta relativa al archivo de un día según su nivel."""
+    return os.path.join(f"day={day_key(day)}", TIER_FILES[tier])
+
+
+def source_snapshots(csv_folder=CSV_FOLDER):
+    """{fecha: [(momento, ruta)]} de los UOA_<timestamp>.csv de la carpeta, ordenados por momento."""
+    by_day = {}
+    with os.scandir(csv_folder) as entries:
+        for entry in entries:
+            snapshot_time = parse_snapshot_time(entry.name)
+            if snapshot_time is not None:
+                by_day.setdefault(day_key(snapshot_time), []).append((snapshot_time, entry.path))
+    return {day: sorted(snapshots) for day, snapshots in sorted(by_day.items())}
+
+
+def write_parquet(data, output_file):
+    """Escribe un DataFrame comprimido con zstd de forma atómica."""
+    ensure_folder_exists(os.path.dirname(output_file))
+    temp_file = temp_path(output_file)
+    pq.write_table(pa.Table.from_pandas(data, preserve_index=False), temp_file,
+                   compression="zstd", row_group_size=ROW_GROUP_SIZE)
+    os.replace(temp_file, output_file)
+
+
+def compact_day(day, snapshots, entry=None, archive_folder=ARCHIVE_FOLDER, counters=None):
+    """Junta las capturas de un día en un único Parquet (nivel full) y devuelve su entrada del índice.
+
+    Si el día ya estaba archivado, sus capturas se conservan y se agregan las nuevas
+    (los CSV originales pueden haberse borrado después de la primera compactación).
+    """
+    counters = counters or new_counters()
+    relative_file = day_file(day, TIER_FULL)
+    output_file = os.path.join(archive_folder, relative_file)
+    archived = None
+    if entry is not None:
+        archived = pd.read_parquet(os.path.join(archive_folder, entry["file"]))
+    archived_times = set() if archived is None else set(archived[SNAPSHOT_COLUMN].unique())
+
+    sources = dict(entry["sources"]) if entry else {}
+    writer = SnapshotWriter(snapshots[0][0], output_file=output_file)
+    with writer:
+        # Primero las capturas ya archivadas, luego las nuevas, siempre en orden de momento
+        timeline = [(pd.Timestamp(snapshot_time).to_pydatetime(), None) for snapshot_time in sorted(archived_times)]
+        timeline += [(snapshot_time, path) for snapshot_time, path in snapshots
+                     if pd.Timestamp(snapshot_time) not in archived_times]
+        for snapshot_time, path in sorted(timeline, key=lambda item: item[0]):
+            writer.snapshot_time = snapshot_time
+            if path is None:
+                writer.write(archived[archived[SNAPSHOT_COLUMN] == pd.Timestamp(snapshot_time)]
+                             .drop(columns=[SNAPSHOT_COLUMN]))
+            else:
+                ingest_csv(path, [writer], counters=counters)
+                sources[os.path.basename(path)] = {"hash": file_hash(path), "bytes": os.path.getsize(path)}
+
+    times = sorted(snapshot_time for snapshot_time, _ in timeline)
+    return {
+        "tier": TIER_FULL,
+        "file": relative_file.replace(os.sep, "/"),
+        "rows": writer.rows,
+        "bytes": os.path.getsize(output_file),
+        "snapshots": [snapshot_time.strftime(SNAPSHOT_FORMAT) for snapshot_time in times],
+        "sources": sources,
+    }
+
+
+def downsample_day(day, entry, archive_folder=ARCHIVE_FOLDER):
+    """Reduce un día archivado al último estado de cada contrato (nivel eod).
+
+    Volume es acumulado del día, así que la última captura de cada contrato es su total
+    de cierre. Se agregan 'First Seen' (primera captura en la que apareció) y
+    'Snapshots' (en cuántas capturas estuvo).
+    """
+    full_file = os.path.join(archive_folder, entry["file"])
+    data = pd.read_parquet(full_file).sort_values(SNAPSHOT_COLUMN, kind='stable')
+    snapshot_times = data.groupby(CONTRACT_KEY, observed=True, sort=False, dropna=False)[SNAPSHOT_COLUMN]
+    data['First Seen'] = snapshot_times.transform('min')
+    data['Snapshots'] = snapshot_times.transform('size').astype('int32')
+    eod = data.drop_duplicates(CONTRACT_KEY, keep='last')
+    eod = eod.sort_values(['Symbol', 'Type', 'Exp Date'], kind='stable', ignore_index=True)
+
+    relative_file = day_file(day, TIER_EOD)
+    write_parquet(eod, os.path.join(archive_folder, relative_file))
+    os.remove(full_file)
+    return {
+        **entry,
+        "tier": TIER_EOD,
+        "file": relative_file.replace(os.sep, "/"),
+        "rows": len(eod),
+        "full_rows": entry["rows"],
+        "bytes": os.path.getsize(os.path.join(archive_folder, relative_file)),
+    }
+
+
+def archive_legacy_combined(file_path, archive_folder=ARCHIVE_FOLDER):
+    """Guarda un UOA_Combined_<timestamp>.csv viejo como Parquet comprimido."""
+    relative_file = os.path.join("legacy", os.path.basename(file_path).replace(".csv", ".parquet"))
+    data = apply_schema(pd.read_csv(file_path, thousands=','), source=file_path)
+    write_parquet(data, os.path.join(archive_folder, relative_file))
+    return {
+        "file": relative_file.replace(os.sep, "/"),
+        "rows": len(data),
+        "bytes": os.path.getsize(os.path.join(archive_folder, relative_file)),
+        "hash": file_hash(file_path),
+    }
+
+
+def delete_archived_sources(index, csv_folder=CSV_FOLDER):
+    """Borra los CSV ya archivados cuyo contenido coincide con el registrado en el índice."""
+    deleted = 0
+    archived = [(name, source["hash"]) for entry in index["days"].values() for name, source in entry["sources"].items()]
+    archived += [(name, entry["hash"]) for name, entry in index["legacy"].items()]
+    for name, content_hash in archived:
+        path = os.path.join(csv_folder, name)
+        if os.path.exists(path) and file_hash(path) == content_hash:
+            os.remove(path)
+            deleted += 1
+    return deleted
+
+
+def compact_archive(csv_folder=CSV_FOLDER, archive_folder=ARCHIVE_FOLDER, retention_days=RETENTION_DAYS,
+                    today=None, delete_sources=False):
+    """Compacta la carpeta de CSVs en el archivo y aplica la retención; devuelve el índice."""
+    index = load_archive_index(archive_folder)
+    cutoff = day_key((today or date.today()) - timedelta(days=retention_days))
+    counters = new_counters()
+
+    for day, snapshots in source_snapshots(csv_folder).items():
+        entry = index["days"].get(day)
+        new_snapshots = [(snapshot_time, path) for snapshot_time, path in snapshots
+                         if entry is None or os.path.basename(path) not in entry["sources"]]
+        if not new_snapshots:
+            continue
+        if entry is not None and entry["tier"] == TIER_EOD:
+            print(f"{day}: ya reducido a fin de día; se omiten {len(new_snapshots)} capturas nuevas.")
+            continue
+        index["days"][day] = compact_day(day, new_snapshots, entry, archive_folder, counters)
+        print(f"{day}: {len(index['days'][day]['snapshots'])} capturas, {index['days'][day]['rows']} filas, "
+              f"{index['days'][day]['bytes'] / 1e6:.2f} MB")
+        save_archive_index(index, archive_folder)
+
+    # Retención: los días anteriores al corte quedan solo con el cierre de cada contrato
+    for day, entry in sorted(index["days"].items()):
+        if day < cutoff and entry["tier"] == TIER_FULL:
+            index["days"][day] = downsample_day(day, entry, archive_folder)
+            print(f"{day}: reducido a fin de día, {entry['rows']} -> {index['days'][day]['rows']} filas")
+            save_archive_index(index, archive_folder)
+
+    with os.scandir(csv_folder) as entries:
+        legacy_files = [entry.path for entry in entries if LEGACY_COMBINED_PATTERN.match(entry.name)]
+    for file_path in sorted(legacy_files):
+        if os.path.basename(file_path) not in index["legacy"]:
+            index["legacy"][os.path.basename(file_path)] = archive_legacy_combined(file_path, archive_folder)
+            print(f"{os.path.basename(file_path)}: archivado como Parquet")
+    save_archive_index(index, archive_folder)
+
+    if counters["files"]:
+        print(f"Ingesta: {format_counters(counters)}")
+    if delete_sources:
+        print(f"CSV archivados borrados: {delete_archived_sources(index, csv_folder)}")
+    return index
+
+
+def store_partitions(store_folder):
+    """{fecha: carpeta} de las particiones snapshot_date= de un store, ordenadas por fecha."""
+    if not os.path.isdir(store_folder):
+        return {}
+    prefix = f"{PARTITION_COLUMN}="
+    with os.scandir(store_folder) as entries:
+        partitions = {entry.name[len(prefix):]: entry.path for entry in entries
+                      if entry.is_dir() and entry.name.startswith(prefix)}
+    return dict(sorted(partitions.items()))
+
+
+def partition_files(partition_folder):
+    """Archivos de datos de una partición (los que empiezan con "." o "_" no son datos)."""
+    with os.scandir(partition_folder) as entries:
+        return sorted(entry.name for entry in entries
+                      if entry.is_file() and entry.name.endswith(".parquet") and not entry.name.startswith((".", "_")))
+
+
+def load_partition_manifest(partition_folder):
+    """Manifiesto de una partición compactada (None si no se compactó)."""
+    manifest_file = os.path.join(partition_folder, PARTITION_MANIFEST)
+    if not os.path.exists(manifest_file):
+        return None
+    with open(manifest_file, 'r') as file:
+        return json.load(file)
+
+
+def read_partition(partition_folder, snapshot_time=None):
+    """Filas de una partición (solo las de una captura si se indica snapshot_time)."""
+    expression = None if snapshot_time is None else ds.field(SNAPSHOT_COLUMN) == pd.Timestamp(snapshot_time)
+    return ds.dataset(partition_folder, format="parquet").to_table(filter=expression).to_pandas()
+
+
+def partition_snapshots(partition_folder):
+    """Momentos de las capturas de una partición, leyendo solo la columna Snapshot Time."""
+    table = ds.dataset(partition_folder, format="parquet").to_table(columns=[SNAPSHOT_COLUMN])
+    return sorted(pd.Timestamp(value).to_pydatetime() for value in table.column(SNAPSHOT_COLUMN).unique().to_pylist())
+
+
+def last_state(data):
+    """Última versión de cada contrato entre todas las capturas (Volume es acumulado del día)."""
+    data = data.sort_values(SNAPSHOT_COLUMN, kind='stable')
+    return data.drop_duplicates(CONTRACT_KEY, keep='last').drop(columns=[SNAPSHOT_COLUMN])
+
+
+def replace_partition(partition_folder, tier, captures):
+    """Reescribe una partición como un único archivo del nivel indicado.
+
+    captures es una secuencia ordenada de (momento, filas sin Snapshot Time). La
+    partición nueva se arma en una carpeta oculta y se intercambia con dos rename:
+    un lector nunca ve las capturas duplicadas entre el archivo nuevo y los viejos.
+    """
+    parent_folder, partition_name = os.path.split(partition_folder)
+    staging_folder = os.path.join(parent_folder, f".{partition_name}.compacting")
+    retired_folder = os.path.join(parent_folder, f".{partition_name}.retired")
+    for folder in (staging_folder, retired_folder):
+        shutil.rmtree(folder, ignore_errors=True)
+
+    output_file = os.path.join(staging_folder, TIER_FILES[tier])
+    snapshots = []
+    writer = SnapshotWriter(output_file=output_file)
+    with writer:
+        for snapshot_time, data in captures:
+            writer.snapshot_time = snapshot_time
+            writer.write(data)
+            snapshots.append(snapshot_time)
+    manifest = {
+        "tier": tier,
+        "file": TIER_FILES[tier],
+        "rows": writer.rows,
+        "bytes": os.path.getsize(output_file),
+        "snapshots": [snapshot_time.strftime(SNAPSHOT_FORMAT) for snapshot_time in snapshots],
+        "updated": datetime.now().isoformat(timespec='seconds'),
+    }
+    with open(os.path.join(staging_folder, PARTITION_MANIFEST), 'w') as file:
+        json.dump(manifest, file, indent=2)
+
+    os.rename(partition_folder, retired_folder)
+    os.rename(staging_folder, partition_folder)
+    shutil.rmtree(retired_folder)
+    return manifest
+
+
+def compact_partition(partition_folder):
+    """Nivel full: todas las capturas del día en un archivo, escritas de a una."""
+    captures = ((snapshot_time, read_partition(partition_folder, snapshot_time).drop(columns=[SNAPSHOT_COLUMN]))
+                for snapshot_time in partition_snapshots(partition_folder))
+    return replace_partition(partition_folder, TIER_FULL, captures)
+
+
+def downsample_partition(partition_folder):
+    """Nivel eod: el último estado de cada contrato en el día, con el momento de la última captura."""
+    snapshot_time = partition_snapshots(partition_folder)[-1]
+    return replace_partition(partition_folder, TIER_EOD, [(snapshot_time, last_state(read_partition(partition_folder)))])
+
+
+def downsample_collector_partition(day, partition_folder, store_folder=COLLECTOR_FOLDER):
+    """Nivel eod en el store del recolector: además del archivo, el registro del día queda
+    en un único ciclo base y el subyacente del último ciclo se aplica a las filas."""
+    log = load_collector_log(store_folder)
+    day_entries = [entry for entry in log if day_key(entry['time']) == day]
+    snapshot_time = day_entries[-1]['time'] if day_entries else partition_snapshots(partition_folder)[-1]
+
+    eod = last_state(read_partition(partition_folder))
+    underlying = read_underlying(snapshot_time, store_folder)
+    if underlying is not None:
+        for column in underlying.columns.intersection(eod.columns):
+            eod[column] = eod['Symbol'].astype(str).map(underlying[column]).fillna(eod[column]).astype(eod[column].dtype)
+    manifest = replace_partition(partition_folder, TIER_EOD, [(snapshot_time, eod)])
+
+    # Los ciclos del día se reemplazan por un único base con el momento del último
+    log = [log_entry for log_entry in log if day_key(log_entry['time']) != day]
+    log.append({'time': snapshot_time, 'kind': ENTRY_BASE, 'rows': manifest["rows"], 'written': manifest["rows"],
+                'tier': TIER_EOD})
+    save_collector_log(sorted(log, key=lambda log_entry: log_entry['time']), store_folder)
+    for log_entry in day_entries:
+        underlying_file = underlying_path(log_entry['time'], store_folder)
+        if os.path.exists(underlying_file):
+            os.remove(underlying_file)
+    return manifest
+
+
+def compact_store(store_folder=STORE_FOLDER, retention_days=RETENTION_DAYS, today=None, collector=False):
+    """Aplica los niveles full y eod a las particiones de un store Parquet; devuelve {fecha: nivel}.
+
+    La partición de hoy no se toca (el recolector o la migración pueden seguir
+    escribiendo en ella). Con collector=True el store es el del recolector: el nivel
+    full junta base y deltas sin cambiar el registro, y el eod también lo reescribe.
+    """
+    today = day_key(today or date.today())
+    cutoff = day_key(pd.Timestamp(today) - timedelta(days=retention_days))
+    tiers = {}
+    for day, partition_folder in store_partitions(store_folder).items():
+        manifest = load_partition_manifest(partition_folder)
+        files = partition_files(partition_folder)
+        tiers[day] = manifest["tier"] if manifest else None
+        if day >= today or not files:
+            continue
+        if manifest is not None and manifest["tier"] == TIER_EOD:
+            if files != [manifest["file"]]:
+                print(f"{store_folder} {day}: ya reducido a fin de día; se omiten {len(files) - 1} archivos nuevos.")
+            continue
+
+        if day < cutoff:
+            if collector:
+                manifest = downsample_collector_partition(day, partition_folder, store_folder)
+            else:
+                manifest = downsample_partition(partition_folder)
+            print(f"{store_folder} {day}: reducido a fin de día, {manifest['rows']} filas")
+        elif manifest is None or files != [manifest["file"]]:
+            manifest = compact_partition(partition_folder)
+            print(f"{store_folder} {day}: {len(files)} archivos -> 1, {len(manifest['snapshots'])} capturas, "
+                  f"{manifest['rows']} filas, {manifest['bytes'] / 1e6:.2f} MB")
+        tiers[day] = manifest["tier"]
+    return tiers
+
+
+def archived_days(archive_folder=ARCHIVE_FOLDER):
+    """Fechas archivadas y su nivel, según el índice."""
+    return {day: entry["tier"] for day, entry in sorted(load_archive_index(archive_folder)["days"].items())}
+
+
+def read_archived_day(day, columns=None, snapshot_time=None, archive_folder=ARCHIVE_FOLDER):
+    """Lee un día del archivo abriendo solo su archivo (ubicado con el índice).
+
+    En nivel full, snapshot_time filtra una captura; en nivel eod hay una fila por contrato.
+    """
+    entry = load_archive_index(archive_folder)["days"].get(day_key(day))
+    if entry is None:
+        raise FileNotFoundError(f"El día {day_key(day)} no está en el archivo {archive_folder}")
+    filters = None
+    if snapshot_time is not None and entry["tier"] == TIER_FULL:
+        filters = [(SNAPSHOT_COLUMN, '==', pd.Timestamp(snapshot_time))]
+    return pd.read_parquet(os.path.join(archive_folder, entry["file"]), columns=columns, filters=filters)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compacta los snapshots en un archivo diario con retención.")
+    parser.add_argument("--source", default=CSV_FOLDER, help="Carpeta con los UOA_<timestamp>.csv")
+    parser.add_argument("--archive", default=ARCHIVE_FOLDER, help="Carpeta del archivo")
+    parser.add_argument("--retention-days", type=int, default=RETENTION_DAYS,
+                        help="Días recientes que conservan todas las capturas")
+    parser.add_argument("--delete-sources", action="store_true",
+                        help="Borrar los CSV ya archivados (se verifica su hash)")
+    parser.add_argument("--snapshot-store", default=STORE_FOLDER, help="Store de snapshots a compactar")
+    parser.add_argument("--collector-store", default=COLLECTOR_FOLDER, help="Store del recolector a compactar")
+    args = parser.parse_args()
+    compact_archive(args.source, args.archive, args.retention_days, delete_sources=args.delete_sources)
+    compact_store(args.snapshot_store, args.retention_days)
+    compact_store(args.collector_store, args.retention_days, collector=True)
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+# Orden del dataset cargado: cada Symbol queda contiguo y dentro de él Type, Exp Date y Strike
+DATA_INDEX_KEYS = ['Symbol', 'Type', 'Exp Date', 'Strike']
+
+
+class SortedFrameIndex:
+    """DataFrame ordenado una sola vez por keys, con búsquedas por prefijo de claves.
+
+    La primera clave se resuelve con un diccionario de offsets (O(1)) y las siguientes
+    con búsqueda binaria dentro del rango ya acotado (O(log n)). Las consultas
+    devuelven slices posicionales (vistas) del frame ordenado, no copias filtradas.
+    """
+
+    def __init__(self, data, keys):
+        self.keys = list(keys)
+        self._lookups = []
+        search_arrays = []
+        for key in self.keys:
+            search_array, lookup = self._encode(data[key])
+            search_arrays.append(search_array)
+            self._lookups.append(lookup)
+
+        # np.lexsort ordena por la última clave primero
+        order = np.lexsort(search_arrays[::-1]) if len(data) else np.empty(0, dtype=np.intp)
+        self.data = data.take(order).reset_index(drop=True)
+        self._search = [search_array[order] for search_array in search_arrays]
+
+        # Offsets (inicio, fin) de cada valor de la primera clave
+        first = self._search[0]
+        boundaries = np.flatnonzero(first[1:] != first[:-1]) + 1
+        starts = np.concatenate([[0], boundaries]) if len(first) else np.empty(0, dtype=np.intp)
+        stops = np.concatenate([boundaries, [len(first)]]) if len(first) else np.empty(0, dtype=np.intp)
+        self._offsets = {first[start]: (int(start), int(stop)) for start, stop in zip(starts, stops)}
+
+    @staticmethod
+    def _encode(series):
+        """Convierte una columna a un arreglo ordenable y una función valor -> clave de búsqueda."""
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories = series.cat.categories
+            return series.cat.codes.to_numpy(), lambda value: categories.get_loc(value) if value in categories else None
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = series.to_numpy(dtype='datetime64[ns]').view(np.int64)
+            return values, lambda value: pd.Timestamp(value).value
+        if series.dtype == object:
+            codes, uniques = pd.factorize(series, sort=True)
+            positions = {value: code for code, value in enumerate(uniques)}
+            return codes, positions.get
+        if pd.api.types.is_extension_array_dtype(series.dtype):
+            return series.to_numpy(dtype=np.float64, na_value=np.nan), float
+        return series.to_numpy(), lambda value: value
+
+    def __getstate__(self):
+        # Las funciones de búsqueda no se serializan (cache binario): se rearman desde el frame ordenado
+        state = self.__dict__.copy()
+        del state['_lookups']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lookups = [self._encode(self.data[key])[1] for key in self.keys]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, value):
+        return self._lookups[0](value) in self._offsets
+
+    def values(self):
+        """Valores distintos de la primera clave, en el orden del índice."""
+        return [self.data[self.keys[0]].iat[start] for start, _ in sorted(self._offsets.values())]
+
+    def bounds(self, *values, low=None, high=None):
+        """Rango (inicio, fin) de las filas con el prefijo de claves values.
+
+        low/high acotan (inclusive) la clave siguiente al prefijo, por ejemplo un
+        rango de Exp Date dentro de un (Symbol, Type).
+        """
+        start, stop = 0, len(self.data)
+        for position, value in enumerate(values):
+            search_value = None if value is None else self._lookups[position](value)
+            if search_value is None:
+                return start, start
+            if position == 0:
+                start, stop = self._offsets.get(search_value, (0, 0))
+                continue
+            window = self._search[position][start:stop]
+            start, stop = (start + int(np.searchsorted(window, search_value, 'left')),
+                           start + int(np.searchsorted(window, search_value, 'right')))
+
+        if low is not None or high is not None:
+            position = len(values)
+            lookup = self._lookups[position]
+            window = self._search[position][start:stop]
+            low_offset = int(np.searchsorted(window, lookup(low), 'left')) if low is not None else 0
+            high_offset = int(np.searchsorted(window, lookup(high), 'right')) if high is not None else len(window)
+            start, stop = start + low_offset, start + max(high_offset, low_offset)
+        return start, stop
+
+    def slice(self, *values, low=None, high=None):
+        """Filas con el prefijo de claves values (y rango low/high en la clave siguiente)."""
+        start, stop = self.bounds(*values, low=low, high=high)
+        return self.data.iloc[start:stop]
+
+
+def build_data_index(data):
+    """Índice del dataset cargado por (Symbol, Type, Exp Date, Strike)."""
+    return SortedFrameIndex(data, DATA_INDEX_KEYS)
@@ -0,0 +1,390 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import tempfile
+import threading
+from datetime import datetime
+import pandas as pd
+from UOA_file_selector import read_consolidated, file_hash, BASE_DIR
+from UOA_snapshot_store import read_snapshots, list_snapshots, parse_snapshot_time, SNAPSHOT_FILE_PATTERN
+from UOA_collector_store import collector_log_path, collected_times, read_collected_snapshot
+from UOA_schema import load_uoa_csv, compact_frame
+from UOA_aggregates import add_derived_columns, build_premium_cube, empty_premium_cube
+from UOA_data_index import build_data_index
+from UOA_analytics import ANALYTICS_INPUTS
+from UOA_metrics import logger
+
+# Columnas que usan los gráficos y las métricas por contrato (el store solo lee estas del disco)
+STORE_COLUMNS = ['Symbol', 'Type', 'Strike', 'Exp Date', 'Bid', 'Ask', 'Last', 'Volume'] + ANALYTICS_INPUTS
+
+# Umbral de Premium del Gráfico 1 (Top UOA Liquidity $1M+)
+G1_PREMIUM_THRESHOLD = 1000000
+
+# Segundos entre revisiones de la carpeta de datos (0 desactiva la recarga en caliente)
+WATCH_INTERVAL = int(os.getenv("UOA_WATCH_INTERVAL", "30"))
+
+# Cache binario del dataset ya preprocesado (pickle), por hash del origen: un reinicio con
+# los mismos datos no vuelve a parsear el CSV ni a armar el índice y el cubo. Vacío lo desactiva.
+DATASET_CACHE_FOLDER = os.getenv("UOA_DATASET_CACHE", os.path.join(BASE_DIR, "data", "UOAcache"))
+DATASET_CACHE_KEEP = int(os.getenv("UOA_DATASET_CACHE_KEEP", "4"))
+
+# Cambia cuando cambia el preprocesamiento: los caches anteriores dejan de coincidir
+DATASET_CACHE_FORMAT = 2
+
+# Modos de origen: último snapshot del store, store del recolector (base + deltas),
+# último UOA_<timestamp>.csv o consolidado acumulativo
+MODE_STORE = 'store'
+MODE_COLLECTOR = 'collector'
+MODE_SNAPSHOT = 'snapshot'
+MODE_COMBINED = 'combined'
+
+
+def build_graph1_data(data):
+    """Suma de Premium por Symbol de los trades de más de $1M (datos del Gráfico 1).
+
+    No se ordena: el Gráfico 1 y el filtro eligen sus Top-N con split_top_n.
+    """
+    return (
+        data[data['Premium'] > G1_PREMIUM_THRESHOLD]
+        .groupby('Symbol', as_index=False, observed=True)
+        .agg({'Premium': 'sum'})
+    )
+
+
+class UOADataset:
+    """Dataset preprocesado e inmutable: datos indexados, datos del Gráfico 1 y cubo de Premium.
+
+    Nunca se modifica después de construido; una recarga crea un UOADataset nuevo
+    y lo publica con set_dataset(), así un callback en curso sigue usando el suyo.
+    """
+
+    def __init__(self, data, version, mode, sources):
+        self.version = version
+        self.mode = mode
+        self.sources = tuple(sources)
+        # Índice ordenado por (Symbol, Type, Exp Date, Strike): las consultas son slices O(log n)
+        self.data_index = build_data_index(data)
+        self.data = self.data_index.data
+        self.filtered_data_g1 = build_graph1_data(self.data)
+        # Cubo de Premium precalculado e indexado: los callbacks solo toman slices
+        self.premium_cube = build_premium_cube(self.data)
+        logger.debug(f"Datos filtrados para el Gráfico 1: {self.filtered_data_g1.shape}")
+
+    @classmethod
+    def empty(cls, version=0):
+        """Dataset vacío para cuando no se pudieron cargar los datos."""
+        dataset = cls.__new__(cls)
+        dataset.version = version
+        dataset.mode = None
+        dataset.sources = ()
+        dataset.data_index = None
+        dataset.data = pd.DataFrame()
+        dataset.filtered_data_g1 = pd.DataFrame()
+        dataset.premium_cube = empty_premium_cube()
+        return dataset
+
+
+# Dataset publicado: reemplazar la referencia es atómico, los lectores nunca ven un estado intermedio
+_current_dataset = UOADataset.empty()
+
+
+def get_dataset():
+    """Dataset vigente (tomarlo una vez al inicio de cada callback)."""
+    return _current_dataset
+
+
+def set_dataset(dataset):
+    """Publica un dataset nuevo."""
+    global _current_dataset
+    _current_dataset = dataset
+    logger.info(f"Dataset versión {dataset.version} publicado: {len(dataset.data)} filas.")
+
+
+def source_version(mode, sources):
+    """Token de versión derivado de los orígenes del dataset (archivo, tamaño y mtime, o momento del snapshot).
+
+    Con gunicorn cada worker carga su propio dataset: al depender solo de los orígenes,
+    todos llegan a la misma versión y el cliente y las claves de los caches coinciden
+    sin importar qué worker atiende cada pedido. Entero de 48 bits (seguro en JavaScript).
+    """
+    identity = [mode]
+    for source in sources:
+        if isinstance(source, str) and os.path.isfile(source):
+            stat = os.stat(source)
+            identity.append([os.path.abspath(source), stat.st_size, stat.st_mtime_ns])
+        else:
+            identity.append(str(source))
+    return int(hashlib.sha256(json.dumps(identity).encode()).hexdigest()[:12], 16)
+
+
+def source_mode(file_path):
+    """Modo de carga según el origen configurado."""
+    if os.path.isdir(file_path):
+        return MODE_COLLECTOR if os.path.exists(collector_log_path(file_path)) else MODE_STORE
+    if os.path.basename(file_path).startswith("UOA_Combined"):
+        return MODE_COMBINED
+    return MODE_SNAPSHOT
+
+
+def source_time(file_path):
+    """Momento de un snapshot: el del nombre UOA_<timestamp>.csv o, si no tiene, su fecha de modificación."""
+    return parse_snapshot_time(file_path) or datetime.fromtimestamp(os.path.getmtime(file_path))
+
+
+def source_identity(file_path, mode):
+    """Lo que identifica el contenido del origen: hash del archivo o último snapshot del store."""
+    if mode == MODE_STORE:
+        return str(list_snapshots(file_path)[-1])
+    if mode == MODE_COLLECTOR:
+        return str(collected_times(file_path)[-1])
+    return file_hash(file_path)
+
+
+def dataset_cache_path(file_path, mode, cache_folder=DATASET_CACHE_FOLDER):
+    """Archivo del cache binario para el contenido actual del origen."""
+    key = json.dumps([DATASET_CACHE_FORMAT, mode, os.path.abspath(file_path), source_identity(file_path, mode),
+                      STORE_COLUMNS, G1_PREMIUM_THRESHOLD])
+    return os.path.join(cache_folder, f"dataset-{hashlib.sha256(key.encode()).hexdigest()[:16]}.pkl")
+
+
+def read_dataset_cache(cache_file):
+    """Dataset del cache (con la versión de sus orígenes) o None si no existe o no se puede leer."""
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        with open(cache_file, 'rb') as file:
+            dataset = pickle.load(file)
+    except Exception as cache_error:
+        logger.warning(f"Cache de dataset inválido, se descarta ({cache_file}): {cache_error}")
+        return None
+    os.utime(cache_file)  # El más usado es el último en descartarse
+    return dataset
+
+
+def write_dataset_cache(dataset, cache_file, keep=DATASET_CACHE_KEEP):
+    """Guarda el dataset de forma atómica y conserva solo los keep caches más recientes."""
+    cache_folder = os.path.dirname(cache_file)
+    os.makedirs(cache_folder, exist_ok=True)
+    # Temporal único: los workers de gunicorn pueden guardar el mismo cache a la vez
+    file_descriptor, temp_file = tempfile.mkstemp(dir=cache_folder, prefix=".dataset-", suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, 'wb') as file:
+            pickle.dump(dataset, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, cache_file)
+    except Exception:
+        os.remove(temp_file)
+        raise
+    cache_files = []
+    for entry in os.scandir(cache_folder):
+        if entry.name.endswith(".pkl"):
+            try:
+                cache_files.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue  # Otro worker ya lo descartó
+    for _, old_file in sorted(cache_files, reverse=True)[keep:]:
+        try:
+            os.remove(old_file)
+        except FileNotFoundError:
+            pass
+
+
+def load_dataset(file_path, cache_folder=DATASET_CACHE_FOLDER):
+    """Carga el origen configurado (store, consolidado o CSV) y construye el dataset.
+
+    Si cache_folder tiene el dataset ya preprocesado para el mismo contenido del
+    origen, se carga de ahí; si no, se arma y se guarda para el próximo arranque.
+    """
+    start = time.perf_counter()
+    mode = source_mode(file_path)
+    cache_file = dataset_cache_path(file_path, mode, cache_folder) if cache_folder else None
+    if cache_file:
+        dataset = read_dataset_cache(cache_file)
+        if dataset is not None:
+            # El cache se busca por contenido: la versión sale del estado actual de los orígenes
+            dataset.version = source_version(dataset.mode, dataset.sources)
+            logger.info(f"Dataset cargado del cache binario en {time.perf_counter() - start:.2f} s "
+                  f"({len(dataset.data)} filas, {cache_file}).")
+            return dataset
+
+    if mode == MODE_STORE:
+        # Store de snapshots: se lee solo el snapshot más reciente (ya con tipos compactos)
+        snapshot_time = list_snapshots(file_path)[-1]
+        data = read_snapshots(snapshot_time=snapshot_time, columns=STORE_COLUMNS, store_folder=file_path)
+        sources = [snapshot_time]
+    elif mode == MODE_COLLECTOR:
+        # Store del recolector: snapshot reconstruido a partir del último base y sus deltas
+        data = read_collected_snapshot(columns=STORE_COLUMNS, store_folder=file_path)
+        sources = collected_times(file_path)[-1:]
+    elif mode == MODE_COMBINED:
+        # Consolidado incremental: se resuelven los contratos repetidos (queda la última versión)
+        # La versión sale del propio archivo (haya o no manifiesto): cambia al volver a consolidar
+        data = compact_frame(read_consolidated(file_path), source=file_path)
+        sources = [os.path.abspath(file_path)]
+    else:
+        data = load_uoa_csv(file_path)
+        sources = [os.path.abspath(file_path)]
+    logger.debug(f"Datos cargados: {data.shape}")
+
+    # Columnas derivadas (Premium, Color, Year/Month/Day de Exp Date) calculadas una sola vez
+    data = add_derived_columns(data)
+    dataset = UOADataset(data, source_version(mode, sources), mode, sources)
+    logger.info(f"Dataset preprocesado en {time.perf_counter() - start:.2f} s.")
+    if cache_file:
+        cache_start = time.perf_counter()
+        try:
+            write_dataset_cache(dataset, cache_file)
+            logger.debug(f"Cache binario guardado en {time.perf_counter() - cache_start:.2f} s ({cache_file}).")
+        except Exception as cache_error:
+            logger.warning(f"No se pudo guardar el cache del dataset: {cache_error}")
+    return dataset
+
+
+def find_new_snapshot_files(folder, known_sources, newer_than=None):
+    """UOA_<timestamp>.csv de la carpeta que aún no están en known_sources, ordenados por momento."""
+    new_files = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not SNAPSHOT_FILE_PATTERN.match(entry.name):
+                continue
+            path = os.path.abspath(entry.path)
+            if path in known_sources:
+                continue
+            if newer_than is not None and parse_snapshot_time(entry.name) <= newer_than:
+                continue
+            new_files.append(path)
+    return sorted(new_files, key=parse_snapshot_time)
+
+
+def refresh_dataset(file_path, dataset, cache_folder=DATASET_CACHE_FOLDER):
+    """Devuelve un dataset nuevo si cambiaron los datos, o None si no hay cambios.
+
+    En modo store/snapshot el snapshot más reciente reemplaza al anterior. En modo
+    consolidado solo se relee el consolidado cuando cambia su versión (se volvió a
+    consolidar); los UOA_<timestamp>.csv sueltos de la carpeta no se le agregan.
+    """
+    if dataset.mode is None:
+        # La carga inicial falló: se reintenta completa
+        return load_dataset(file_path, cache_folder)
+
+    if dataset.mode == MODE_COMBINED:
+        if source_version(dataset.mode, [os.path.abspath(file_path)]) == dataset.version:
+            return None
+        return load_dataset(file_path, cache_folder)
+
+    if dataset.mode == MODE_STORE:
+        snapshots = list_snapshots(file_path)
+        if not snapshots or (dataset.sources and snapshots[-1] <= dataset.sources[-1]):
+            return None
+        data = read_snapshots(snapshot_time=snapshots[-1], columns=STORE_COLUMNS, store_folder=file_path)
+        return UOADataset(add_derived_columns(data), source_version(dataset.mode, snapshots[-1:]), dataset.mode,
+                          snapshots[-1:])
+
+    if dataset.mode == MODE_COLLECTOR:
+        # Los ciclos 'unchanged' no cuentan: solo se recarga si hubo un base o delta nuevo
+        times = collected_times(file_path)
+        if not times or (dataset.sources and times[-1] <= dataset.sources[-1]):
+            return None
+        data = read_collected_snapshot(columns=STORE_COLUMNS, store_folder=file_path)
+        return UOADataset(add_derived_columns(data), source_version(dataset.mode, times[-1:]), dataset.mode, times[-1:])
+
+    folder = os.path.dirname(os.path.abspath(file_path))
+    current_time = source_time(dataset.sources[-1]) if dataset.sources else None
+    new_files = find_new_snapshot_files(folder, set(dataset.sources), newer_than=current_time)
+    if not new_files:
+        return None
+    data = add_derived_columns(load_uoa_csv(new_files[-1]))
+    return UOADataset(data, source_version(dataset.mode, new_files[-1:]), dataset.mode, new_files[-1:])
+
+
+# Funciones que el watcher llama en cada revisión, antes de publicar un dataset nuevo (p. ej. el replay)
+_refresh_hooks = []
+
+
+def on_refresh(function):
+    """Registra function() para que el watcher la llame en cada revisión de la carpeta de datos."""
+    _refresh_hooks.append(function)
+    return function
+
+
+def run_refresh_hooks():
+    for function in _refresh_hooks:
+        try:
+            function()
+        except Exception as hook_error:
+            logger.error(f"Error al actualizar {getattr(function, '__qualname__', function)}: {hook_error}")
+
+
+class DatasetWatcher(threading.Thread):
+    """Hilo en segundo plano que revisa la carpeta de datos y publica datasets nuevos.
+
+    Con initial_load primero hace la carga inicial (el servidor ya atiende mientras
+    tanto); loaded se activa cuando termina, haya funcionado o no.
+    """
+
+    def __init__(self, file_path, interval=WATCH_INTERVAL, initial_load=False):
+        super().__init__(name="uoa-dataset-watcher", daemon=True)
+        self.file_path = file_path
+        self.interval = interval
+        self.initial_load = initial_load
+        self.load_error = None
+        self.loaded = threading.Event()
+        self._stop_event = threading.Event()
+        if not initial_load:
+            self.loaded.set()
+
+    def run(self):
+        if self.initial_load:
+            start = time.perf_counter()
+            try:
+                dataset = load_dataset(self.file_path)
+                run_refresh_hooks()
+                set_dataset(dataset)
+                logger.info(f"Carga inicial en segundo plano terminada en {time.perf_counter() - start:.2f} s.")
+            except Exception as load_error:
+                self.load_error = load_error
+                logger.error(f"Error al cargar o procesar los datos: {load_error}")
+            finally:
+                self.loaded.set()
+        if self.interval <= 0:
+            return
+        while not self._stop_event.wait(self.interval):
+            try:
+                dataset = refresh_dataset(self.file_path, get_dataset())
+                # Los hooks terminan antes de publicar: quien vea la versión nueva ya ve sus datos
+                run_refresh_hooks()
+                if dataset is not None:
+                    set_dataset(dataset)
+            except Exception as watch_error:
+                logger.error(f"Error al recargar los datos: {watch_error}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_watcher = None
+
+
+def start_watcher(file_path, interval=WATCH_INTERVAL, initial_load=False):
+    """Inicia la recarga en caliente (no hace nada si interval es 0 y no hay carga inicial)."""
+    global _watcher
+    if interval <= 0 and not initial_load:
+        return None
+    _watcher = DatasetWatcher(file_path, interval, initial_load)
+    _watcher.start()
+    if initial_load:
+        logger.info("Cargando los datos en segundo plano.")
+    if interval > 0:
+        logger.info(f"Revisando nuevos snapshots cada {interval} s.")
+    return _watcher
+
+
+def dataset_loading():
+    """True mientras la carga inicial en segundo plano no terminó."""
+    return _watcher is not None and not _watcher.loaded.is_set()
+
+
+def dataset_load_error():
+    """Error de la carga inicial en segundo plano (None si no hubo)."""
+    return _watcher.load_error if _watcher is not None else None
@@ -0,0 +1,126 @@
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import platform
+
+# Constantes de inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct("iIII")
+
+# Extensiones de archivos que todavía se están descargando
+PARTIAL_SUFFIXES = ('.crdownload', '.part', '.tmp')
+
+# Intervalo de revisión cuando no hay inotify
+DEFAULT_POLL_INTERVAL = 0.2
+
+
+def is_finished_download(file_name, suffix='.csv'):
+    """True si el archivo es una descarga terminada (no un .crdownload ni temporal)."""
+    return file_name.endswith(suffix) and not file_name.endswith(PARTIAL_SUFFIXES)
+
+
+def load_inotify():
+    """libc con inotify si el sistema lo soporta (None en Windows/macOS o si falla)."""
+    if platform.system() != 'Linux':
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class DownloadWaiter:
+    """Espera a que aparezca un archivo terminado en una carpeta de descargas.
+
+    Se arma antes de iniciar la descarga (with DownloadWaiter(folder) as waiter: ...)
+    para no perder eventos. En Linux usa inotify: Chrome escribe el .crdownload y al
+    terminar lo renombra al .csv final, lo que genera IN_MOVED_TO. En otros sistemas,
+    o si inotify falla, revisa la carpeta cada poll_interval segundos.
+    """
+
+    def __init__(self, folder, suffix='.csv', poll_interval=DEFAULT_POLL_INTERVAL, use_inotify=True):
+        self.folder = os.path.abspath(folder)
+        self.suffix = suffix
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.backend = None
+        self._fd = None
+        self._known_files = set()
+
+    def __enter__(self):
+        os.makedirs(self.folder, exist_ok=True)
+        libc = load_inotify() if self.use_inotify else None
+        if libc is not None:
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0 and libc.inotify_add_watch(fd, os.fsencode(self.folder), IN_CLOSE_WRITE | IN_MOVED_TO) >= 0:
+                self._fd = fd
+                self.backend = 'inotify'
+            elif fd >= 0:
+                os.close(fd)
+        if self._fd is None:
+            self.backend = 'polling'
+        # Archivos ya presentes: no cuentan como descarga nueva
+        self._known_files = set(os.listdir(self.folder))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        return False
+
+    def _scan(self):
+        """Busca en la carpeta un archivo terminado que no estaba al armar la espera."""
+        candidates = [name for name in os.listdir(self.folder)
+                      if name not in self._known_files and is_finished_download(name, self.suffix)]
+        if not candidates:
+            return None
+        return max((os.path.join(self.folder, name) for name in candidates), key=os.path.getmtime)
+
+    def _read_events(self):
+        """Nombres de archivo de los eventos inotify pendientes."""
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except OSError as read_error:
+            if read_error.errno == errno.EAGAIN:
+                return []
+            raise
+        names = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(buffer):
+            _, _, _, name_length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            names.append(buffer[offset:offset + name_length].rstrip(b'\0').decode(errors='replace'))
+            offset += name_length
+        return names
+
+    def wait(self, timeout=30):
+        """Ruta del archivo descargado apenas está completo, o None si se agota el tiempo."""
+        deadline = time.monotonic() + timeout
+        # La descarga pudo terminar antes de llamar a wait()
+        finished_file = self._scan()
+        while finished_file is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if self._fd is not None:
+                ready, _, _ = select.select([self._fd], [], [], remaining)
+                if not ready:
+                    return None
+                for name in self._read_events():
+                    if name not in self._known_files and is_finished_download(name, self.suffix):
+                        return os.path.join(self.folder, name)
+            else:
+                time.sleep(min(self.poll_interval, remaining))
+                finished_file = self._scan()
+        return finished_file
@@ -0,0 +1,103 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+from UOA_metrics import logger
+
+# Memoria máxima del cache de figuras (MB de JSON serializado)
+FIGURE_CACHE_MB = float(os.getenv("UOA_FIGURE_CACHE_MB", "64"))
+
+
+class FigureCache:
+    """Cache LRU de figuras, acotado por bytes.
+
+    La clave empieza con la versión del dataset: al publicarse una versión nueva
+    se descartan todas las figuras anteriores. Guarda la figura como dict, listo para
+    devolver desde el callback sin volver a parsearla; su tamaño es el largo del JSON
+    medido al guardarla. El dict se comparte entre pedidos: no se debe modificar.
+    """
+
+    def __init__(self, max_bytes=int(FIGURE_CACHE_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_version(self, version):
+        """Vacía el cache si cambió la versión del dataset."""
+        if version != self.version:
+            if self._entries:
+                logger.debug(f"Cache de figuras invalidado: versión {self.version} -> {version} ({len(self._entries)} figuras).")
+            self._entries.clear()
+            self.current_bytes = 0
+            self.version = version
+
+    def get(self, key):
+        """Figura (dict, o None) y la marca como usada recientemente."""
+        with self._lock:
+            self._check_version(key[0])
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, figure, size):
+        """Guarda una figura de size bytes y descarta las menos usadas si se pasa del límite."""
+        with self._lock:
+            self._check_version(key[0])
+            if size > self.max_bytes:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+            self._entries[key] = (figure, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_build(self, key, build_figure):
+        """Figura del cache o, si no está, la construye con build_figure() y la guarda."""
+        figure = self.get(key)
+        if figure is None:
+            # Se serializa una sola vez, al construirla: el JSON da el tamaño y el dict es lo que se sirve
+            figure_json = build_figure().to_json()
+            figure = json.loads(figure_json)
+            self.put(key, figure, len(figure_json))
+        return figure
+
+    def invalidate(self):
+        """Descarta todas las figuras."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Contadores del cache."""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def summary(self):
+        """Resumen de una línea de los contadores."""
+        stats = self.stats()
+        return (f"Cache de figuras: {stats['entries']} figuras, {stats['bytes'] / 1e6:.2f}/{stats['max_bytes'] / 1e6:.0f} MB, "
+                f"{stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%}), {stats['evictions']} descartadas")
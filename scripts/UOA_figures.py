@@ -0,0 +1,175 @@
+import threading
+from UOA_aggregates import month_number, split_top_n
+from UOA_metrics import logger, record_rows
+
+# Figuras de los gráficos a partir del dataset preprocesado (las usan Visual_UOA y UOA_static_report).
+# plotly.express se importa dentro de cada función: no hace falta para arrancar el servidor.
+
+# Etiqueta de la barra que suma los Symbols fuera del Top-N del Gráfico 1
+OTHERS_LABEL = "Others"
+
+_plotly_lock = threading.Lock()
+_plotly_ready = False
+
+
+def plotly_express():
+    """plotly.express con la plantilla por defecto ya inicializada.
+
+    plotly crea los objetos de la plantilla compartida la primera vez que se leen y dos hilos
+    que arman una figura a la vez pueden chocar (ValueError: Invalid value); la primera figura
+    se arma una sola vez con un lock.
+    """
+    global _plotly_ready
+    import plotly.express as px
+    if not _plotly_ready:
+        with _plotly_lock:
+            if not _plotly_ready:
+                px.bar(x=[0], y=[0])
+                _plotly_ready = True
+    return px
+
+
+# Figura vacía con un mensaje en el título
+def message_figure(title):
+    return plotly_express().bar(title=title)
+
+
+# Figura completa del Gráfico 1: Top-N y barra "Others" (en Visual_UOA la arma el navegador)
+def build_graph1_figure(dataset, top_n):
+    px = plotly_express()
+    filtered_data_g1 = dataset.filtered_data_g1
+    if filtered_data_g1.empty:
+        return px.bar(title="No hay datos disponibles para el Gráfico 1")
+
+    top, rest = split_top_n(filtered_data_g1, top_n)
+    top = top.sort_values('Premium', ascending=False)
+    symbols = top['Symbol'].astype(str).tolist()
+    premium = top['Premium'].astype(float).tolist()
+    colors = None
+    if len(rest):
+        # Barra gris con la suma del resto de los Symbols
+        symbols.append(f"{OTHERS_LABEL} ({len(rest)})")
+        premium.append(float(rest['Premium'].sum()))
+        colors = [px.colors.qualitative.Plotly[0]] * len(top) + ['lightgray']
+
+    fig = px.bar(
+        x=symbols,
+        y=premium,
+        title="Top UOA Liquidity $1M+",
+        labels={'x': 'Ticker', 'y': 'Premium'}
+    )
+    fig.update_layout(
+        xaxis_title=None,
+        yaxis_title="Premium",
+        title_font_size=18,
+        xaxis_tickangle=-45
+    )
+    if colors:
+        fig.update_traces(marker_color=colors)
+    return fig
+
+
+# Figura del Gráfico 2 a partir del cubo precalculado
+def build_graph2_figure(dataset, selected_symbol):
+    px = plotly_express()
+    # Datos agrupados por Year, Qtr, Month y Type desde el cubo precalculado
+    grouped_data = dataset.premium_cube['graph2'].slice(selected_symbol)
+    record_rows(len(grouped_data), len(grouped_data))
+    if grouped_data.empty:
+        logger.info(f"No hay datos disponibles para {selected_symbol}")
+        return px.bar(title=f"No hay datos disponibles para {selected_symbol}")
+
+    logger.debug("Datos agrupados para el Gráfico 2:\n%s", grouped_data)
+
+    # Crear el gráfico con colores personalizados
+    fig = px.bar(
+        grouped_data,
+        x='x_label',
+        y='Premium',
+        color='Type',
+        barmode='group',
+        text='Premium',
+        title=f"CALLs vs PUTs ({selected_symbol})",
+        labels={'x_label': 'Mes (Año)', 'Premium': 'Premium'},
+        color_discrete_map={
+            "Call": "blue",  # Azul para Call
+            "Put": "red"     # Rojo para Put
+        }
+    )
+
+    # Ajustar el diseño del gráfico
+    fig.update_layout(
+        xaxis=dict(tickangle=0, title=None),
+        yaxis_title="Premium",
+        title_font_size=18,
+        showlegend=True,
+        height=700,
+        margin=dict(b=150)
+    )
+    fig.update_traces(texttemplate='%{y}', textposition='outside')
+
+    return fig
+
+
+
+# Figura Pareto de los Gráficos 3 (Call) y 4 (Put) a partir del cubo precalculado
+def build_pareto_figure(dataset, selected_symbol, selected_month, selected_year, option_type):
+    px = plotly_express()
+    # Datos agrupados por Day, Strike y Color desde el cubo precalculado
+    grouped_data = dataset.premium_cube['cube'].slice(selected_symbol, option_type, selected_year, month_number(selected_month))
+    record_rows(len(grouped_data), len(grouped_data))
+    if grouped_data.empty:
+        logger.info(f"No hay datos disponibles para Symbol: {selected_symbol}, Month-Year: {selected_month} {selected_year} ({option_type})")
+        return px.bar(title=f"No hay datos disponibles para {selected_symbol} en {selected_month} {selected_year}")
+
+    graph_number = 3 if option_type == 'Call' else 4
+    logger.debug("Datos agrupados para el Gráfico %d:\n%s", graph_number, grouped_data)
+
+    # Mapa de colores forzados
+    color_map = {
+        'green': 'green',
+        'red': 'red',
+        'yellow': 'yellow',
+        'black': 'black'  # Por si hay valores inesperados
+    }
+
+    # Crear el gráfico con colores forzados
+    fig = px.bar(
+        grouped_data,
+        x='Day',
+        y='Premium',
+        color='Color',  # Usar columna Color
+        text='Strike',  # Mostrar Strike como texto
+        title=f"{selected_month} {selected_year} {option_type.upper()}s for {selected_symbol}",
+        labels={'Day': 'Day', 'Premium': 'Premium'},
+        color_discrete_map=color_map  # Forzar colores específicos
+    )
+
+    # Ajustar diseño del gráfico
+    fig.update_layout(
+        barmode='stack',  # Barras apiladas por Day
+        xaxis=dict(title=None, tickangle=-90),  # Rotar etiquetas del eje x
+        yaxis=dict(title="Premium"),
+        title=dict(font_size=18),
+        showlegend=False,  # Ocultar la leyenda de colores
+        height=700,
+        margin=dict(t=50, b=200)  # Ajustar margen para etiquetas jerárquicas
+    )
+
+    # Ajustar las barras
+    fig.update_traces(
+        texttemplate='%{text}',  # Mostrar Strike como texto
+        textposition='inside',   # Colocar texto dentro de la barra
+        insidetextanchor='middle',  # Centrar el texto
+        marker=dict(line=dict(color='black', width=1)),  # Añadir borde negro a las barras
+        textfont=dict(color='black')  # Color de texto siempre negro
+    )
+
+    return fig
+
+
+# Meses (Month, Year) del Gráfico 2 de un Symbol: cada uno tiene sus Gráficos 3 y 4
+def pareto_months(dataset, selected_symbol):
+    grouped_data = dataset.premium_cube['graph2'].slice(selected_symbol)
+    months = grouped_data.drop_duplicates(['Year', 'Month_Sort']).sort_values(['Year', 'Month_Sort'])
+    return list(zip(months['Month'], months['Year'].astype(int)))
@@ -1,11 +1,20 @@
 import os
+import json
+import hashlib
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from UOA_schema import FILL_COLUMNS, hashable_columns
 #from tkinter import Tk, filedialog
 
 # Ruta base fija para el proyecto
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DATA_FOLDER = os.path.join(BASE_DIR, "data", "UOAdataToVisualize")
+COMBINED_FILE = os.path.join(DATA_FOLDER, "UOA_Combined.csv")
+
+# Clave de contrato para deduplicar y políticas de conservación soportadas
+DEDUP_KEY = ['Symbol', 'Type', 'Strike', 'Exp Date', 'Time']
+KEEP_POLICIES = ('last', 'first')
 
 
 def ensure_folder_exists(folder_path):
@@ -26,28 +35,215 @@ def select_files():
     return file_paths
 
 
-def consolidate_files(file_paths):
-    """Consolida múltiples archivos en uno solo."""
-    consolidated_data = pd.DataFrame()
+def file_hash(file_path):
+    """Calcula el hash SHA-256 del contenido de un archivo (identifica archivos ya consolidados)."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_data_file(file_path):
+    """Lee un archivo CSV o Excel (None si el formato no está soportado)."""
+    if file_path.endswith('.csv'):
+        return pd.read_csv(file_path, thousands=',')
+    if file_path.endswith('.xlsx'):
+        return pd.read_excel(file_path, thousands=',')
+    return None
+
+
+def consolidation_paths(output_file):
+    """Rutas del manifiesto y del índice de contratos asociados a un archivo consolidado."""
+    base_path = os.path.splitext(output_file)[0]
+    return f"{base_path}_manifest.json", f"{base_path}_keys.npz"
+
+
+def load_manifest(manifest_file):
+    """Carga el manifiesto de archivos ya consolidados (vacío si no existe)."""
+    if not os.path.exists(manifest_file):
+        return {"files": {}}
+    with open(manifest_file, 'r') as file:
+        return json.load(file)
+
+
+def save_manifest(manifest, manifest_file):
+    """Guarda el manifiesto de forma atómica."""
+    temp_file = manifest_file + ".tmp"
+    with open(temp_file, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temp_file, manifest_file)
+
+
+def load_key_index(index_file):
+    """Carga el índice ordenado de hashes de contrato y de fila ya consolidados."""
+    if not os.path.exists(index_file):
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.uint64)
+    with np.load(index_file) as index:
+        return index['keys'], index['rows']
+
+
+def save_key_index(keys, rows, index_file):
+    """Guarda el índice de hashes de forma atómica."""
+    temp_file = index_file + ".tmp.npz"
+    np.savez(temp_file, keys=keys, rows=rows)
+    os.replace(temp_file, index_file)
+
+
+def hash_rows(data, columns=None):
+    """Hash de 64 bits por fila sobre las columnas indicadas (todas si es None)."""
+    subset = data if columns is None else data[columns]
+    return pd.util.hash_pandas_object(subset, index=False).to_numpy(dtype=np.uint64)
+
+
+def consolidation_hashes(data):
+    """Hash de la clave (DEDUP_KEY) y hash de los campos del fill de cada fila.
+
+    Se calculan con los tipos del esquema: la misma fila da el mismo hash venga de
+    un CSV crudo, de Excel o de datos ya tipados.
+    """
+    fill_columns = [column for column in FILL_COLUMNS if column in data.columns]
+    return hash_rows(hashable_columns(data, DEDUP_KEY)), hash_rows(hashable_columns(data, fill_columns))
+
+
+def merge_keys(known_keys, known_rows, new_keys, new_rows):
+    """Inserta claves nuevas en el índice ordenado: solo se ordenan las nuevas (O(k log k)) y se
+    ubican con búsqueda binaria; la inserción copia el índice (O(N)), por eso se hace una sola vez
+    con todas las claves nuevas de una consolidación."""
+    order = np.argsort(new_keys, kind='stable')
+    new_keys, new_rows = new_keys[order], new_rows[order]
+    positions = np.searchsorted(known_keys, new_keys)
+    return np.insert(known_keys, positions, new_keys), np.insert(known_rows, positions, new_rows)
 
+
+def classify_rows(known_keys, known_rows, key_hashes, row_hashes, keep):
+    """Filas a agregar al consolidado de un lote de archivos, en orden de llegada.
+
+    Cada contrato se compara contra el índice y contra sus apariciones anteriores del mismo
+    lote. Devuelve (máscara de filas nuevas, índice actualizado); el índice solo se copia una vez.
+    """
+    known_rows = known_rows.copy()
+    # Agrupadas por contrato, conservando el orden de llegada dentro de cada grupo
+    order = np.argsort(key_hashes, kind='stable')
+    keys, rows = key_hashes[order], row_hashes[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    last = np.ones(len(keys), dtype=bool)
+    last[:-1] = first[1:]
+
+    if len(known_keys):
+        positions = np.minimum(np.searchsorted(known_keys, keys), len(known_keys) - 1)
+        seen = known_keys[positions] == keys
+    else:
+        positions = np.zeros(len(keys), dtype=np.intp)
+        seen = np.zeros(len(keys), dtype=bool)
+
+    if keep == 'first':
+        is_new = first & ~seen
+        added = is_new
+    else:
+        # Versión anterior del contrato: la del índice para la primera aparición, si no la del lote
+        previous = np.empty_like(rows)
+        previous[1:] = rows[:-1]
+        previous[first & seen] = known_rows[positions[first & seen]]
+        has_previous = ~first | seen
+        is_new = ~has_previous | (previous != rows)
+        # La versión más reciente de cada contrato queda como su hash de fila
+        updated = last & seen
+        known_rows[positions[updated]] = rows[updated]
+        added = last & ~seen
+
+    known_keys, known_rows = merge_keys(known_keys, known_rows, keys[added], rows[added])
+    arrival_is_new = np.empty(len(keys), dtype=bool)
+    arrival_is_new[order] = is_new
+    return arrival_is_new, known_keys, known_rows
+
+
+def read_consolidated(file_path, keep='last'):
+    """Lee un archivo consolidado resolviendo los contratos repetidos según la política keep."""
+    data = pd.read_csv(file_path, thousands=',')
+    if set(DEDUP_KEY).issubset(data.columns):
+        data = data.drop_duplicates(subset=DEDUP_KEY, keep=keep, ignore_index=True)
+    return data
+
+
+def consolidate_files(file_paths, output_file=None, keep='last'):
+    """Consolida de forma incremental: solo procesa archivos nuevos y deduplica contratos.
+
+    Un manifiesto guarda el hash de contenido de cada archivo ya consolidado y un
+    índice guarda el hash de cada contrato (DEDUP_KEY); los archivos nuevos se comparan
+    juntos contra el índice (classify_rows). Con keep='first' se conserva
+    la primera versión de cada contrato; con keep='last' se añade la versión nueva
+    solo si cambió alguno de sus campos de fill (FILL_COLUMNS), y read_consolidated()
+    resuelve quedándose con la última. Price~, IV, Delta o DTE cambian en cada snapshot
+    y no cuentan como cambio: en el consolidado queda el valor de la última versión
+    agregada del contrato. Un consolidado siempre continúa con la política keep con la que
+    se armó (ValueError si no).
+    """
+    if keep not in KEEP_POLICIES:
+        raise ValueError(f"Política keep no soportada: {keep}. Usa una de {KEEP_POLICIES}")
+
+    output_file = output_file or COMBINED_FILE
+    ensure_folder_exists(os.path.dirname(output_file))
+    manifest_file, index_file = consolidation_paths(output_file)
+    manifest = load_manifest(manifest_file)
+    if manifest.get("keep", keep) != keep:
+        raise ValueError(f"{output_file} se consolidó con keep='{manifest['keep']}'; "
+                         f"no se puede continuar con keep='{keep}'")
+
+    frames = []
+    file_entries = []
     for file_path in file_paths:
-        if file_path.endswith('.csv'):
-            data = pd.read_csv(file_path)
-        elif file_path.endswith('.xlsx'):
-            data = pd.read_excel(file_path)
-        else:
+        content_hash = file_hash(file_path)
+        if content_hash in manifest["files"] or content_hash in dict(file_entries):
+            print(f"Ya consolidado, se omite: {file_path}")
+            continue
+
+        data = read_data_file(file_path)
+        if data is None:
             print(f"Formato no soportado: {file_path}")
             continue
 
-        consolidated_data = pd.concat([consolidated_data, data], ignore_index=True)
+        # Duplicados dentro del mismo archivo
+        frames.append(data.drop_duplicates(subset=DEDUP_KEY, keep=keep, ignore_index=True))
+        file_entries.append((content_hash, file_path))
 
-    # Guardar archivo consolidado
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = os.path.join(DATA_FOLDER, f"UOA_Combined_{timestamp}.csv")
-    consolidated_data.to_csv(output_file, index=False)
-    print(f"Archivo consolidado guardado en: {output_file}")
-    return output_file
+    if not frames:
+        print(f"No hay archivos nuevos para consolidar en: {output_file}")
+        return output_file
+
+    # Todos los archivos nuevos contra el índice a la vez: se busca cada contrato con búsqueda
+    # binaria y el índice se actualiza una sola vez, sin importar cuántos archivos lleguen
+    hashes = [consolidation_hashes(data) for data in frames]
+    known_keys, known_rows = load_key_index(index_file)
+    is_new, known_keys, known_rows = classify_rows(
+        known_keys, known_rows, np.concatenate([key_hashes for key_hashes, _ in hashes]),
+        np.concatenate([row_hashes for _, row_hashes in hashes]), keep)
 
+    new_frames = []
+    offset = 0
+    for data, (content_hash, file_path) in zip(frames, file_entries):
+        file_is_new = is_new[offset:offset + len(data)]
+        offset += len(data)
+        new_frames.append(data[file_is_new])
+        manifest["files"][content_hash] = {
+            "path": os.path.abspath(file_path),
+            "rows": int(len(data)),
+            "appended": int(file_is_new.sum()),
+            "ingested_at": datetime.now().isoformat(timespec='seconds'),
+        }
+        print(f"{os.path.basename(file_path)}: {int(file_is_new.sum())} de {len(data)} filas nuevas.")
+
+    # Un solo concat y un solo append: el costo depende de los archivos nuevos, no del histórico
+    new_data = pd.concat(new_frames, ignore_index=True)
+    write_header = not os.path.exists(output_file)
+    new_data.to_csv(output_file, mode='a', header=write_header, index=False)
+    save_key_index(known_keys, known_rows, index_file)
+    manifest["output_file"] = os.path.abspath(output_file)
+    manifest["keep"] = keep
+    save_manifest(manifest, manifest_file)
+    print(f"Archivo consolidado actualizado en: {output_file} (+{len(new_data)} filas)")
+    return output_file
 
 
 def select_and_consolidate_files():
@@ -0,0 +1,130 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# Lado del fill (agresor) en relación al spread Bid/Ask
+UNKNOWN = 'unknown'
+ABOVE_ASK = 'above-ask'
+BELOW_BID = 'below-bid'
+IN_SPREAD = 'in-spread'
+AT_ASK = 'at-ask'
+AT_BID = 'at-bid'
+MID = 'mid'
+
+# Orden fijo de categorías: el código de cada categoría es su posición en la lista
+SIDES = [UNKNOWN, ABOVE_ASK, BELOW_BID, IN_SPREAD]
+EXTENDED_SIDES = SIDES + [AT_ASK, AT_BID, MID]
+
+# Color usado por los gráficos para cada lado
+SIDE_COLORS = {
+    UNKNOWN: 'black',
+    ABOVE_ASK: 'green',
+    BELOW_BID: 'red',
+    IN_SPREAD: 'yellow',
+    AT_ASK: 'lightgreen',
+    AT_BID: 'salmon',
+    MID: 'gold',
+}
+
+# Tolerancia absoluta para considerar que Last coincide con Ask, Bid o Mid
+DEFAULT_TOLERANCE = 1e-6
+
+
+# Versión fila por fila (la de los callbacks originales), usada como referencia en el benchmark
+def determine_color(row):
+    if pd.isna(row['Last']) or pd.isna(row['Bid']) or pd.isna(row['Ask']):
+        return 'black'  # Default color for missing values
+    elif row['Last'] > row['Ask']:
+        return 'green'  # Verde para Last > Ask
+    elif row['Last'] < row['Bid']:
+        return 'red'    # Rojo para Last < Bid
+    else:
+        return 'yellow' # Amarillo para Bid <= Last <= Ask
+
+
+def classify_fill_side(last, bid, ask, extra_buckets=False, tolerance=DEFAULT_TOLERANCE):
+    """Clasifica cada trade según Last frente a Bid/Ask y devuelve un pd.Categorical.
+
+    Sin extra_buckets las categorías son SIDES; con extra_buckets se separan además
+    los fills en el Ask, en el Bid y en el punto medio (EXTENDED_SIDES). Un valor
+    faltante en Last, Bid o Ask siempre clasifica como 'unknown'.
+    """
+    last = np.asarray(last, dtype=np.float64)
+    bid = np.asarray(bid, dtype=np.float64)
+    ask = np.asarray(ask, dtype=np.float64)
+    categories = EXTENDED_SIDES if extra_buckets else SIDES
+
+    # np.select evalúa las condiciones en orden: la primera que se cumple gana
+    conditions = [
+        np.isnan(last) | np.isnan(bid) | np.isnan(ask),
+        last > ask,
+        last < bid,
+    ]
+    choices = [UNKNOWN, ABOVE_ASK, BELOW_BID]
+    if extra_buckets:
+        conditions += [
+            np.abs(last - ask) <= tolerance,
+            np.abs(last - bid) <= tolerance,
+            np.abs(last - (bid + ask) / 2) <= tolerance,
+        ]
+        choices += [AT_ASK, AT_BID, MID]
+
+    codes = np.select(conditions, [categories.index(choice) for choice in choices],
+                      default=categories.index(IN_SPREAD)).astype(np.int8)
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def side_to_color(sides):
+    """Traduce un Categorical de lados a un Categorical de colores (categorías en orden alfabético)."""
+    colors = sorted({SIDE_COLORS[side] for side in sides.categories})
+    lookup = np.array([colors.index(SIDE_COLORS[side]) for side in sides.categories], dtype=np.int8)
+    return pd.Categorical.from_codes(lookup[sides.codes], categories=colors)
+
+
+def add_fill_side(data, extra_buckets=False, tolerance=DEFAULT_TOLERANCE):
+    """Agrega las columnas categóricas Side y Color calculadas una sola vez para todo el frame."""
+    sides = classify_fill_side(data['Last'], data['Bid'], data['Ask'], extra_buckets, tolerance)
+    data['Side'] = sides
+    data['Color'] = side_to_color(sides)
+    return data
+
+
+def make_benchmark_data(rows, nan_fraction=0.01, seed=0):
+    """Genera Last/Bid/Ask sintéticos con valores faltantes para el benchmark."""
+    rng = np.random.default_rng(seed)
+    bid = np.round(rng.uniform(0.05, 50.0, rows), 2)
+    ask = np.round(bid + rng.uniform(0.01, 1.0, rows), 2)
+    last = np.round(bid + (ask - bid) * rng.uniform(-0.5, 1.5, rows), 2)
+    for column in (last, bid, ask):
+        column[rng.random(rows) < nan_fraction] = np.nan
+    return pd.DataFrame({'Last': last, 'Bid': bid, 'Ask': ask})
+
+
+def benchmark_fill_side(rows=200_000, repeat=3):
+    """Compara la clasificación vectorizada contra DataFrame.apply(determine_color, axis=1)."""
+    data = make_benchmark_data(rows)
+
+    start = time.perf_counter()
+    expected = data.apply(determine_color, axis=1)
+    apply_seconds = time.perf_counter() - start
+
+    vectorized_seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        colors = side_to_color(classify_fill_side(data['Last'], data['Bid'], data['Ask']))
+        vectorized_seconds = min(vectorized_seconds, time.perf_counter() - start)
+
+    if not (np.asarray(colors, dtype=object) == expected.to_numpy()).all():
+        raise AssertionError("La clasificación vectorizada no coincide con determine_color")
+
+    print(f"Filas: {rows}")
+    print(f"apply(determine_color): {apply_seconds * 1000:.1f} ms")
+    print(f"classify_fill_side:     {vectorized_seconds * 1000:.1f} ms")
+    print(f"Aceleración: {apply_seconds / vectorized_seconds:.0f}x")
+    return {'rows': rows, 'apply_seconds': apply_seconds, 'vectorized_seconds': vectorized_seconds}
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: python UOA_fill_side.py [filas]
+    benchmark_fill_side(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
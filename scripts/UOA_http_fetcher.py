@@ -0,0 +1,127 @@
+import os
+import re
+import json
+import time
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Enlace de descarga de la página de cada dataset (el mismo que usa Selenium: a.download)
+DOWNLOAD_LINK_PATTERN = re.compile(
+    r"<a\b[^>]*class=\"[^\"]*\bdownload\b[^\"]*\"[^>]*href=\"([^\"#][^\"]*)\"|"
+    r"<a\b[^>]*href=\"([^\"#][^\"]*)\"[^>]*class=\"[^\"]*\bdownload\b[^\"]*\"",
+    re.IGNORECASE,
+)
+
+# Primera columna del encabezado de los CSV de Barchart
+CSV_HEADER_PREFIX = b"Symbol"
+
+REQUEST_TIMEOUT = 30
+
+
+class SessionExpiredError(Exception):
+    """Las cookies ya no son válidas: Barchart redirige al login."""
+
+
+def load_cookies(cookies_file):
+    """Cookies guardadas de un login anterior (lista vacía si no hay)."""
+    if not os.path.exists(cookies_file):
+        return []
+    with open(cookies_file, 'r') as file:
+        return json.load(file)
+
+
+def save_cookies(cookies, cookies_file):
+    """Guarda las cookies capturadas por el login de Selenium."""
+    temp_file = cookies_file + ".tmp"
+    with open(temp_file, 'w') as file:
+        json.dump(cookies, file)
+    os.replace(temp_file, cookies_file)
+
+
+def create_http_session(cookies, user_agent, pool_size=3):
+    """Sesión HTTP con pool de conexiones, reintentos y las cookies del navegador."""
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": user_agent})
+    for cookie in cookies:
+        session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+    return session
+
+
+def find_download_url(page_url, html):
+    """URL absoluta del enlace de descarga de la página (None si no tiene)."""
+    match = DOWNLOAD_LINK_PATTERN.search(html)
+    if not match:
+        return None
+    return urljoin(page_url, match.group(1) or match.group(2))
+
+
+def fetch_dataset(session, dataset_name, page_url, target_folder):
+    """Descarga un dataset por HTTP y lo deja en target_folder/<dataset>.csv (mismo contrato que download_data)."""
+    page = session.get(page_url, timeout=REQUEST_TIMEOUT)
+    page.raise_for_status()
+    if "/login" in page.url:
+        raise SessionExpiredError(f"La sesión expiró al abrir {page_url}")
+
+    download_url = find_download_url(page.url, page.text)
+    if download_url is None:
+        raise ValueError(f"No se encontró el enlace de descarga en {page_url}")
+
+    final_path = os.path.join(target_folder, f"{dataset_name}.csv")
+    temp_path = final_path + ".part"
+    with session.get(download_url, timeout=REQUEST_TIMEOUT, stream=True) as response:
+        response.raise_for_status()
+        if "/login" in response.url:
+            raise SessionExpiredError(f"La sesión expiró al descargar {download_url}")
+        try:
+            with open(temp_path, 'wb') as file:
+                first_chunk = True
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    if first_chunk and not chunk.lstrip(b"\xef\xbb\xbf").startswith(CSV_HEADER_PREFIX):
+                        raise ValueError(f"La respuesta de {download_url} no es un CSV de Barchart")
+                    first_chunk = False
+                    file.write(chunk)
+        except Exception:
+            # Descarga cortada o respuesta inválida: no dejar el .part a medias en la carpeta
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    os.replace(temp_path, final_path)
+    return final_path
+
+
+def fetch_datasets(session, datasets, target_folder, max_workers=None):
+    """Descarga los datasets en paralelo con la sesión HTTP; devuelve (rutas, tiempos, expirada).
+
+    Un dataset que falla queda con ruta None para que el llamador use Selenium con él.
+    """
+    os.makedirs(target_folder, exist_ok=True)
+    dataset_paths = {}
+    timings = {}
+    session_expired = False
+
+    def fetch_one(dataset_name, page_url):
+        start = time.perf_counter()
+        try:
+            return dataset_name, fetch_dataset(session, dataset_name, page_url, target_folder), time.perf_counter() - start, None
+        except Exception as fetch_error:
+            return dataset_name, None, time.perf_counter() - start, fetch_error
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(datasets) or 1) as executor:
+        for dataset_name, dataset_path, seconds, fetch_error in executor.map(lambda item: fetch_one(*item), datasets.items()):
+            dataset_paths[dataset_name] = dataset_path
+            timings[dataset_name] = seconds
+            if fetch_error is None:
+                print(f"{dataset_name}: descarga HTTP en {seconds:.2f} s.")
+            else:
+                session_expired = session_expired or isinstance(fetch_error, SessionExpiredError)
+                print(f"{dataset_name}: falló la descarga HTTP ({fetch_error}).")
+
+    return dataset_paths, timings, session_expired
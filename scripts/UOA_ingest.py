@@ -0,0 +1,109 @@
+import io
+import time
+import pandas as pd
+from UOA_schema import apply_schema
+
+# Línea de pie que Barchart agrega al final de cada descarga
+FOOTER_MARKER = b"Downloaded from Barchart.com"
+
+# Filas por chunk al parsear (acota la memoria sin importar el tamaño de la descarga)
+CHUNK_ROWS = 100_000
+
+
+class FooterFilter(io.RawIOBase):
+    """Lector de un CSV descargado que descarta las líneas del pie de Barchart al vuelo.
+
+    Reemplaza a clean_data: en lugar de leer y reescribir el archivo completo, pandas
+    lee a través de este filtro y nunca ve el pie. Cuenta bytes y líneas leídos.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.bytes_read = 0
+        self.lines = 0
+        self.footer_lines = 0
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            line = self.file.readline()
+            if not line:
+                return 0
+            self.bytes_read += len(line)
+            self.lines += 1
+            if FOOTER_MARKER in line:
+                self.footer_lines += 1
+                continue
+            self._pending = line
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+class CsvSink:
+    """Destino que agrega cada chunk a un CSV (el encabezado solo en el primero)."""
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.rows = 0
+
+    def write(self, data):
+        data.to_csv(self.output_file, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        self.rows += len(data)
+
+
+def ingest_csv(file_path, sinks, chunk_rows=CHUNK_ROWS, counters=None):
+    """Lee un CSV de Barchart por chunks, sin el pie, y escribe cada chunk tipado en los sinks.
+
+    Cada sink es un objeto con write(data) (SnapshotWriter, CsvSink). Devuelve los
+    contadores de la etapa: bytes y líneas leídos, líneas de pie descartadas, filas,
+    chunks y segundos de parseo, esquema y escritura. Si se pasa counters, acumula ahí.
+    """
+    counters = counters if counters is not None else new_counters()
+    with open(file_path, 'rb') as raw_file:
+        reader = FooterFilter(raw_file)
+        chunks = pd.read_csv(io.BufferedReader(reader), thousands=',', chunksize=chunk_rows)
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            counters['parse_seconds'] += time.perf_counter() - start
+            if chunk is None:
+                break
+
+            start = time.perf_counter()
+            chunk = apply_schema(chunk, source=str(file_path))
+            counters['schema_seconds'] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            for sink in sinks:
+                sink.write(chunk)
+            counters['write_seconds'] += time.perf_counter() - start
+            counters['rows'] += len(chunk)
+            counters['chunks'] += 1
+
+        counters['bytes_read'] += reader.bytes_read
+        counters['lines'] += reader.lines
+        counters['footer_lines'] += reader.footer_lines
+    counters['files'] += 1
+    return counters
+
+
+def new_counters():
+    """Contadores vacíos de la etapa de ingesta."""
+    return {
+        'files': 0, 'bytes_read': 0, 'lines': 0, 'footer_lines': 0, 'rows': 0, 'chunks': 0,
+        'parse_seconds': 0.0, 'schema_seconds': 0.0, 'write_seconds': 0.0,
+    }
+
+
+def format_counters(counters):
+    """Resumen de una línea de los contadores de ingesta."""
+    return (f"{counters['files']} archivos, {counters['bytes_read'] / 1e6:.2f} MB, {counters['lines']} líneas "
+            f"({counters['footer_lines']} de pie descartadas), {counters['rows']} filas en {counters['chunks']} chunks; "
+            f"parseo {counters['parse_seconds']:.2f} s, esquema {counters['schema_seconds']:.2f} s, "
+            f"escritura {counters['write_seconds']:.2f} s")
+
@@ -0,0 +1,210 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+import diskcache
+from UOA_file_selector import BASE_DIR
+from UOA_metrics import metrics, count_rows
+
+# Store de trabajos compartido por todos los workers de gunicorn (diskcache: SQLite en disco,
+# sin broker externo). Cualquier worker puede lanzar, consultar o leer el resultado de un trabajo.
+JOB_FOLDER = os.getenv("UOA_JOB_FOLDER", os.path.join(BASE_DIR, "data", "UOAjobs"))
+
+# Trabajos que cada worker ejecuta a la vez (cada uno en su propio proceso)
+JOB_WORKERS = int(os.getenv("UOA_JOB_WORKERS", "2"))
+
+# Segundos que se conservan el estado y el resultado de un trabajo (sirven a los pedidos que llegan después)
+JOB_EXPIRE = int(os.getenv("UOA_JOB_EXPIRE", "900"))
+
+# Un trabajo 'running' más viejo que esto se da por perdido (p. ej. se reinició su worker) y se relanza
+JOB_TIMEOUT = int(os.getenv("UOA_JOB_TIMEOUT", "300"))
+
+# Tamaño máximo del store en disco (MB)
+JOB_CACHE_MB = int(os.getenv("UOA_JOB_CACHE_MB", "256"))
+
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+# Contadores globales (de todos los workers) guardados en el store
+COUNTER_SUBMITTED = ('counter', 'submitted')
+COUNTER_DEDUPLICATED = ('counter', 'deduplicated')
+
+
+def job_key(key):
+    return ('job',) + tuple(key)
+
+
+def result_key(key):
+    return ('result',) + tuple(key)
+
+
+class Job:
+    """Estado de un trabajo leído del store: una foto, se vuelve a leer con JobStore.get().
+
+    Dentro del proceso del trabajo, report() envía el avance al worker, que lo publica en
+    el store para que cualquier worker lo muestre.
+    """
+
+    def __init__(self, key, record, reporter=None):
+        self.key = tuple(key)
+        self.status = record['status']
+        self.progress = record['progress']
+        self.message = record['message']
+        self.started = record['started']
+        self.finished = record['finished']
+        self.error = record['error']
+        self._reporter = reporter
+
+    def record(self):
+        return {'status': self.status, 'progress': self.progress, 'message': self.message,
+                'started': self.started, 'finished': self.finished, 'error': self.error}
+
+    def report(self, progress, message=None):
+        """Lo llama la función del trabajo para informar su avance."""
+        self.progress = progress
+        if message is not None:
+            self.message = message
+        if self._reporter is not None:
+            self._reporter(self)
+
+    def done(self):
+        return self.status in (STATUS_DONE, STATUS_FAILED)
+
+    def failed(self):
+        return self.status == STATUS_FAILED
+
+    def elapsed(self):
+        return (self.finished or time.time()) - self.started
+
+
+class JobStore:
+    """Trabajos en segundo plano deduplicados por clave entre todos los workers.
+
+    submit() con la clave de un trabajo en curso o ya terminado (en cualquier worker)
+    devuelve ese mismo trabajo; si no existe, lo registra y lo ejecuta en un proceso
+    hijo (fork del worker, con el dataset ya cargado); el worker publica en el store el
+    avance y el resultado que el proceso le envía. Los pedidos solo leen el store: nunca esperan el resultado.
+    Un trabajo que falló solo se vuelve a ejecutar con submit(..., retry=True).
+    La duración y las filas de cada trabajo van a las métricas con el nombre del trabajo.
+    """
+
+    def __init__(self, folder=JOB_FOLDER, workers=JOB_WORKERS, expire=JOB_EXPIRE, timeout=JOB_TIMEOUT,
+                 size_limit=JOB_CACHE_MB * 1024 * 1024, registry=metrics):
+        self.folder = folder
+        self.expire = expire
+        self.timeout = timeout
+        self.workers = workers
+        self.registry = registry
+        self._cache = diskcache.Cache(folder, size_limit=size_limit)
+        self._executor = None
+        self._executor_pid = None
+
+    def submit(self, key, function, retry=False, name=None):
+        """Trabajo de la clave key; si no existe, lo crea y ejecuta function(job) en un proceso hijo."""
+        with self._cache.transact():
+            job = self.get(key)
+            if job is not None and not (retry and job.failed()) and not self._lost(job):
+                self._cache.incr(COUNTER_DEDUPLICATED)
+                return job
+            job = Job(key, {'status': STATUS_RUNNING, 'progress': 0.0, 'message': "", 'started': time.time(),
+                            'finished': None, 'error': None})
+            self._cache.set(job_key(key), job.record(), expire=self.expire)
+            self._cache.delete(result_key(key))
+            self._cache.incr(COUNTER_SUBMITTED)
+        self._pool().submit(self._launch, job, function, name or function.__name__)
+        return job
+
+    def get(self, key):
+        """Estado actual del trabajo de la clave key (None si no existe o ya expiró)."""
+        record = self._cache.get(job_key(key))
+        return None if record is None else Job(key, record)
+
+    def result(self, key):
+        """Resultado de un trabajo terminado (None si no terminó, falló o ya expiró)."""
+        return self._cache.get(result_key(key))
+
+    def update(self, job):
+        """Publica el estado de un trabajo."""
+        self._cache.set(job_key(job.key), job.record(), expire=self.expire)
+
+    def running(self):
+        """Trabajos en curso en todos los workers."""
+        running = 0
+        for key in self._cache.iterkeys():
+            if key[0] == 'job':
+                record = self._cache.get(key)
+                running += record is not None and record['status'] == STATUS_RUNNING
+        return running
+
+    @property
+    def submitted(self):
+        return self._cache.get(COUNTER_SUBMITTED, 0)
+
+    @property
+    def deduplicated(self):
+        return self._cache.get(COUNTER_DEDUPLICATED, 0)
+
+    def clear(self):
+        self._cache.clear()
+
+    def _lost(self, job):
+        return not job.done() and time.time() - job.started > self.timeout
+
+    def _pool(self):
+        # Los hilos no sobreviven al fork de gunicorn: cada worker arma su propio pool
+        if self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="uoa-job")
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def _launch(self, job, function, name):
+        # El hilo solo espera al proceso: el cálculo no compite por el GIL con los pedidos del worker.
+        # El proceso no usa el store: una conexión SQLite no sobrevive a un fork mientras otros hilos
+        # del worker la usan, así que le envía avance y resultado por un pipe a este hilo.
+        start = time.perf_counter()
+        rows = (0, 0)
+        context = multiprocessing.get_context("fork")
+        reader, writer = context.Pipe(duplex=False)
+        process = context.Process(target=self._run, args=(job, function, writer), name="uoa-job", daemon=True)
+        process.start()
+        writer.close()
+        with reader:
+            while True:
+                try:
+                    message = reader.recv()
+                except EOFError:
+                    break
+                if message[0] == 'progress':
+                    job.progress, job.message = message[1], message[2]
+                    self.update(job)
+                elif message[0] == STATUS_DONE:
+                    rows = message[2]
+                    self._cache.set(result_key(job.key), message[1], expire=self.expire)
+                    self._finish(job, STATUS_DONE)
+                else:
+                    self._finish(job, STATUS_FAILED, message[1])
+        process.join()
+        if not job.done():
+            self._finish(job, STATUS_FAILED, f"El proceso del trabajo terminó con código {process.exitcode}")
+        # Se registra en el worker: las métricas del proceso hijo se pierden al terminar
+        self.registry.observe(name, time.perf_counter() - start, rows[0], rows[1], job.failed())
+
+    def _run(self, job, function, writer):
+        job._reporter = lambda job: writer.send(('progress', job.progress, job.message))
+        try:
+            # Las filas que informan las funciones de UOA_figures (record_rows) viajan con el resultado
+            with count_rows() as rows:
+                result = function(job)
+        except Exception as job_error:
+            writer.send((STATUS_FAILED, f"{type(job_error).__name__}: {job_error}"))
+        else:
+            writer.send((STATUS_DONE, result, (rows['rows_scanned'], rows['rows_returned'])))
+        writer.close()
+
+    def _finish(self, job, status, error=None):
+        job.status = status
+        job.error = error
+        job.progress = 1.0
+        job.finished = time.time()
+        self.update(job)
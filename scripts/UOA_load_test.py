@@ -0,0 +1,170 @@
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+
+# Prueba de carga de los callbacks del dashboard.
+# 1. Iniciar el servidor de producción desde la raíz del proyecto:
+#      DEFAULT_FILE_PATH=data/UOAsnapshotStore gunicorn --chdir scripts Visual_UOA:server
+#    (para comparar, el servidor de desarrollo: python scripts/Visual_UOA.py)
+# 2. Lanzar la prueba:
+#      python scripts/UOA_load_test.py --url http://127.0.0.1:8000 --users 16 --requests 400
+# Cada usuario simulado pide Gráficos 2, 3 y 4 para Symbols al azar del Gráfico 1, igual
+# que un clic en el navegador (los Gráficos 3 y 4 lanzan un trabajo y se consulta su estado
+# hasta que termina). Se reportan solicitudes por segundo y latencias p50/p95/p99.
+
+CALLBACK_PATH = "/_dash-update-component"
+
+
+def graph2_payload(symbol, version):
+    """Cuerpo de la solicitud que envía Dash al elegir un Symbol (Gráfico 2)."""
+    return {
+        "output": "graph2.figure",
+        "outputs": {"id": "graph2", "property": "figure"},
+        "inputs": [
+            {"id": "selected-symbol-store", "property": "data", "value": symbol},
+            {"id": "dataset-version", "property": "data", "value": version},
+        ],
+        "changedPropIds": ["selected-symbol-store.data"],
+        "state": [],
+    }
+
+
+def pareto_job_payload(symbol, month_year, version, n_intervals=None):
+    """Cuerpo de la solicitud que lanza (o consulta, con n_intervals) el trabajo de los Gráficos 3 y 4."""
+    return {
+        "output": "..pareto-job.data...pareto-poll.disabled...pareto-progress.children..",
+        "outputs": [{"id": "pareto-job", "property": "data"},
+                    {"id": "pareto-poll", "property": "disabled"},
+                    {"id": "pareto-progress", "property": "children"}],
+        "inputs": [
+            {"id": "graph1", "property": "clickData", "value": {"points": [{"x": symbol}]}},
+            {"id": "graph2", "property": "clickData", "value": {"points": [{"x": month_year}]}},
+            {"id": "dataset-version", "property": "data", "value": version},
+            {"id": "pareto-poll", "property": "n_intervals", "value": n_intervals},
+        ],
+        "changedPropIds": ["pareto-poll.n_intervals" if n_intervals else "graph2.clickData"],
+        "state": [],
+    }
+
+
+def pareto_payload(graph_id, job_state):
+    """Cuerpo de la solicitud de los Gráficos 3 y 4 una vez terminado su trabajo."""
+    return {
+        "output": f"{graph_id}.figure",
+        "outputs": {"id": graph_id, "property": "figure"},
+        "inputs": [{"id": "pareto-job", "property": "data", "value": job_state}],
+        "changedPropIds": ["pareto-job.data"],
+        "state": [],
+    }
+
+
+def find_component(layout, component_id):
+    """Busca un componente por id en el layout serializado de Dash."""
+    if isinstance(layout, dict):
+        if layout.get("props", {}).get("id") == component_id:
+            return layout
+        children = layout.get("props", {}).get("children")
+        return find_component(children, component_id)
+    if isinstance(layout, list):
+        for child in layout:
+            found = find_component(child, component_id)
+            if found is not None:
+                return found
+    return None
+
+
+def load_targets(session, url):
+    """Symbols del filtro y versión del dataset publicados por el servidor."""
+    layout = session.get(f"{url}/_dash-layout", timeout=30).json()
+    options = find_component(layout, "symbol-filter")["props"].get("options") or []
+    version = find_component(layout, "dataset-version")["props"].get("data")
+    return [option["value"] for option in options], version
+
+
+def month_labels(figure):
+    """Etiquetas 'Mes (Año)' del Gráfico 2 para simular el segundo clic."""
+    labels = []
+    for trace in figure.get("data", []):
+        values = trace.get("x") or []
+        if isinstance(values, list):
+            labels.extend(values)
+    return sorted(set(labels))
+
+
+def run_load_test(url, users=8, total_requests=200, seed=0, poll_interval=0.1):
+    """Lanza total_requests interacciones repartidas entre users hilos y devuelve las métricas."""
+    url = url.rstrip("/")
+    random_generator = random.Random(seed)
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=users, pool_maxsize=users)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    symbols, version = load_targets(session, url)
+    if not symbols:
+        raise RuntimeError("El servidor no publica Symbols en el filtro.")
+
+    def interaction(_):
+        symbol = random_generator.choice(symbols)
+        latencies = []
+        start = time.perf_counter()
+        response = session.post(url + CALLBACK_PATH, json=graph2_payload(symbol, version), timeout=120)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+        figure = response.json()["response"]["graph2"]["figure"]
+        labels = month_labels(figure)
+        if labels:
+            month_year = random_generator.choice(labels)
+            # Se lanza el trabajo y se consulta su estado como lo hace el dcc.Interval del navegador
+            n_intervals = None
+            while True:
+                start = time.perf_counter()
+                response = session.post(url + CALLBACK_PATH, json=pareto_job_payload(symbol, month_year, version, n_intervals),
+                                        timeout=120)
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+                job_state = response.json()["response"].get("pareto-job", {}).get("data")
+                if job_state and job_state.get("status") != "running":
+                    break
+                n_intervals = (n_intervals or 0) + 1
+                time.sleep(poll_interval)
+            for graph_id in ("graph3", "graph4"):
+                start = time.perf_counter()
+                session.post(url + CALLBACK_PATH, json=pareto_payload(graph_id, job_state),
+                             timeout=120).raise_for_status()
+                latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        latencies = [latency for result in executor.map(interaction, range(total_requests)) for latency in result]
+    elapsed = time.perf_counter() - start
+    session.close()
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'users': users,
+        'interactions': total_requests,
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'max_ms': float(latencies.max()),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de los callbacks de Visual_UOA.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=8, help="Usuarios simultáneos")
+    parser.add_argument("--requests", type=int, default=200, help="Interacciones (Gráfico 2 + 3 + 4) en total")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    metrics = run_load_test(args.url, args.users, args.requests, args.seed)
+    print(f"{metrics['requests']} solicitudes de {metrics['users']} usuarios en {metrics['seconds']:.1f} s: "
+          f"{metrics['requests_per_second']:.1f} req/s, p50 {metrics['p50_ms']:.0f} ms, "
+          f"p95 {metrics['p95_ms']:.0f} ms, p99 {metrics['p99_ms']:.0f} ms, máx {metrics['max_ms']:.0f} ms")
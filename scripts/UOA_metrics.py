@@ -0,0 +1,302 @@
+import io
+import os
+import time
+import random
+import pstats
+import logging
+import cProfile
+import threading
+import functools
+import contextlib
+from flask import Response, g, has_request_context
+from dash.exceptions import PreventUpdate
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+                               disable_created_metrics, CONTENT_TYPE_LATEST)
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
+
+# Nivel de los mensajes de Visual_UOA (DEBUG muestra los DataFrames agrupados de cada clic)
+LOG_LEVEL = os.getenv("UOA_LOG_LEVEL", "INFO").upper()
+
+# Fracción de llamadas de cada callback que se perfilan con cProfile (0 = nunca)
+PROFILE_RATE = float(os.getenv("UOA_PROFILE_RATE", "0"))
+
+# Carpeta del modo multiproceso de prometheus_client: cada worker de gunicorn escribe ahí sus
+# métricas y /metrics devuelve la suma de todos (la define gunicorn.conf.py). Sin ella, por
+# ejemplo con el servidor de desarrollo, /metrics muestra solo las del proceso.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Límites (segundos) del histograma de duración en /metrics
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Sin las series *_created por cada counter
+disable_created_metrics()
+
+logger = logging.getLogger("uoa")
+_local = threading.local()
+
+
+def configure_logging(level=LOG_LEVEL):
+    """Configura el logger 'uoa' con el nivel indicado (una sola vez)."""
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        logger.addHandler(handler)
+    logger.setLevel(level)
+    return logger
+
+
+def record_rows(scanned=0, returned=0):
+    """Suma filas leídas y devueltas a la llamada en curso (sin efecto fuera de un callback o trabajo)."""
+    current = getattr(_local, 'current', None)
+    if current is not None:
+        current['rows_scanned'] += int(scanned)
+        current['rows_returned'] += int(returned)
+
+
+@contextlib.contextmanager
+def count_rows():
+    """Acumula las filas que informa record_rows() dentro del bloque."""
+    previous = getattr(_local, 'current', None)
+    current = {'rows_scanned': 0, 'rows_returned': 0}
+    _local.current = current
+    try:
+        yield current
+    finally:
+        _local.current = previous
+
+
+class CallbackStats:
+    """Contadores acumulados de un callback."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.last_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.rows_scanned = 0
+        self.rows_returned = 0
+        self.payload_bytes = 0
+        self.last_payload_bytes = 0
+        self.last_profile = None
+
+
+class SharedValues:
+    """Valores iguales en todos los workers (dataset, store de trabajos): los lee quien atiende /metrics."""
+
+    def __init__(self):
+        self.values = []
+
+    def collect(self):
+        for name, help_text, read_value, kind in list(self.values):
+            family = CounterMetricFamily if kind == "counter" else GaugeMetricFamily
+            yield family(name, help_text, value=read_value())
+
+
+class MetricsRegistry:
+    """Métricas de todos los callbacks y valores adicionales (gauges) para /metrics.
+
+    Las series de Prometheus suman todos los workers (ver MULTIPROC_DIR); los contadores de
+    CallbackStats, que usa el panel de depuración, son del proceso.
+    """
+
+    def __init__(self):
+        self.callbacks = {}
+        self.published = []
+        self.shared = SharedValues()
+        self.registry = CollectorRegistry()
+        self.registry.register(self.shared)
+        self._lock = threading.Lock()
+        labels = ["callback"]
+        self._calls = Counter("uoa_callback_calls", "Llamadas por callback.", labels, registry=self.registry)
+        self._errors = Counter("uoa_callback_errors", "Llamadas que terminaron con una excepción.", labels,
+                               registry=self.registry)
+        self._duration = Histogram("uoa_callback_duration_seconds", "Duración de cada llamada.", labels,
+                                   buckets=DURATION_BUCKETS, registry=self.registry)
+        self._rows_scanned = Counter("uoa_callback_rows_scanned", "Filas leídas para responder.", labels,
+                                     registry=self.registry)
+        self._rows_returned = Counter("uoa_callback_rows_returned", "Filas o puntos devueltos.", labels,
+                                      registry=self.registry)
+        self._payload_bytes = Counter("uoa_callback_payload_bytes", "Bytes de JSON devueltos.", labels,
+                                      registry=self.registry)
+
+    def stats(self, name):
+        with self._lock:
+            if name not in self.callbacks:
+                self.callbacks[name] = CallbackStats(name)
+            return self.callbacks[name]
+
+    def observe(self, name, seconds, rows_scanned, rows_returned, error=False, profile=None):
+        stats = self.stats(name)
+        with self._lock:
+            stats.calls += 1
+            stats.errors += int(error)
+            stats.seconds += seconds
+            stats.last_seconds = seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            for index, upper in enumerate(DURATION_BUCKETS):
+                if seconds <= upper:
+                    stats.buckets[index] += 1
+            stats.rows_scanned += rows_scanned
+            stats.rows_returned += rows_returned
+            if profile is not None:
+                stats.last_profile = profile
+        self._calls.labels(name).inc()
+        if error:
+            self._errors.labels(name).inc()
+        self._duration.labels(name).observe(seconds)
+        self._rows_scanned.labels(name).inc(rows_scanned)
+        self._rows_returned.labels(name).inc(rows_returned)
+
+    def observe_payload(self, name, payload_bytes):
+        """Bytes de la respuesta HTTP de una llamada (los mide register_metrics_route)."""
+        stats = self.stats(name)
+        with self._lock:
+            stats.payload_bytes += payload_bytes
+            stats.last_payload_bytes = payload_bytes
+        self._payload_bytes.labels(name).inc(payload_bytes)
+
+    def add_gauge(self, name, help_text, read_value, kind="gauge", combine=None):
+        """Registra un valor que se lee al generar /metrics (p. ej. la versión del dataset).
+
+        combine=None: el valor es el mismo en todos los workers y lo lee el que atiende /metrics.
+        combine='sum' o 'max': cada worker publica el suyo con publish() y /metrics los combina
+        (los de workers que terminaron dejan de contar); un counter siempre se suma.
+        """
+        with self._lock:
+            if combine is None:
+                self.shared.values.append((name, help_text, read_value, kind))
+            elif kind == "counter":
+                counter = Counter(name.removesuffix("_total"), help_text, registry=self.registry)
+                self.published.append([read_value, counter, 0])
+            else:
+                gauge = Gauge(name, help_text, registry=self.registry, multiprocess_mode=f"live{combine}")
+                self.published.append([read_value, gauge, None])
+
+    def publish(self):
+        """Copia a las series de Prometheus los valores propios de este worker (add_gauge con combine)."""
+        with self._lock:
+            for entry in self.published:
+                read_value, metric, last = entry
+                value = read_value()
+                if last is None:
+                    metric.set(value)
+                else:
+                    # Counter: solo se suma lo nuevo desde la última publicación
+                    if value > last:
+                        metric.inc(value - last)
+                    entry[2] = value
+
+    def prometheus_text(self):
+        """Métricas en el formato de texto de Prometheus."""
+        self.publish()
+        if MULTIPROC_DIR:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            registry.register(self.shared)
+        else:
+            registry = self.registry
+        return generate_latest(registry).decode("utf-8")
+
+    def summary(self):
+        """Tabla de texto para el panel de depuración."""
+        with self._lock:
+            callbacks = sorted(self.callbacks.values(), key=lambda stats: -stats.seconds)
+            rows = [f"Worker {os.getpid()}",
+                    f"{'callback':<28} {'llamadas':>8} {'prom ms':>8} {'últ ms':>8} {'máx ms':>8} "
+                    f"{'leídas':>10} {'devueltas':>10} {'últ KB':>8}"]
+            for stats in callbacks:
+                average = stats.seconds / stats.calls * 1000 if stats.calls else 0.0
+                rows.append(f"{stats.name:<28} {stats.calls:>8} {average:>8.1f} {stats.last_seconds * 1000:>8.1f} "
+                            f"{stats.max_seconds * 1000:>8.1f} {stats.rows_scanned:>10} {stats.rows_returned:>10} "
+                            f"{stats.last_payload_bytes / 1024:>8.1f}")
+            for stats in callbacks:
+                if stats.last_profile:
+                    rows.append(f"\nÚltimo perfil de {stats.name}:\n{stats.last_profile}")
+        return "\n".join(rows)
+
+
+metrics = MetricsRegistry()
+
+
+class StartupTimer:
+    """Duración de cada fase del arranque del proceso web, registrada en el log."""
+
+    def __init__(self, started=None):
+        self.started = started or time.perf_counter()
+        self.last = self.started
+        self.phases = {}
+
+    def mark(self, phase):
+        """Cierra la fase en curso con el nombre phase."""
+        now = time.perf_counter()
+        self.phases[phase] = now - self.last
+        logger.info(f"Arranque: {phase} en {now - self.last:.2f} s ({now - self.started:.2f} s desde el inicio)")
+        self.last = now
+
+    def total(self):
+        return self.last - self.started
+
+
+def instrument_callback(function=None, name=None, registry=metrics):
+    """Decorador para callbacks de Dash: duración, filas, bytes de respuesta y perfil opcional.
+
+    Va debajo de @app.callback. Las filas las informa el propio callback con record_rows() y
+    los bytes se miden en la respuesta HTTP (ver register_metrics_route).
+    PreventUpdate cuenta como llamada, no como error.
+    """
+    if function is None:
+        return lambda wrapped: instrument_callback(wrapped, name, registry)
+    callback_name = name or function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if has_request_context():
+            g.uoa_callback = (callback_name, registry)
+        profiler = cProfile.Profile() if PROFILE_RATE > 0 and random.random() < PROFILE_RATE else None
+        error = False
+        start = time.perf_counter()
+        with count_rows() as rows:
+            try:
+                if profiler is not None:
+                    return profiler.runcall(function, *args, **kwargs)
+                return function(*args, **kwargs)
+            except PreventUpdate:
+                # No es un error: el callback decidió no actualizar la salida
+                raise
+            except Exception:
+                error = True
+                raise
+            finally:
+                seconds = time.perf_counter() - start
+                profile = None
+                if profiler is not None:
+                    output = io.StringIO()
+                    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(15)
+                    profile = output.getvalue()
+                registry.observe(callback_name, seconds, rows['rows_scanned'], rows['rows_returned'], error, profile)
+                registry.publish()
+                logger.debug("%s: %.1f ms, %d filas leídas, %d devueltas", callback_name, seconds * 1000,
+                             rows['rows_scanned'], rows['rows_returned'])
+
+    return wrapper
+
+
+def register_metrics_route(server, path="/metrics", registry=metrics):
+    """Expone las métricas en formato Prometheus en el servidor Flask de Dash.
+
+    También mide los bytes de la respuesta de cada callback instrumentado, ya serializada por Dash.
+    """
+    def metrics_endpoint():
+        return Response(registry.prometheus_text(), content_type=CONTENT_TYPE_LATEST)
+    server.add_url_rule(path, "uoa_metrics", metrics_endpoint)
+
+    @server.after_request
+    def record_payload(response):
+        callback = g.pop('uoa_callback', None)
+        if callback is not None and not response.direct_passthrough:
+            callback_name, callback_registry = callback
+            callback_registry.observe_payload(callback_name, response.calculate_content_length() or 0)
+        return response
@@ -0,0 +1,116 @@
+import os
+import time
+import argparse
+from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Servidor local que imita las páginas de Barchart usadas por UOA_Barchart_Connection.
+# Uso: python UOA_mock_barchart.py --port 8000 --csv ../data/UOAdataToVisualize/UOA_20241220_160857.csv
+# y luego BARCHART_BASE_URL=http://127.0.0.1:8000 python UOA_Barchart_Connection.py
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_CSV = os.path.join(BASE_DIR, "data", "UOAdataToVisualize", "UOA_20241220_160857.csv")
+
+# Datasets servidos (los mismos que urls en UOA_Barchart_Connection)
+DATASETS = ("stocks", "etfs", "indices")
+SESSION_COOKIE = "laravel_session"
+SESSION_ID = "mock-session"
+FOOTER = "Downloaded from Barchart.com as of 12-20-2024 04:08pm CST\n"
+
+LOGIN_PAGE = """<html><body>
+<form method="post" action="/login">
+  <input name="email" placeholder="Login with email">
+  <input name="password" type="password" placeholder="Password">
+  <button type="submit">Log In</button>
+</form>
+</body></html>"""
+
+DATASET_PAGE = """<html><body>
+<h1>Unusual Options Activity: {dataset}</h1>
+<a class="toolbar-button download" href="/download/{dataset}.csv" download="{dataset}.csv">Download</a>
+</body></html>"""
+
+
+class MockBarchartHandler(BaseHTTPRequestHandler):
+    """Páginas de login, de cada dataset y descarga del CSV (con el pie de Barchart).
+
+    Solo vale la cookie de sesión que entrega el login: cualquier otra se trata como
+    una sesión expirada. Con cut_after, la descarga se corta tras esa cantidad de bytes.
+    """
+
+    csv_path = DEFAULT_CSV
+    delay = 0.0
+    cut_after = None
+
+    def send_body(self, body, content_type="text/html; charset=utf-8", headers=None, cut_after=None):
+        payload = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        # Un corte deja la respuesta más corta que su Content-Length y cierra la conexión
+        self.wfile.write(payload if cut_after is None else payload[:cut_after])
+
+    def redirect_to_login(self):
+        self.send_response(302)
+        self.send_header("Location", "/login")
+        self.end_headers()
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/")
+        logged_in = f"{SESSION_COOKIE}={SESSION_ID}" in self.headers.get("Cookie", "")
+        if path not in ("", "/login") and not logged_in:
+            # Igual que Barchart: sin sesión se redirige al login
+            self.redirect_to_login()
+        elif path == "/login":
+            self.send_body(LOGIN_PAGE)
+        elif path.startswith("/options/unusual-activity/") and path.rsplit("/", 1)[-1] in DATASETS:
+            self.send_body(DATASET_PAGE.format(dataset=path.rsplit("/", 1)[-1]))
+        elif path.startswith("/download/") and path[len("/download/"):-len(".csv")] in DATASETS:
+            # Simula la latencia de generación del archivo en Barchart
+            time.sleep(self.delay)
+            with open(self.csv_path, "rb") as file:
+                payload = file.read() + FOOTER.encode("utf-8")
+            file_name = os.path.basename(path)
+            self.send_body(payload, "text/csv", {"Content-Disposition": f'attachment; filename="{file_name}"'},
+                           cut_after=self.cut_after)
+        elif path == "":
+            self.send_body("<html><body>Mock Barchart</body></html>")
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        # Cualquier credencial es válida: se redirige a la página principal con una cookie de sesión
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(302)
+        self.send_header("Location", "/")
+        self.send_header("Set-Cookie", f"{SESSION_COOKIE}={SESSION_ID}; Path=/")
+        self.end_headers()
+
+
+def make_server(port=8000, csv_path=DEFAULT_CSV, delay=0.0, cut_after=None):
+    """Servidor de pruebas sin iniciar (port=0 toma un puerto libre: server.server_port)."""
+    # Cada servidor con su propia configuración (los tests levantan varios)
+    handler = type("MockBarchartHandler", (MockBarchartHandler,),
+                   {"csv_path": csv_path, "delay": delay, "cut_after": cut_after})
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+def run_server(port=8000, csv_path=DEFAULT_CSV, delay=0.0, cut_after=None):
+    """Inicia el servidor de pruebas (bloqueante)."""
+    server = make_server(port, csv_path, delay, cut_after)
+    print(f"Mock de Barchart en http://127.0.0.1:{server.server_port} sirviendo {csv_path}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local que imita Barchart para probar las descargas.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--csv", default=DEFAULT_CSV, help="CSV servido para cada dataset")
+    parser.add_argument("--delay", type=float, default=0.0, help="Segundos de espera antes de servir cada CSV")
+    parser.add_argument("--cut-after", type=int, default=None,
+                        help="Corta cada descarga tras esta cantidad de bytes (descarga interrumpida)")
+    args = parser.parse_args()
+    run_server(args.port, args.csv, args.delay, args.cut_after)
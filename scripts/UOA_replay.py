@@ -0,0 +1,173 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from UOA_snapshot_store import list_snapshots, read_snapshots, parse_snapshot_time, SNAPSHOT_FILE_PATTERN
+from UOA_collector_store import CONTRACT_KEY, collector_log_path, collected_times, read_collected_snapshot
+from UOA_file_selector import hash_rows
+from UOA_schema import load_uoa_csv, hashable_frame
+from UOA_metrics import logger
+
+# Columnas necesarias para calcular el flujo entre snapshots
+REPLAY_COLUMNS = CONTRACT_KEY + ['Last', 'Volume']
+
+
+def snapshot_loaders(file_path):
+    """[(momento, función que lee el snapshot)] del origen configurado, ordenados por momento.
+
+    Store de snapshots o del recolector si file_path es una carpeta; si es un CSV,
+    los UOA_<timestamp>.csv de su carpeta.
+    """
+    if os.path.isdir(file_path):
+        if os.path.exists(collector_log_path(file_path)):
+            return [(snapshot_time, lambda snapshot_time=snapshot_time: read_collected_snapshot(
+                        snapshot_time, columns=REPLAY_COLUMNS, store_folder=file_path))
+                    for snapshot_time in collected_times(file_path)]
+        return [(snapshot_time, lambda snapshot_time=snapshot_time: read_snapshots(
+                    snapshot_time=snapshot_time, columns=REPLAY_COLUMNS, store_folder=file_path))
+                for snapshot_time in list_snapshots(file_path)]
+
+    folder = os.path.dirname(os.path.abspath(file_path))
+    paths = sorted((os.path.join(folder, name) for name in os.listdir(folder) if SNAPSHOT_FILE_PATTERN.match(name)),
+                   key=parse_snapshot_time)
+    return [(parse_snapshot_time(path), lambda path=path: load_uoa_csv(path)[REPLAY_COLUMNS]) for path in paths]
+
+
+def contract_flow(data, previous_volume):
+    """Volumen y Premium nuevos por contrato respecto del snapshot anterior.
+
+    Volume es acumulado del día: el flujo es la diferencia con el snapshot anterior
+    (o todo el volumen si el contrato no estaba). Devuelve (flujo, volumen por contrato).
+    """
+    key_hash = hash_rows(hashable_frame(data[CONTRACT_KEY]), CONTRACT_KEY)
+    volume = pd.Series(data['Volume'].to_numpy(dtype='float64'), index=key_hash)
+    volume = volume[~volume.index.duplicated(keep='last')]
+    current = data['Volume'].to_numpy(dtype='float64')
+    if previous_volume is None:
+        before = np.zeros(len(data))
+    else:
+        before = previous_volume.reindex(key_hash).fillna(0).to_numpy()
+    # Una caída de volumen (corrección de Barchart) no es flujo negativo
+    volume_delta = np.clip(current - before, 0, None)
+    flow = pd.DataFrame({
+        'Symbol': data['Symbol'].astype(str).to_numpy(),
+        'Type': data['Type'].astype(str).to_numpy(),
+        'Strike': data['Strike'].to_numpy(),
+        'Exp Date': data['Exp Date'].to_numpy(),
+        'Volume Delta': volume_delta,
+        'Premium Delta': volume_delta * data['Last'].to_numpy(dtype='float64') * 100,
+    })
+    return flow[flow['Volume Delta'] > 0].reset_index(drop=True), volume
+
+
+class ReplayIndex:
+    """Flujo de volumen y Premium entre snapshots consecutivos, calculado de forma incremental.
+
+    refresh() solo lee los snapshots que todavía no se procesaron y los compara contra
+    el último volumen por contrato; los snapshots ya procesados no se vuelven a leer.
+    contract_flows guarda el flujo por contrato de cada snapshot. El acumulado por Symbol
+    (se reinicia cada día) es una matriz momentos x Symbols: cada snapshot le agrega una
+    fila (la anterior más su flujo), así mover el slider es leer una fila.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.times = []
+        self.contract_flows = []
+        self.symbols = []
+        self._columns = {}
+        self._matrix = np.zeros((0, 0))
+        self._previous_volume = None
+        self._previous_date = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.times)
+
+    def add_snapshot(self, snapshot_time, data):
+        """Procesa un snapshot nuevo (debe ser posterior a los ya procesados)."""
+        same_day = self._previous_date == snapshot_time.date()
+        if not same_day:
+            # Volume se reinicia cada día de mercado
+            self._previous_volume = None
+        flow, self._previous_volume = contract_flow(data, self._previous_volume)
+        self._previous_date = snapshot_time.date()
+        flow.insert(0, 'Snapshot Time', pd.Timestamp(snapshot_time))
+
+        premium = flow.groupby('Symbol', sort=False)['Premium Delta'].sum()
+        for symbol in premium.index:
+            if symbol not in self._columns:
+                self._columns[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+        position = len(self.times)
+        self._reserve(position + 1, len(self.symbols))
+        row = self._matrix[position]
+        row[:] = self._matrix[position - 1] if same_day and position else 0.0
+        row[[self._columns[symbol] for symbol in premium.index]] += premium.to_numpy()
+
+        self.contract_flows.append(flow)
+        self.times.append(snapshot_time)
+
+    def _reserve(self, rows, columns):
+        # La matriz crece al doble cuando se llena: agregar un snapshot no copia todo el acumulado
+        capacity_rows, capacity_columns = self._matrix.shape
+        if rows <= capacity_rows and columns <= capacity_columns:
+            return
+        matrix = np.zeros((max(rows, capacity_rows * 2), max(columns, capacity_columns * 2)))
+        matrix[:capacity_rows, :capacity_columns] = self._matrix
+        self._matrix = matrix
+
+    def refresh(self):
+        """Agrega los snapshots nuevos del origen; devuelve cuántos se procesaron."""
+        with self._lock:
+            last_time = self.times[-1] if self.times else None
+            added = 0
+            for snapshot_time, load_snapshot in snapshot_loaders(self.file_path):
+                if last_time is not None and snapshot_time <= last_time:
+                    continue
+                self.add_snapshot(snapshot_time, load_snapshot())
+                added += 1
+            if added:
+                logger.info(f"Replay: {added} snapshots nuevos, {len(self.times)} en total.")
+            return added
+
+    def cumulative_premium(self):
+        """Premium acumulado del día por Symbol (filas: momentos, columnas: Symbols)."""
+        with self._lock:
+            return pd.DataFrame(self._matrix[:len(self.times), :len(self.symbols)].copy(),
+                                index=pd.DatetimeIndex(self.times), columns=list(self.symbols))
+
+    def top_symbols(self, position, n=20):
+        """Los n Symbols con más Premium acumulado en el día hasta el snapshot position."""
+        with self._lock:
+            row = self._matrix[position, :len(self.symbols)].copy() if self.times else np.zeros(0)
+            symbols = np.array(self.symbols, dtype=object)
+        positive = np.flatnonzero(row > 0)
+        if len(positive) > n:
+            positive = positive[np.argpartition(-row[positive], n - 1)[:n]]
+        return pd.Series(row[positive], index=symbols[positive], dtype='float64').sort_values(ascending=False)
+
+    def symbol_flow(self, symbol, position=None):
+        """Premium nuevo por snapshot de un Symbol, del inicio de su día hasta position."""
+        with self._lock:
+            if symbol not in self._columns:
+                return pd.DataFrame(columns=['Snapshot Time', 'Premium Delta', 'Premium Acumulado'])
+            position = len(self.times) - 1 if position is None else position
+            day = self.times[position].date()
+            first = position
+            while first > 0 and self.times[first - 1].date() == day:
+                first -= 1
+            times = self.times[first:position + 1]
+            cumulative = self._matrix[first:position + 1, self._columns[symbol]].copy()
+        return pd.DataFrame({
+            'Snapshot Time': pd.DatetimeIndex(times),
+            'Premium Delta': np.diff(cumulative, prepend=0.0),
+            'Premium Acumulado': cumulative,
+        })
+
+    def top_contracts(self, position, symbol=None, n=20):
+        """Los n contratos con más Premium nuevo en el snapshot position (opcionalmente de un Symbol)."""
+        flow = self.contract_flows[position]
+        if symbol is not None:
+            flow = flow[flow['Symbol'] == symbol]
+        return flow.nlargest(n, 'Premium Delta').reset_index(drop=True)
@@ -0,0 +1,146 @@
+import logging
+import numpy as np
+import pandas as pd
+
+# Logger de la aplicación; se toma directo (no de UOA_metrics) porque el recolector también usa este módulo
+logger = logging.getLogger("uoa")
+
+# Encabezado esperado de los CSV de Unusual Options Activity de Barchart
+EXPECTED_COLUMNS = [
+    'Symbol', 'Price~', 'Type', 'Strike', 'Exp Date', 'DTE', 'Bid', 'Mid', 'Ask',
+    'Last', 'Volume', 'Open Int', 'Vol/OI', 'IV', 'Delta', 'Time'
+]
+
+# Tipo compacto de cada columna.
+# Bid/Ask/Last y Strike quedan en float64: Last se compara contra Bid/Ask y alimenta
+# Premium, y Strike se muestra como texto en los gráficos; en float32 perderían decimales.
+SCHEMA = {
+    'Symbol': 'category',
+    'Price~': 'float32',
+    'Type': 'category',
+    'Strike': 'float64',
+    'Exp Date': 'date',
+    'DTE': 'int',
+    'Bid': 'float64',
+    'Mid': 'float32',
+    'Ask': 'float64',
+    'Last': 'float64',
+    'Volume': 'int',
+    'Open Int': 'int',
+    'Vol/OI': 'float32',
+    'IV': 'percent',
+    'Delta': 'float32',
+    'Time': 'category',
+}
+
+# Columnas que definen un fill: con la clave del contrato identifican un cambio real.
+# Price~, IV, Delta o DTE se mueven en cada snapshot sin que haya operaciones nuevas.
+FILL_COLUMNS = ['Bid', 'Ask', 'Last', 'Volume', 'Open Int']
+
+
+def check_columns(data, source=""):
+    """Valida el encabezado contra EXPECTED_COLUMNS; falla si falta alguna columna."""
+    missing = [column for column in EXPECTED_COLUMNS if column not in data.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas en {source or 'los datos'}: {missing}")
+    extra = [column for column in data.columns if column not in EXPECTED_COLUMNS]
+    if extra:
+        print(f"Columnas adicionales en {source or 'los datos'} (se conservan): {extra}")
+
+
+def parse_percent(values):
+    """Convierte textos como '33.61%' a fracción (0.3361); respeta valores ya numéricos."""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype('float32')
+    cleaned = values.astype(str).str.rstrip('%').str.replace(',', '', regex=False)
+    return (pd.to_numeric(cleaned, errors='coerce') / 100).astype('float32')
+
+
+def to_compact_int(values):
+    """Entero de 32 bits con faltantes (Int32): el mismo dtype haya o no valores vacíos."""
+    return pd.to_numeric(values, errors='coerce').astype('Int32')
+
+
+def to_float(values, dtype):
+    """Numérico con el dtype indicado (acepta separadores de miles en texto)."""
+    if values.dtype == object:
+        values = values.str.replace(',', '', regex=False)
+    return pd.to_numeric(values, errors='coerce').astype(dtype)
+
+
+def schema_column(values, kind):
+    """Una columna con el tipo compacto kind de SCHEMA (sin copia si ya lo tiene)."""
+    if kind == 'category':
+        return values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype('category')
+    if kind == 'date':
+        if pd.api.types.is_datetime64_any_dtype(values):
+            return values
+        return pd.to_datetime(values, format='%Y-%m-%d', errors='coerce')
+    if kind == 'percent':
+        return parse_percent(values)
+    if kind == 'int':
+        return to_compact_int(values)
+    return values if values.dtype == np.dtype(kind) else to_float(values, kind)
+
+
+def apply_schema(data, source=""):
+    """Aplica SCHEMA a las columnas presentes: categóricas, numéricos compactos, % y fechas."""
+    check_columns(data, source)
+    for column, kind in SCHEMA.items():
+        data[column] = schema_column(data[column], kind)
+    return data
+
+
+def hashable_frame(data):
+    """Tipos uniformes para que un contrato tenga el mismo hash leído del CSV o del store.
+
+    Un entero puede llegar como Int32 (esquema) o int64 (datos sin tipar), y Parquet
+    puede devolver fechas en otra unidad; se llevan a float64 y datetime64[ns].
+    """
+    columns = {}
+    for column, values in data.items():
+        if pd.api.types.is_datetime64_any_dtype(values):
+            columns[column] = values.astype('datetime64[ns]')
+        elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            columns[column] = values.astype('float64')
+        else:
+            columns[column] = values
+    return pd.DataFrame(columns, index=data.index)
+
+
+def hashable_columns(data, columns):
+    """Las columnas indicadas con el tipo de SCHEMA y tipos uniformes, crudas o ya tipadas."""
+    typed = {column: schema_column(data[column], SCHEMA[column]) if column in SCHEMA else data[column]
+             for column in columns}
+    return hashable_frame(pd.DataFrame(typed, index=data.index))
+
+
+def memory_bytes(data):
+    """Memoria total del DataFrame, incluyendo el contenido de los strings."""
+    return int(data.memory_usage(deep=True).sum())
+
+
+def report_memory(before_bytes, after_bytes, source=""):
+    """Registra (nivel INFO) la memoria ahorrada por el esquema compacto."""
+    saved = before_bytes - after_bytes
+    percent = (saved / before_bytes * 100) if before_bytes else 0.0
+    logger.info(f"Memoria {source}: {before_bytes / 1e6:.2f} MB -> {after_bytes / 1e6:.2f} MB "
+                 f"(ahorro {saved / 1e6:.2f} MB, {percent:.0f}%)")
+    return {'before_bytes': before_bytes, 'after_bytes': after_bytes, 'saved_bytes': saved}
+
+
+def compact_frame(data, source=""):
+    """Aplica el esquema a un DataFrame ya cargado y reporta la memoria ahorrada."""
+    # Medir la memoria recorre cada string: solo se hace si el reporte se va a ver
+    if not logger.isEnabledFor(logging.INFO):
+        return apply_schema(data, source)
+    before_bytes = memory_bytes(data)
+    data = apply_schema(data, source)
+    report_memory(before_bytes, memory_bytes(data), source)
+    return data
+
+
+def load_uoa_csv(file_path):
+    """Carga un CSV de Barchart con el esquema compacto y reporta la memoria ahorrada."""
+    data = pd.read_csv(file_path, thousands=',')
+    return compact_frame(data, source=str(file_path))
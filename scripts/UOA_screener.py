@@ -0,0 +1,262 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from flask import request, jsonify
+from UOA_dataset import get_dataset
+
+# Screener: expresiones como "DTE < 14, Vol/OI > 20, aggressor=above-ask, calls only, premium > $500k".
+# Cada condición se evalúa de forma vectorizada y su máscara se guarda como bitmap (np.packbits);
+# combinar condiciones ya vistas es un AND de bitmaps, sin volver a leer las columnas.
+
+# Memoria máxima de las máscaras en cache (MB) y filas devueltas por defecto
+SCREENER_CACHE_MB = float(os.getenv("UOA_SCREENER_CACHE_MB", "256"))
+SCREENER_LIMIT = int(os.getenv("UOA_SCREENER_LIMIT", "100"))
+
+# Nombres aceptados en las expresiones (en minúsculas) y la columna del dataset de cada uno
+FIELDS = {
+    'symbol': 'Symbol', 'ticker': 'Symbol',
+    'type': 'Type',
+    'side': 'Side', 'aggressor': 'Side', 'fill': 'Side',
+    'dte': 'DTE',
+    'strike': 'Strike',
+    'price': 'Price~', 'price~': 'Price~',
+    'last': 'Last',
+    'volume': 'Volume', 'vol': 'Volume',
+    'oi': 'Open Int', 'open int': 'Open Int', 'open interest': 'Open Int',
+    'vol/oi': 'Vol/OI', 'voloi': 'Vol/OI',
+    'iv': 'IV',
+    'delta': 'Delta',
+    'premium': 'Premium',
+    'notional': 'Notional',
+    'delta premium': 'Delta Premium',
+    'delta notional': 'Delta Notional',
+    'moneyness': 'Moneyness',
+    'otm': 'OTM Pct', 'otm pct': 'OTM Pct',
+    'unusual': 'Unusual Score', 'unusual score': 'Unusual Score', 'score': 'Unusual Score',
+}
+
+# Condiciones sin operador
+KEYWORDS = {
+    'calls': ('Type', '=', ('Call',)), 'call': ('Type', '=', ('Call',)),
+    'calls only': ('Type', '=', ('Call',)), 'only calls': ('Type', '=', ('Call',)),
+    'puts': ('Type', '=', ('Put',)), 'put': ('Type', '=', ('Put',)),
+    'puts only': ('Type', '=', ('Put',)), 'only puts': ('Type', '=', ('Put',)),
+    'opening': ('Aggressive Opening', '=', (True,)), 'aggressive opening': ('Aggressive Opening', '=', (True,)),
+}
+
+# Columnas de cada fila del resultado
+RESULT_COLUMNS = ['Symbol', 'Type', 'Strike', 'Exp Date', 'DTE', 'Side', 'Last', 'Volume', 'Open Int', 'Vol/OI',
+                  'IV', 'Premium', 'Notional', 'Delta Premium', 'Unusual Score']
+
+# Una coma entre dígitos seguida de tres dígitos es separador de miles ($1,000,000), no de condiciones
+CLAUSE_SEPARATOR = re.compile(r"(?<!\d),|,(?!\d{3}(?!\d))|;|\band\b", re.IGNORECASE)
+CLAUSE_PATTERN = re.compile(r"^(?P<field>[A-Za-z~/ ]+?)\s*(?P<op><=|>=|!=|==|=|<|>)\s*(?P<value>.+)$")
+NUMBER_PATTERN = re.compile(r"^\$?(?P<number>-?[\d,]*\.?\d+)\s*(?P<suffix>[kmb%]?)$", re.IGNORECASE)
+NUMBER_SUFFIXES = {'': 1, 'k': 1e3, 'm': 1e6, 'b': 1e9, '%': 0.01}
+
+
+class ScreenerError(ValueError):
+    """Expresión del screener inválida (el mensaje se devuelve al usuario)."""
+
+
+def parse_number(text):
+    """'$500k' -> 500000.0, '1.5m' -> 1500000.0, '30%' -> 0.3."""
+    match = NUMBER_PATTERN.match(text.strip())
+    if not match:
+        raise ScreenerError(f"Valor numérico inválido: {text!r}")
+    return float(match.group('number').replace(',', '')) * NUMBER_SUFFIXES[match.group('suffix').lower()]
+
+
+def parse_query(query):
+    """Lista de condiciones (columna, operador, valores) de una expresión."""
+    clauses = []
+    for text in CLAUSE_SEPARATOR.split(query or ""):
+        text = " ".join(text.split())
+        if not text:
+            continue
+        if text.lower() in KEYWORDS:
+            clauses.append(KEYWORDS[text.lower()])
+            continue
+        match = CLAUSE_PATTERN.match(text)
+        if not match:
+            raise ScreenerError(f"Condición inválida: {text!r} (formato: campo operador valor)")
+        field = match.group('field').strip().lower()
+        if field not in FIELDS:
+            raise ScreenerError(f"Campo desconocido: {field!r}. Campos: {', '.join(sorted(set(FIELDS)))}")
+        op = '=' if match.group('op') == '==' else match.group('op')
+        values = tuple(value.strip() for value in match.group('value').split('|') if value.strip())
+        clauses.append((FIELDS[field], op, values))
+    return clauses
+
+
+class Screener:
+    """Evalúa expresiones sobre un dataset con cache de máscaras por condición.
+
+    Un Screener pertenece a una versión del dataset: los datos no cambian, así que
+    una máscara calculada sirve hasta que se publica un dataset nuevo.
+    """
+
+    def __init__(self, dataset, max_bytes=int(SCREENER_CACHE_MB * 1024 * 1024)):
+        self.dataset = dataset
+        self.version = dataset.version
+        self.data = dataset.data
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._arrays = {}
+        self._masks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def column_array(self, column):
+        """Valores de una columna: códigos si es categórica, numpy si es numérica."""
+        array = self._arrays.get(column)
+        if array is None:
+            if column not in self.data.columns:
+                raise ScreenerError(f"El dataset no tiene la columna {column!r}")
+            values = self.data[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                array = values.cat.codes.to_numpy()
+            elif pd.api.types.is_bool_dtype(values):
+                array = values.to_numpy(dtype=bool)
+            elif isinstance(values.dtype, np.dtype) and values.dtype.kind in 'iuf':
+                # Sin copia: se compara en el dtype compacto del esquema
+                array = values.to_numpy()
+            else:
+                array = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+            self._arrays[column] = array
+        return array
+
+    def evaluate(self, column, op, values):
+        """Máscara booleana de una condición."""
+        series = self.data[column] if column in self.data.columns else None
+        array = self.column_array(column)
+        if series is not None and isinstance(series.dtype, pd.CategoricalDtype):
+            if op not in ('=', '!='):
+                raise ScreenerError(f"{column} solo admite = o !=")
+            # Comparación sin distinguir mayúsculas contra las categorías del dataset
+            categories = {str(category).lower(): code for code, category in enumerate(series.cat.categories)}
+            codes = [categories[value.lower()] for value in values if value.lower() in categories]
+            mask = np.isin(array, codes) if len(codes) > 1 else array == (codes[0] if codes else -2)
+            return ~mask if op == '!=' else mask
+        if array.dtype == bool:
+            wanted = [value is True or str(value).lower() in ('1', 'true', 'yes', 'si', 'sí') for value in values]
+            mask = np.isin(array, wanted)
+            return ~mask if op == '!=' else mask
+
+        numbers = [parse_number(value) for value in values]
+        if array.dtype.kind == 'f':
+            # El valor en el dtype de la columna (float32 en el esquema compacto): 'IV = 30%' encuentra
+            # los 0.3 guardados en float32, que en float64 no son iguales a 0.3
+            numbers = np.asarray(numbers, dtype=array.dtype)
+        if op in ('=', '!='):
+            mask = np.isin(array, numbers)
+            return ~mask if op == '!=' else mask
+        if len(numbers) != 1:
+            raise ScreenerError(f"{column} {op} admite un solo valor")
+        compare = {'<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal}[op]
+        return compare(array, numbers[0])
+
+    def bitmap(self, clause):
+        """Máscara empaquetada de una condición, desde el cache si ya se calculó."""
+        with self._lock:
+            packed = self._masks.get(clause)
+            if packed is not None:
+                self._masks.move_to_end(clause)
+                self.hits += 1
+                return packed
+            self.misses += 1
+        packed = np.packbits(self.evaluate(*clause))
+        with self._lock:
+            if clause not in self._masks:
+                self._masks[clause] = packed
+                self.current_bytes += packed.nbytes
+                while self.current_bytes > self.max_bytes and len(self._masks) > 1:
+                    _, evicted = self._masks.popitem(last=False)
+                    self.current_bytes -= evicted.nbytes
+        return packed
+
+    def select(self, clauses):
+        """Posiciones de las filas que cumplen todas las condiciones."""
+        if not clauses:
+            return np.arange(len(self.data))
+        # Cada AND recorre n / 8 bytes, sin tocar las columnas
+        combined = self.bitmap(clauses[0])
+        for clause in clauses[1:]:
+            combined = np.bitwise_and(combined, self.bitmap(clause))
+        return np.flatnonzero(np.unpackbits(combined, count=len(self.data)))
+
+    def run(self, query, limit=SCREENER_LIMIT, sort='Premium'):
+        """Resultado del screener: cantidad, resumen por Symbol y las limit filas de mayor sort."""
+        start = time.perf_counter()
+        clauses = parse_query(query)
+        rows = self.select(clauses)
+        # Las limit filas de mayor sort por selección parcial; los NaN quedan al final
+        sort = FIELDS.get(str(sort).lower(), sort)
+        sort_values = self.column_array(sort)[rows].astype('float64')
+        sort_values[np.isnan(sort_values)] = -np.inf
+        positions = np.argpartition(-sort_values, limit - 1)[:limit] if len(rows) > limit else np.arange(len(rows))
+        top = rows[positions[np.argsort(-sort_values[positions], kind='stable')]]
+
+        # Premium y cantidad de contratos por Symbol (bincount sobre los códigos de Symbol)
+        symbol_codes = self.column_array('Symbol')[rows]
+        categories = self.data['Symbol'].cat.categories
+        counts = np.bincount(symbol_codes, minlength=len(categories))
+        premium = np.bincount(symbol_codes, weights=np.nan_to_num(self.column_array('Premium')[rows]),
+                              minlength=len(categories))
+        symbol_count = int((counts > 0).sum())
+        order = np.argsort(-premium)[:min(limit, symbol_count)]
+        symbols = [{'symbol': str(categories[code]), 'contracts': int(counts[code]), 'premium': float(premium[code])}
+                   for code in order]
+
+        columns = [column for column in RESULT_COLUMNS if column in self.data.columns]
+        records = self.data.iloc[top][columns]
+        if 'Exp Date' in records.columns:
+            records = records.assign(**{'Exp Date': records['Exp Date'].dt.strftime('%Y-%m-%d')})
+        return {
+            'query': query,
+            'clauses': [{'column': column, 'op': op, 'values': [str(value) for value in clause_values]}
+                        for column, op, clause_values in clauses],
+            'version': self.version,
+            'total_rows': len(self.data),
+            'matches': int(len(rows)),
+            'symbol_count': symbol_count,
+            'symbols': symbols,
+            'rows': json.loads(records.to_json(orient='records')),
+            'elapsed_ms': (time.perf_counter() - start) * 1000,
+        }
+
+    def stats(self):
+        return {'masks': len(self._masks), 'bytes': self.current_bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+_screener = None
+_screener_lock = threading.Lock()
+
+
+def get_screener(dataset=None):
+    """Screener del dataset vigente (se crea uno nuevo cuando cambia la versión)."""
+    global _screener
+    dataset = dataset or get_dataset()
+    with _screener_lock:
+        if _screener is None or _screener.version != dataset.version:
+            _screener = Screener(dataset)
+        return _screener
+
+
+def register_screener_route(server, path="/api/screener"):
+    """Endpoint JSON: GET /api/screener?q=DTE<14, premium>$500k&limit=50&sort=premium"""
+    def screener_endpoint():
+        try:
+            limit = request.args.get('limit', SCREENER_LIMIT, type=int)
+            result = get_screener().run(request.args.get('q', ''), limit=max(limit, 1),
+                                        sort=request.args.get('sort', 'Premium'))
+        except (ScreenerError, ValueError) as error:
+            return jsonify({'error': str(error)}), 400
+        return jsonify(result)
+    server.add_url_rule(path, "uoa_screener", screener_endpoint)
@@ -0,0 +1,219 @@
+import os
+import re
+import glob
+import json
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from UOA_schema import apply_schema
+
+# Ruta base fija para el proyecto
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CSV_FOLDER = os.path.join(BASE_DIR, "data", "UOAdataToVisualize")
+STORE_FOLDER = os.path.join(BASE_DIR, "data", "UOAsnapshotStore")
+
+# Columna agregada con el momento de la captura
+SNAPSHOT_COLUMN = "Snapshot Time"
+PARTITION_COLUMN = "snapshot_date"
+SNAPSHOT_FORMAT = "%Y%m%d_%H%M%S"
+
+# Archivos generados por UOA_Barchart_Connection.main(): UOA_<timestamp>.csv
+SNAPSHOT_FILE_PATTERN = re.compile(r"^UOA_(\d{8}_\d{6})\.csv$")
+PART_FILE_PATTERN = re.compile(r"^part-(\d{8}_\d{6})\.parquet$")
+
+# Partición compactada (UOA_compaction.py): un solo archivo con varias capturas; este
+# manifiesto (con "_", pyarrow no lo lee) dice cuáles contiene
+PARTITION_MANIFEST = "_compacted.json"
+
+# Filas por row group: Parquet guarda min/max por row group, lo que permite
+# saltar bloques completos al filtrar por Symbol/Type/Exp Date
+ROW_GROUP_SIZE = 64 * 1024
+
+PARTITIONING = ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive")
+
+
+def ensure_folder_exists(folder_path):
+    """Crea el folder si no existe."""
+    if not os.path.exists(folder_path):
+        os.makedirs(folder_path)
+
+
+def parse_snapshot_time(file_name):
+    """Extrae el momento de la captura del nombre UOA_<YYYYmmdd_HHMMSS>.csv (None si no aplica)."""
+    match = SNAPSHOT_FILE_PATTERN.match(os.path.basename(file_name))
+    if not match:
+        return None
+    return datetime.strptime(match.group(1), SNAPSHOT_FORMAT)
+
+
+def normalize_snapshot(data):
+    """Convierte un snapshot crudo de Barchart a tipos compactos para el store."""
+    return apply_schema(data.copy(), source="snapshot")
+
+
+def snapshot_path(snapshot_time, store_folder=STORE_FOLDER, kind="part"):
+    """Ruta del archivo Parquet de un snapshot dentro de su partición diaria."""
+    partition = f"{PARTITION_COLUMN}={snapshot_time.strftime('%Y-%m-%d')}"
+    return os.path.join(store_folder, partition, f"{kind}-{snapshot_time.strftime(SNAPSHOT_FORMAT)}.parquet")
+
+
+class SnapshotWriter:
+    """Escribe un snapshot por partes en un único archivo Parquet del store.
+
+    Cada write() normaliza, ordena y agrega un chunk como row groups nuevos, así un
+    snapshot de cualquier tamaño se escribe con memoria acotada. El archivo se
+    publica de forma atómica al cerrar; si hubo un error se descarta.
+    Con output_file se escribe en otra ruta; cambiando snapshot_time entre write()
+    un mismo archivo junta varias capturas (compactación diaria).
+    """
+
+    def __init__(self, snapshot_time=None, store_folder=STORE_FOLDER, kind="part", output_file=None):
+        # Al segundo, igual que el nombre del archivo con el que se filtra al leer
+        self.snapshot_time = (snapshot_time or datetime.now()).replace(microsecond=0)
+        self.output_file = output_file or snapshot_path(self.snapshot_time, store_folder, kind)
+        # Oculto (prefijo "."): ds.dataset ignora esos archivos, así un lector del store
+        # nunca abre el archivo a medio escribir de la misma partición
+        self.temp_file = os.path.join(os.path.dirname(self.output_file),
+                                      f".{os.path.basename(self.output_file)}.tmp")
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+
+    def __enter__(self):
+        ensure_folder_exists(os.path.dirname(self.output_file))
+        return self
+
+    def write(self, data):
+        """Agrega un chunk de filas crudas de Barchart al snapshot."""
+        snapshot = normalize_snapshot(data)
+        snapshot[SNAPSHOT_COLUMN] = pd.Timestamp(self.snapshot_time)
+        # Ordenar por las columnas de filtrado para que las estadísticas de cada row group sean selectivas
+        snapshot = snapshot.sort_values(['Symbol', 'Type', 'Exp Date'], kind='stable', ignore_index=True)
+
+        if self._writer is None:
+            table = pa.Table.from_pandas(snapshot, preserve_index=False)
+            # Índices de diccionario de 32 bits: cada chunk trae categorías distintas
+            self._schema = pa.schema([
+                field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+                if pa.types.is_dictionary(field.type) else field
+                for field in table.schema
+            ], metadata=table.schema.metadata)
+            self._writer = pq.ParquetWriter(self.temp_file, self._schema, compression="zstd")
+        table = pa.Table.from_pandas(snapshot, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+        self.rows += len(snapshot)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._writer is not None:
+            self._writer.close()
+            if exc_type is None:
+                # Escritura atómica: los lectores nunca ven un archivo a medio escribir
+                os.replace(self.temp_file, self.output_file)
+            else:
+                os.remove(self.temp_file)
+        return False
+
+
+def write_snapshot(data, snapshot_time=None, store_folder=STORE_FOLDER):
+    """Guarda un snapshot en el store particionado por fecha y devuelve la ruta escrita."""
+    with SnapshotWriter(snapshot_time, store_folder) as writer:
+        writer.write(data)
+    return writer.output_file
+
+
+def list_snapshots(store_folder=STORE_FOLDER):
+    """Lista los momentos de captura disponibles, ordenados, sin abrir ningún archivo."""
+    snapshots = []
+    for part_file in glob.glob(os.path.join(store_folder, f"{PARTITION_COLUMN}=*", "part-*.parquet")):
+        match = PART_FILE_PATTERN.match(os.path.basename(part_file))
+        if match:
+            snapshots.append(datetime.strptime(match.group(1), SNAPSHOT_FORMAT))
+    for manifest_file in glob.glob(os.path.join(store_folder, f"{PARTITION_COLUMN}=*", PARTITION_MANIFEST)):
+        with open(manifest_file, 'r') as file:
+            snapshots.extend(datetime.strptime(snapshot, SNAPSHOT_FORMAT) for snapshot in json.load(file)["snapshots"])
+    return sorted(set(snapshots))
+
+
+def build_filter(symbols=None, types=None, exp_date_from=None, exp_date_to=None,
+                 start_date=None, end_date=None, snapshot_time=None):
+    """Construye la expresión de filtro de pyarrow a partir de los predicados recibidos."""
+    conditions = []
+    if symbols is not None:
+        conditions.append(ds.field('Symbol').isin(list(symbols)))
+    if types is not None:
+        conditions.append(ds.field('Type').isin(list(types)))
+    if exp_date_from is not None:
+        conditions.append(ds.field('Exp Date') >= pd.Timestamp(exp_date_from))
+    if exp_date_to is not None:
+        conditions.append(ds.field('Exp Date') <= pd.Timestamp(exp_date_to))
+    # Los filtros por fecha de captura se resuelven sobre la partición, sin abrir archivos
+    if start_date is not None:
+        conditions.append(ds.field(PARTITION_COLUMN) >= pd.Timestamp(start_date).strftime('%Y-%m-%d'))
+    if end_date is not None:
+        conditions.append(ds.field(PARTITION_COLUMN) <= pd.Timestamp(end_date).strftime('%Y-%m-%d'))
+    if snapshot_time is not None:
+        snapshot_time = pd.Timestamp(snapshot_time)
+        conditions.append(ds.field(PARTITION_COLUMN) == snapshot_time.strftime('%Y-%m-%d'))
+        conditions.append(ds.field(SNAPSHOT_COLUMN) == snapshot_time)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def read_snapshots(symbols=None, types=None, exp_date_from=None, exp_date_to=None,
+                   start_date=None, end_date=None, snapshot_time=None, columns=None,
+                   store_folder=STORE_FOLDER):
+    """Lee del store solo las filas y columnas que cumplen los predicados (predicate pushdown)."""
+    if not os.path.isdir(store_folder):
+        raise FileNotFoundError(f"El store de snapshots no existe: {store_folder}")
+
+    dataset = ds.dataset(store_folder, format="parquet", partitioning=PARTITIONING)
+    expression = build_filter(symbols, types, exp_date_from, exp_date_to, start_date, end_date, snapshot_time)
+    if columns is not None:
+        columns = [column for column in columns if column != PARTITION_COLUMN]
+    table = dataset.to_table(columns=columns, filter=expression)
+    data = table.to_pandas()
+    if PARTITION_COLUMN in data.columns:
+        data = data.drop(columns=[PARTITION_COLUMN])
+    return data
+
+
+def read_latest_snapshot(columns=None, store_folder=STORE_FOLDER, **filters):
+    """Lee el snapshot más reciente del store (equivalente a abrir el último UOA_*.csv)."""
+    snapshots = list_snapshots(store_folder)
+    if not snapshots:
+        raise FileNotFoundError(f"No hay snapshots en el store: {store_folder}")
+    return read_snapshots(snapshot_time=snapshots[-1], columns=columns, store_folder=store_folder, **filters)
+
+
+def migrate_csv_folder(csv_folder=CSV_FOLDER, store_folder=STORE_FOLDER, overwrite=False):
+    """Migra una sola vez los UOA_<timestamp>.csv existentes al store particionado."""
+    migrated = []
+    for file_name in sorted(os.listdir(csv_folder)):
+        snapshot_time = parse_snapshot_time(file_name)
+        if snapshot_time is None:
+            # Los UOA_Combined_*.csv mezclan varias capturas y no tienen un momento único
+            print(f"Omitido (no es un snapshot): {file_name}")
+            continue
+
+        output_file = snapshot_path(snapshot_time, store_folder)
+        if os.path.exists(output_file) and not overwrite:
+            print(f"Ya migrado: {file_name}")
+            continue
+
+        data = pd.read_csv(os.path.join(csv_folder, file_name), thousands=',')
+        write_snapshot(data, snapshot_time, store_folder)
+        migrated.append(output_file)
+        print(f"{file_name}: {len(data)} filas migradas a {output_file}")
+
+    print(f"Migración completada: {len(migrated)} snapshots escritos en {store_folder}")
+    return migrated
+
+
+if __name__ == "__main__":
+    # Migración única de la carpeta de CSVs al store de snapshots
+    migrate_csv_folder()
@@ -0,0 +1,163 @@
+import os
+import re
+import json
+import html
+import shutil
+import argparse
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from plotly.offline import get_plotlyjs
+from UOA_dataset import get_dataset, set_dataset, load_dataset
+from UOA_aggregates import split_top_n
+from UOA_figures import build_graph1_figure, build_graph2_figure, build_pareto_figure, pareto_months
+
+# Reporte estático de cierre: Gráfico 1 y los Gráficos 2/3/4 de los Top-N Symbols en HTML y JSON.
+# Uso: python UOA_static_report.py --source data/UOAsnapshotStore [--top 25] [--workers 4]
+# La carpeta resultante se sirve tal cual (p. ej. python -m http.server -d data/UOAreports/20241220):
+# cada página ya trae sus figuras, no hay cálculo por solicitud.
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+REPORT_FOLDER = os.path.join(BASE_DIR, "data", "UOAreports")
+
+# Symbols del reporte (los de mayor Premium del Gráfico 1)
+REPORT_TOP_N = int(os.getenv("UOA_REPORT_TOP_N", "25"))
+
+PLOTLY_JS = "plotly.min.js"
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{plotly_js}"></script>
+<style>body {{ font-family: sans-serif; margin: 20px; }} .row {{ display: flex; }} .row > div {{ width: 50%; }}</style>
+</head>
+<body>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+"""
+
+
+def safe_name(symbol):
+    """Nombre de archivo para un Symbol ($SPX -> _SPX)."""
+    return re.sub(r"[^A-Za-z0-9.-]", "_", symbol)
+
+
+def figure_div(fig, div_id):
+    """<div> con la figura embebida (los datos van en la página, no se piden al servidor)."""
+    return fig.to_html(include_plotlyjs=False, full_html=False, div_id=div_id)
+
+
+def write_text(file_path, text):
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write(text)
+
+
+def init_worker(source):
+    """Inicializa un proceso del pool: con fork el dataset ya viene del proceso principal."""
+    if get_dataset().mode is None:
+        set_dataset(load_dataset(source))
+
+
+def render_symbol(symbol, output_folder):
+    """Gráfico 2 y los Gráficos 3/4 de cada mes de un Symbol: JSON por figura y una página HTML."""
+    dataset = get_dataset()
+    name = safe_name(symbol)
+    json_folder = os.path.join(output_folder, "json", name)
+    os.makedirs(json_folder, exist_ok=True)
+
+    fig = build_graph2_figure(dataset, symbol)
+    write_text(os.path.join(json_folder, "graph2.json"), fig.to_json())
+    sections = [figure_div(fig, "graph2")]
+    months = []
+    links = []
+    for month, year in pareto_months(dataset, symbol):
+        month_id = f"{year}_{month}"
+        row = []
+        for graph_number, option_type in ((3, 'Call'), (4, 'Put')):
+            fig = build_pareto_figure(dataset, symbol, month, year, option_type)
+            write_text(os.path.join(json_folder, f"graph{graph_number}_{month_id}.json"), fig.to_json())
+            row.append(f"<div>{figure_div(fig, f'graph{graph_number}_{month_id}')}</div>")
+        sections.append(f'<h2 id="{month_id}">{month} ({year})</h2>\n<div class="row">{"".join(row)}</div>')
+        months.append(f"{month} ({year})")
+        links.append(f'<a href="#{month_id}">{month} ({year})</a>')
+
+    body = f'<p><a href="index.html">Volver al Top</a> | {" | ".join(links)}</p>\n' + "\n".join(sections)
+    write_text(os.path.join(output_folder, f"{name}.html"),
+               PAGE_TEMPLATE.format(title=html.escape(f"UOA {symbol}"), plotly_js=PLOTLY_JS, body=body))
+    return {'symbol': symbol, 'page': f"{name}.html", 'json': f"json/{name}", 'months': months}
+
+
+def render_report(source, output_folder=None, top_n=REPORT_TOP_N, workers=None):
+    """Genera el reporte completo en una carpeta temporal y la publica al terminar."""
+    set_dataset(load_dataset(source))
+    dataset = get_dataset()
+    if dataset.filtered_data_g1.empty:
+        raise RuntimeError(f"No hay datos para el Gráfico 1 en {source}")
+    if output_folder is None:
+        output_folder = os.path.join(REPORT_FOLDER, datetime.now().strftime("%Y%m%d"))
+
+    # Se escribe aparte y se reemplaza la carpeta completa: un servidor nunca ve un reporte a medias
+    work_folder = output_folder + ".tmp"
+    shutil.rmtree(work_folder, ignore_errors=True)
+    os.makedirs(work_folder)
+
+    top, _ = split_top_n(dataset.filtered_data_g1, top_n)
+    top = top.sort_values('Premium', ascending=False)
+    symbols = top['Symbol'].astype(str).tolist()
+
+    # Un Symbol por tarea; con fork los procesos comparten el dataset ya cargado
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker,
+                             initargs=(source,)) as executor:
+        pages = list(executor.map(render_symbol, symbols, [work_folder] * len(symbols)))
+
+    fig = build_graph1_figure(dataset, top_n)
+    write_text(os.path.join(work_folder, "graph1.json"), fig.to_json())
+    write_text(os.path.join(work_folder, PLOTLY_JS), get_plotlyjs())
+    premium = dict(zip(symbols, top['Premium'].astype(float)))
+    rows = "\n".join(
+        f'<tr><td><a href="{page["page"]}">{html.escape(page["symbol"])}</a></td>'
+        f'<td style="text-align: right">{premium[page["symbol"]]:,.0f}</td><td>{len(page["months"])}</td></tr>'
+        for page in pages
+    )
+    generated = datetime.now().isoformat(timespec='seconds')
+    body = (f"<p>Origen: {html.escape(str(source))} | Generado: {generated}</p>\n{figure_div(fig, 'graph1')}\n"
+            f"<table><tr><th>Symbol</th><th>Premium</th><th>Meses</th></tr>\n{rows}\n</table>")
+    write_text(os.path.join(work_folder, "index.html"),
+               PAGE_TEMPLATE.format(title="Top UOA Liquidity $1M+", plotly_js=PLOTLY_JS, body=body))
+    manifest = {
+        'source': str(source),
+        'sources': [str(item) for item in dataset.sources],
+        'generated': generated,
+        'top_n': top_n,
+        'symbols': [{**page, 'premium': premium[page['symbol']]} for page in pages],
+    }
+    write_text(os.path.join(work_folder, "manifest.json"), json.dumps(manifest, indent=2))
+
+    if os.path.exists(output_folder):
+        old_folder = output_folder + ".old"
+        shutil.rmtree(old_folder, ignore_errors=True)
+        os.replace(output_folder, old_folder)
+        os.replace(work_folder, output_folder)
+        shutil.rmtree(old_folder, ignore_errors=True)
+    else:
+        os.replace(work_folder, output_folder)
+    print(f"Reporte de {len(pages)} Symbols guardado en {output_folder}")
+    return output_folder
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reporte estático de cierre con los gráficos de los Top-N Symbols.")
+    parser.add_argument("--source", default=os.getenv("DEFAULT_FILE_PATH"),
+                        help="Store de snapshots, store del recolector, UOA_<timestamp>.csv o consolidado")
+    parser.add_argument("--output", default=None, help="Carpeta del reporte (por defecto data/UOAreports/<fecha>)")
+    parser.add_argument("--top", type=int, default=REPORT_TOP_N, help="Cantidad de Symbols")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos de renderizado (por defecto, uno por CPU)")
+    args = parser.parse_args()
+    if not args.source:
+        parser.error("Indicar --source o la variable DEFAULT_FILE_PATH")
+    render_report(args.source, args.output, args.top, args.workers)
@@ -1,90 +1,290 @@
-import pandas as pd
+import time
+STARTED = time.perf_counter()  # Antes de los imports: el arranque se mide completo
+
+import os
 import re
-import plotly.express as px
-from dash import Dash, dcc, html, Input, Output
+import json
+from dash import Dash, dcc, html, dash_table, Input, Output, State, ClientsideFunction, ctx, no_update
+from dash.exceptions import PreventUpdate
 from UOA_file_selector import select_and_consolidate_files
+from UOA_aggregates import split_top_n
+from UOA_dataset import (UOADataset, get_dataset, set_dataset, load_dataset, start_watcher, dataset_loading,
+                         dataset_load_error, on_refresh, WATCH_INTERVAL)
+from UOA_figure_cache import FigureCache
+from UOA_replay import ReplayIndex
+from UOA_metrics import (metrics, instrument_callback, record_rows, register_metrics_route, configure_logging,
+                         StartupTimer)
+from UOA_figures import build_graph2_figure, build_pareto_figure, message_figure, plotly_express, OTHERS_LABEL
+from UOA_screener import get_screener, register_screener_route, ScreenerError
+from UOA_jobs import JobStore
+
+# Gráfico 1: cantidad de barras (el resto se agrupa en "Others") y tamaño máximo de sus datos
+GRAPH1_TOP_N = int(os.getenv("UOA_GRAPH1_TOP_N", "50"))
+GRAPH1_MAX_BYTES = int(os.getenv("UOA_GRAPH1_MAX_BYTES", str(256 * 1024)))
+
+# Opciones del filtro de Symbols por página (se buscan en el servidor)
+SYMBOL_PAGE_SIZE = int(os.getenv("UOA_SYMBOL_PAGE_SIZE", "50"))
+
+# Cada cuánto el navegador consulta el avance de un trabajo en segundo plano (ms)
+JOB_POLL_INTERVAL = int(os.getenv("UOA_JOB_POLL_INTERVAL", "500"))
+
+# Panel de métricas de los callbacks en la página (las métricas siempre están en /metrics)
+DEBUG_PANEL = os.getenv("UOA_DEBUG_PANEL", "0") == "1"
+DEBUG_PANEL_INTERVAL = int(os.getenv("UOA_DEBUG_PANEL_INTERVAL", "5"))
+
+# Arranque rápido: el servidor atiende enseguida y los datos se cargan en segundo plano
+# (desde el cache binario si el origen no cambió); la página muestra "Cargando datos..."
+FAST_START = os.getenv("UOA_FAST_START", "0") == "1"
+
+# Cada cuánto la página consulta si terminó la carga en segundo plano (ms)
+LOADING_POLL_INTERVAL = int(os.getenv("UOA_LOADING_POLL_INTERVAL", "1000"))
+
+# Mensajes de la aplicación (UOA_LOG_LEVEL=DEBUG muestra los datos agrupados de cada gráfico)
+logger = configure_logging()
+startup = StartupTimer(STARTED)
+startup.mark("imports")
 
 # Inicializa la aplicación Dash
 app = Dash(__name__)
 
+# Servidor Flask para gunicorn (ver gunicorn.conf.py en la raíz del proyecto)
+server = app.server
+
+# Métricas de los callbacks en formato Prometheus
+register_metrics_route(server)
+
+# Screener en JSON: /api/screener?q=DTE < 14, premium > $500k
+register_screener_route(server)
+
 # Seleccionar y cargar el archivo
-print("Selecciona los archivos para el análisis.")
+logger.info("Selecciona los archivos para el análisis.")
 file_path = select_and_consolidate_files()
 if file_path is None:
-    print("No se seleccionó ningún archivo. Saliendo...")
+    logger.error("No se seleccionó ningún archivo. Saliendo...")
     exit()
 
-# Carga de datos
-try:
-    data = pd.read_csv(file_path)
-    print(f"Datos cargados: {data.shape}")
-    print(data.head())  # Mostrar las primeras filas para verificar el contenido
+# Carga de datos (con FAST_START la hace start_watcher en segundo plano)
+if not FAST_START:
+    try:
+        set_dataset(load_dataset(file_path))
+        logger.debug("Datos del Gráfico 1:\n%s", get_dataset().filtered_data_g1.head())
+    except Exception as e:
+        logger.error(f"Error al cargar o procesar los datos: {e}")
+        set_dataset(UOADataset.empty())  # Asegura que no falle si hay errores
+    startup.mark("carga de datos")
 
-    data['Premium'] = (data['Last'] * 100) * data['Volume']
-
-    # Filtrar datos para el gráfico 1
-    filtered_data_g1 = (
-        data[data['Premium'] > 1000000]
-        .groupby('Symbol', as_index=False)
-        .agg({'Premium': 'sum'})
-        .sort_values(by='Premium', ascending=False)
-    )
-    print(f"Datos filtrados para el Gráfico 1: {filtered_data_g1.shape}")
-    print(filtered_data_g1.head())
-except Exception as e:
-    print(f"Error al cargar o procesar los datos: {e}")
-    filtered_data_g1 = pd.DataFrame()  # Asegura que no falle si hay errores
-
-# Diseño de la aplicación
-app.layout = html.Div([
-    html.H1("Visualización Interactiva UOA", style={"textAlign": "center"}),
-
-    # Filtro interactivo
-    html.Div([
-        html.Label("Selecciona Symbols:"),
-        dcc.Dropdown(
-            id='symbol-filter',
-            options=[{'label': symbol, 'value': symbol} for symbol in filtered_data_g1['Symbol'].unique()],
-            multi=True,
-            placeholder="Selecciona uno o más Symbols"
-        )
-    ], style={"margin": "20px"}),
 
-    dcc.Store(id='selected-symbol-store'),  # Almacenar el Symbol seleccionado
-
-    # Primera fila: Gráficos 1 y 2
-    html.Div([
-        dcc.Graph(id='graph1', style={'display': 'inline-block', 'width': '48%'}),
-        dcc.Graph(id='graph2', style={'display': 'inline-block', 'width': '48%'})
-    ], style={'display': 'flex', 'justify-content': 'space-between'}),
-
-    # Segunda fila: Gráficos 3 y 4
-    html.Div([
-        dcc.Graph(id='graph3', style={'display': 'inline-block', 'width': '48%'}),
-        dcc.Graph(id='graph4', style={'display': 'inline-block', 'width': '48%'})
-    ], style={'display': 'flex', 'justify-content': 'space-between'}),
-])
+def symbol_options(dataset, search_value=None, selected_symbols=None):
+    """Una página de opciones del filtro: los Symbols de mayor Premium que coinciden con la búsqueda."""
+    filtered_data_g1 = dataset.filtered_data_g1
+    if filtered_data_g1.empty:
+        return []
+    if search_value:
+        filtered_data_g1 = filtered_data_g1[
+            filtered_data_g1['Symbol'].astype(str).str.contains(search_value, case=False, regex=False)
+        ]
+    page, _ = split_top_n(filtered_data_g1, SYMBOL_PAGE_SIZE)
+    symbols = page['Symbol'].astype(str).tolist()
+    record_rows(len(dataset.filtered_data_g1), len(symbols))
+    # Los Symbols ya seleccionados siguen entre las opciones para que el Dropdown los muestre
+    symbols += [symbol for symbol in (selected_symbols or []) if symbol not in symbols]
+    return [{'label': symbol, 'value': symbol} for symbol in symbols]
+
+
+# Flujo de Premium entre snapshots (Gráfico 5); el watcher del dataset le agrega los snapshots
+# nuevos en cada revisión (con FAST_START, también la primera vez)
+replay_index = ReplayIndex(file_path)
+on_refresh(replay_index.refresh)
+if not FAST_START:
+    try:
+        replay_index.refresh()
+    except Exception as e:
+        logger.error(f"Error al calcular el flujo entre snapshots: {e}")
+
+# Símbolos mostrados en el Gráfico 5 cuando no hay un Symbol seleccionado
+REPLAY_TOP_N = 20
+
+# Contratos con más Premium nuevo que se listan debajo del Gráfico 5
+REPLAY_CONTRACTS_N = 15
+
+
+def replay_slider_marks(times, max_marks=10):
+    """Etiquetas del slider: a lo sumo max_marks momentos repartidos en el rango."""
+    if not times:
+        return {}
+    step = max(1, -(-len(times) // max_marks))
+    positions = list(range(0, len(times), step))
+    if positions[-1] != len(times) - 1:
+        positions.append(len(times) - 1)
+    show_date = len({snapshot_time.date() for snapshot_time in times}) > 1
+    time_format = '%m-%d %H:%M' if show_date else '%H:%M'
+    return {position: times[position].strftime(time_format) for position in positions}
+
+
+# Figuras de los Gráficos 2, 3 y 4 ya serializadas (LRU, se invalida al cambiar la versión del dataset)
+figure_cache = FigureCache()
+
+# Trabajos pesados de los callbacks (Gráficos 3 y 4) en procesos hijos, deduplicados por clave
+# entre todos los workers (el estado y el resultado quedan en un store en disco compartido)
+job_store = JobStore()
+
+# Valores que se leen al pedir /metrics; los de cada worker (combine) se suman o se toma el máximo
+metrics.add_gauge("uoa_dataset_version", "Token de versión del dataset publicado (hash de sus orígenes).", lambda: get_dataset().version)
+metrics.add_gauge("uoa_dataset_rows", "Filas del dataset publicado.", lambda: len(get_dataset().data))
+metrics.add_gauge("uoa_figure_cache_bytes", "Bytes ocupados por el cache de figuras.", lambda: figure_cache.current_bytes,
+                  combine="sum")
+metrics.add_gauge("uoa_figure_cache_hits_total", "Figuras servidas desde el cache.", lambda: figure_cache.hits, "counter",
+                  combine="sum")
+metrics.add_gauge("uoa_figure_cache_misses_total", "Figuras construidas.", lambda: figure_cache.misses, "counter", combine="sum")
+metrics.add_gauge("uoa_replay_snapshots", "Snapshots procesados por el replay.", lambda: len(replay_index))
+metrics.add_gauge("uoa_jobs_running", "Trabajos en segundo plano en curso.", lambda: job_store.running())
+metrics.add_gauge("uoa_jobs_submitted_total", "Trabajos en segundo plano lanzados.", lambda: job_store.submitted, "counter")
+metrics.add_gauge("uoa_jobs_deduplicated_total", "Pedidos resueltos con un trabajo ya existente.",
+                  lambda: job_store.deduplicated, "counter")
+metrics.add_gauge("uoa_dataset_loading", "1 mientras la carga inicial en segundo plano no terminó.",
+                  lambda: int(dataset_loading()), combine="max")
+metrics.add_gauge("uoa_startup_seconds", "Duración del arranque del proceso web.", lambda: startup.total(),
+                  combine="max")
+
+
+# Estado de la carga de datos que se muestra arriba de los gráficos
+def dataset_status():
+    if dataset_loading():
+        return "Cargando datos..."
+    if get_dataset().mode is None and dataset_load_error() is not None:
+        return f"Error al cargar los datos: {dataset_load_error()}"
+    return None
 
 
-# Callback para actualizar el Gráfico 1 con base en el filtro
+# Diseño de la aplicación: se arma en cada carga de la página con el dataset vigente
+def serve_layout():
+    return html.Div([
+        html.H1("Visualización Interactiva UOA", style={"textAlign": "center"}),
+        html.Div(dataset_status(), id='dataset-status', style={"textAlign": "center"}),
+
+        # Filtro interactivo
+        html.Div([
+            html.Label("Selecciona Symbols:"),
+            dcc.Dropdown(
+                id='symbol-filter',
+                options=symbol_options(get_dataset()),
+                multi=True,
+                searchable=True,
+                placeholder="Selecciona uno o más Symbols (escribe para buscar)"
+            )
+        ], style={"margin": "20px"}),
+
+        # Screener: condiciones sobre todos los contratos del dataset
+        html.Div([
+            html.Label("Screener:"),
+            dcc.Input(
+                id='screener-query',
+                type='text',
+                debounce=True,
+                placeholder="DTE < 14, Vol/OI > 20, aggressor=above-ask, calls only, premium > $500k",
+                style={'width': '70%', 'margin': '0 10px'}
+            ),
+            html.Button("Filtrar", id='screener-run'),
+            html.Div(id='screener-summary', style={'margin': '10px 0'}),
+            dash_table.DataTable(id='screener-table', page_size=15, sort_action='native', style_table={'overflowX': 'auto'})
+        ], style={"margin": "20px"}),
+
+        dcc.Store(id='selected-symbol-store'),  # Almacenar el Symbol seleccionado
+        dcc.Store(id='graph1-data'),  # Datos del Gráfico 1 (se filtran en el navegador)
+        dcc.Store(id='graph1-missing'),  # Symbols seleccionados que no están en el Top-N
+        dcc.Store(id='graph1-extra'),  # Datos de esos Symbols, pedidos al servidor
+
+        # Recarga en caliente: se revisa periódicamente la versión del dataset publicado
+        dcc.Store(id='dataset-version', data=get_dataset().version),
+        dcc.Interval(id='dataset-poll', interval=max(WATCH_INTERVAL, 1) * 1000, disabled=WATCH_INTERVAL <= 0),
+        dcc.Interval(id='loading-poll', interval=LOADING_POLL_INTERVAL, disabled=not dataset_loading()),
+
+        # Primera fila: Gráficos 1 y 2
+        html.Div([
+            dcc.Graph(id='graph1', style={'display': 'inline-block', 'width': '48%'}),
+            dcc.Graph(id='graph2', style={'display': 'inline-block', 'width': '48%'})
+        ], style={'display': 'flex', 'justify-content': 'space-between'}),
+
+        # Segunda fila: Gráficos 3 y 4 (se calculan juntos en segundo plano; el avance se muestra arriba)
+        dcc.Store(id='pareto-job'),
+        dcc.Interval(id='pareto-poll', interval=JOB_POLL_INTERVAL, disabled=True),
+        html.Div(id='pareto-progress', style={"margin": "0 20px"}),
+        html.Div([
+            dcc.Graph(id='graph3', style={'display': 'inline-block', 'width': '48%'}),
+            dcc.Graph(id='graph4', style={'display': 'inline-block', 'width': '48%'})
+        ], style={'display': 'flex', 'justify-content': 'space-between'}),
+
+        # Tercera fila: Gráfico 5 (flujo de Premium intradía) con slider de tiempo
+        html.Div([
+            dcc.Graph(id='graph5'),
+            dcc.Slider(
+                id='replay-slider',
+                min=0,
+                max=max(len(replay_index) - 1, 0),
+                step=1,
+                value=max(len(replay_index) - 1, 0),
+                marks=replay_slider_marks(replay_index.times),
+                updatemode='drag'
+            ),
+            html.H4(id='replay-contracts-title'),
+            dash_table.DataTable(id='replay-contracts', style_table={'overflowX': 'auto'})
+        ], style={"margin": "20px"}),
+
+        # Panel de depuración: métricas de los callbacks (UOA_DEBUG_PANEL=1)
+        html.Details([
+            html.Summary("Métricas de los callbacks"),
+            html.Pre(id='metrics-panel', style={'fontSize': '12px', 'overflowX': 'auto'}),
+            dcc.Interval(id='metrics-poll', interval=DEBUG_PANEL_INTERVAL * 1000, disabled=not DEBUG_PANEL)
+        ], style={"margin": "20px", "display": "block" if DEBUG_PANEL else "none"}),
+    ])
+
+
+app.layout = serve_layout
+
+
+# Callback para detectar un dataset nuevo (solo propaga si cambió la versión) y el fin de la carga inicial
 @app.callback(
-    Output('graph1', 'figure'),
-    Input('symbol-filter', 'value')  # Escucha el filtro
+    [Output('dataset-version', 'data'),
+     Output('loading-poll', 'disabled'),
+     Output('dataset-status', 'children')],
+    [Input('dataset-poll', 'n_intervals'),
+     Input('loading-poll', 'n_intervals')],
+    State('dataset-version', 'data')
+)
+@instrument_callback
+def poll_dataset_version(n_intervals, loading_intervals, current_version):
+    version = get_dataset().version
+    loading = dataset_loading()
+    # El sondeo de la carga sigue hasta que termina, aunque la versión no haya cambiado
+    if version == current_version and (loading or ctx.triggered_id != 'loading-poll'):
+        raise PreventUpdate
+    if version != current_version:
+        logger.info(f"Nueva versión del dataset: {version}")
+    return (no_update if version == current_version else version), not loading, dataset_status()
+
+# Callback para paginar las opciones del filtro según la búsqueda (y cuando cambia el dataset)
+@app.callback(
+    Output('symbol-filter', 'options'),
+    [Input('symbol-filter', 'search_value'),
+     Input('dataset-version', 'data')],
+    State('symbol-filter', 'value')
 )
-def update_graph1(selected_symbols):
+@instrument_callback
+def update_symbol_options(search_value, dataset_version, selected_symbols):
+    return symbol_options(get_dataset(), search_value, selected_symbols)
+
+# Datos del Gráfico 1 para el navegador: Top-N, barra "Others" y la figura base sin x/y
+def graph1_store_data(dataset):
+    px = plotly_express()
+    filtered_data_g1 = dataset.filtered_data_g1
     if filtered_data_g1.empty:
-        print("No hay datos disponibles para el Gráfico 1.")
-        return px.bar(title="No hay datos disponibles para el Gráfico 1")
-
-    # Filtrar los Symbols seleccionados
-    filtered_data = filtered_data_g1
-    if selected_symbols:
-        filtered_data = filtered_data_g1[filtered_data_g1['Symbol'].isin(selected_symbols)]
-        print(f"Datos filtrados para los Symbols seleccionados: {filtered_data.shape}")
+        logger.info("No hay datos disponibles para el Gráfico 1.")
+        fig = message_figure("No hay datos disponibles para el Gráfico 1")
+        return {'symbols': [], 'premium': [], 'figure': json.loads(fig.to_json())}
 
     # Crear el gráfico
     fig = px.bar(
-        filtered_data,
+        filtered_data_g1.iloc[:1],
         x='Symbol',
         y='Premium',
         title="Top UOA Liquidity $1M+",
@@ -97,101 +297,128 @@ def update_graph1(selected_symbols):
         xaxis_tickangle=-45,
         clickmode='event+select'  # Habilitar selección
     )
-    return fig
+    figure = json.loads(fig.to_json())
+    # Los valores viajan como listas; el navegador arma x/y según el filtro
+    for trace in figure['data']:
+        trace.pop('x', None)
+        trace.pop('y', None)
+
+    # Top-N por selección parcial; si los datos superan el límite se reduce N a la mitad
+    top_n = GRAPH1_TOP_N
+    while True:
+        top, rest = split_top_n(filtered_data_g1, top_n)
+        store_data = {
+            'symbols': top['Symbol'].astype(str).tolist(),
+            'premium': top['Premium'].astype(float).tolist(),
+            'others': {'label': f"{OTHERS_LABEL} ({len(rest)})", 'count': len(rest), 'premium': float(rest['Premium'].sum())},
+            'figure': figure,
+            'total_symbols': len(filtered_data_g1),
+        }
+        payload_bytes = len(json.dumps(store_data))
+        if payload_bytes <= GRAPH1_MAX_BYTES or top_n <= 1:
+            break
+        top_n //= 2
+
+    store_data['payload_bytes'] = payload_bytes
+    record_rows(len(filtered_data_g1), len(store_data['symbols']))
+    logger.info(f"Gráfico 1: Top {len(top)} de {len(filtered_data_g1)} Symbols + {OTHERS_LABEL} ({len(rest)}), "
+          f"{payload_bytes / 1024:.1f} KB (límite {GRAPH1_MAX_BYTES / 1024:.0f} KB)")
+    if payload_bytes > GRAPH1_MAX_BYTES:
+        logger.warning(f"Advertencia: los datos del Gráfico 1 superan el límite aun con Top {top_n}.")
+    return store_data
+
+# Callback para enviar al navegador los datos del Gráfico 1 (solo cuando cambia el dataset)
+@app.callback(
+    Output('graph1-data', 'data'),
+    Input('dataset-version', 'data')
+)
+@instrument_callback
+def update_graph1_data(dataset_version):
+    return graph1_store_data(get_dataset())
+
+# Callback en el navegador: Symbols seleccionados que no vinieron en el Top-N
+app.clientside_callback(
+    ClientsideFunction(namespace='uoa', function_name='graph1_missing'),
+    Output('graph1-missing', 'data'),
+    [Input('symbol-filter', 'value'),
+     Input('graph1-data', 'data'),
+     Input('graph1-extra', 'data')]
+)
+
+# Callback para traer del servidor solo los Symbols seleccionados fuera del Top-N
+@app.callback(
+    Output('graph1-extra', 'data'),
+    [Input('graph1-missing', 'data'),
+     Input('dataset-version', 'data')],
+    State('graph1-extra', 'data')
+)
+@instrument_callback
+def update_graph1_extra(missing_symbols, dataset_version, extra_data):
+    if ctx.triggered_id == 'dataset-version' or not extra_data:
+        # Dataset nuevo: los datos pedidos antes ya no valen
+        extra_data = {'symbols': [], 'premium': [], 'requested': []}
+    if missing_symbols:
+        filtered_data_g1 = get_dataset().filtered_data_g1
+        rows = filtered_data_g1[filtered_data_g1['Symbol'].isin(missing_symbols)]
+        record_rows(len(filtered_data_g1), len(rows))
+        extra_data = {
+            'symbols': extra_data['symbols'] + rows['Symbol'].astype(str).tolist(),
+            'premium': extra_data['premium'] + rows['Premium'].astype(float).tolist(),
+            # Un Symbol que ya no está en los datos no se vuelve a pedir
+            'requested': extra_data['requested'] + list(missing_symbols),
+        }
+    return extra_data
+
+# Callback en el navegador: filtrar los Symbols y actualizar el Gráfico 1 sin ir al servidor
+app.clientside_callback(
+    ClientsideFunction(namespace='uoa', function_name='graph1_figure'),
+    Output('graph1', 'figure'),
+    [Input('symbol-filter', 'value'),  # Escucha el filtro
+     Input('graph1-data', 'data'),  # Y los datos de cada versión del dataset
+     Input('graph1-extra', 'data')]
+)
 
 # Callback para capturar clics en el eje X del Gráfico 1
 @app.callback(
     Output('selected-symbol-store', 'data'),
     Input('graph1', 'clickData')  # Detectar clics en el gráfico
 )
+@instrument_callback
 def capture_symbol(click_data):
     if click_data and 'points' in click_data and len(click_data['points']) > 0:
         symbol = click_data['points'][0]['x']
-        print(f"Symbol capturado: {symbol}")
+        if symbol.startswith(f"{OTHERS_LABEL} ("):
+            # La barra "Others" agrupa varios Symbols
+            return None
+        logger.debug(f"Symbol capturado: {symbol}")
         return symbol
     return None
 
 # Callback para el Gráfico 2
 @app.callback(
     Output('graph2', 'figure'),
-    Input('selected-symbol-store', 'data')  # Usar el Symbol capturado
+    [Input('selected-symbol-store', 'data'),  # Usar el Symbol capturado
+     Input('dataset-version', 'data')]
 )
-def update_graph2(selected_symbol):
+@instrument_callback
+def update_graph2(selected_symbol, dataset_version=None):
     if not selected_symbol:
-        print("No se seleccionó ningún Symbol.")
-        return px.bar(title="Seleccione un Symbol en el Gráfico 1")
-
-    print(f"Actualizando con Symbol seleccionado: {selected_symbol}")
-
-    # Filtrar datos por Symbol
-    filtered_data_g2 = data[data['Symbol'] == selected_symbol]
-    if filtered_data_g2.empty:
-        print(f"No hay datos disponibles para {selected_symbol}")
-        return px.bar(title=f"No hay datos disponibles para {selected_symbol}")
-
-    # Procesar datos para jerarquías
-    filtered_data_g2['Year'] = pd.to_datetime(filtered_data_g2['Exp Date']).dt.year
-    filtered_data_g2['Month'] = pd.to_datetime(filtered_data_g2['Exp Date']).dt.strftime('%b')
-    filtered_data_g2['Qtr'] = "Q" + ((pd.to_datetime(filtered_data_g2['Exp Date']).dt.month - 1) // 3 + 1).astype(str)
-    filtered_data_g2['Month_Sort'] = pd.to_datetime(filtered_data_g2['Exp Date']).dt.month
-
-    # Agrupar datos por Year, Qtr, Month, y Type
-    grouped_data = (
-        filtered_data_g2.groupby(['Type', 'Year', 'Qtr', 'Month', 'Month_Sort'], as_index=False)
-        .agg({'Premium': 'sum'})
-        .sort_values(by=['Year', 'Qtr', 'Month_Sort', 'Type'])
-    )
-
-    print("Datos agrupados para el Gráfico 2:")
-    print(grouped_data)
-
-    if grouped_data.empty:
-        return px.bar(title=f"No hay datos agrupados para {selected_symbol}")
+        logger.debug("No se seleccionó ningún Symbol.")
+        return message_figure("Seleccione un Symbol en el Gráfico 1")
 
-    # Crear etiquetas jerárquicas para el eje X
-    grouped_data['x_label'] = grouped_data['Month'] + " (" + grouped_data['Year'].astype(str) + ")"
+    logger.debug(f"Actualizando con Symbol seleccionado: {selected_symbol}")
 
-    # Crear el gráfico con colores personalizados
-    fig = px.bar(
-        grouped_data,
-        x='x_label',
-        y='Premium',
-        color='Type',
-        barmode='group',
-        text='Premium',
-        title=f"CALLs vs PUTs ({selected_symbol})",
-        labels={'x_label': 'Mes (Año)', 'Premium': 'Premium'},
-        color_discrete_map={
-            "Call": "blue",  # Azul para Call
-            "Put": "red"     # Rojo para Put
-        }
+    # Figura cacheada por (versión, Symbol): un clic repetido no vuelve a agrupar ni a crear la figura
+    dataset = get_dataset()
+    fig = figure_cache.get_or_build(
+        (dataset.version, selected_symbol, None, None),
+        lambda: build_graph2_figure(dataset, selected_symbol)
     )
-
-    # Ajustar el diseño del gráfico
-    fig.update_layout(
-        xaxis=dict(tickangle=0, title=None),
-        yaxis_title="Premium",
-        title_font_size=18,
-        showlegend=True,
-        height=700,
-        margin=dict(b=150)
-    )
-    fig.update_traces(texttemplate='%{y}', textposition='outside')
-
+    logger.debug(figure_cache.summary())
     return fig
 
-#Callback para Grafico #3
-@app.callback(
-    Output('graph3', 'figure'),
-    [Input('graph1', 'clickData'),  # Symbol seleccionado
-     Input('graph2', 'clickData')]  # Month-Year seleccionado
-)
-def update_graph3(selected_symbol_data, selected_month_data):
-    # Verificar selección en gráficos previos
-    if not selected_symbol_data or not selected_month_data:
-        print("No se seleccionó Symbol o Month-Year.")
-        return px.bar(title="Seleccione un Symbol y un Month-Year para el gráfico Pareto")
-
+# Extraer Symbol, Month y Year de los clics en los Gráficos 1 y 2
+def parse_pareto_selection(selected_symbol_data, selected_month_data):
     # Obtener el Symbol seleccionado
     selected_symbol = selected_symbol_data['points'][0]['x']
 
@@ -199,210 +426,256 @@ def update_graph3(selected_symbol_data, selected_month_data):
     selected_month_year = selected_month_data['points'][0]['x']
     match = re.match(r"(\w+)\s\((\d{4})\)", selected_month_year)
     if not match:
-        print(f"Error al interpretar Month-Year: {selected_month_year}")
-        return px.bar(title="Error al interpretar Month-Year seleccionado")
+        logger.warning(f"Error al interpretar Month-Year: {selected_month_year}")
+        return None
 
     selected_month, selected_year = match.groups()
     selected_year = int(selected_year)  # Convertir Year a entero
-    print(f"Symbol seleccionado: {selected_symbol}, Month-Year seleccionado: {selected_month} {selected_year}")
-
-    # Filtrar datos por Symbol, Month-Year y Type = Call
-    filtered_data = data[
-        (data['Symbol'] == selected_symbol) &
-        (pd.to_datetime(data['Exp Date']).dt.strftime('%b') == selected_month) &
-        (pd.to_datetime(data['Exp Date']).dt.year == selected_year) &
-        (data['Type'] == 'Call')  # Filtrar solo por Call
-    ]
-
-    # Imprimir datos filtrados para depuración
-    print(f"Datos filtrados para {selected_symbol}, {selected_month} {selected_year} (Call): {filtered_data.shape}")
-    if filtered_data.empty:
-        print(f"No hay datos disponibles para Symbol: {selected_symbol}, Month-Year: {selected_month} {selected_year} (Call)")
-        return px.bar(title=f"No hay datos disponibles para {selected_symbol} en {selected_month} {selected_year}")
-
-    # Calcular Premium y Day
-    filtered_data['Premium'] = filtered_data['Last'] * filtered_data['Volume'] * 100
-    filtered_data['Day'] = pd.to_datetime(filtered_data['Exp Date']).dt.day
-
-    # Determinar color basado en la lógica
-    def determine_color(row):
-        if pd.isna(row['Last']) or pd.isna(row['Bid']) or pd.isna(row['Ask']):
-            return 'black'  # Default color for missing values
-        elif row['Last'] > row['Ask']:
-            return 'green'  # Verde para Last > Ask
-        elif row['Last'] < row['Bid']:
-            return 'red'    # Rojo para Last < Bid
-        else:
-            return 'yellow' # Amarillo para Bid <= Last <= Ask
-
-    filtered_data['Color'] = filtered_data.apply(determine_color, axis=1)
-
-    # Agrupar por Day, Strike, y Color
-    grouped_data = filtered_data.groupby(['Day', 'Strike', 'Color'], as_index=False).agg({'Premium': 'sum'})
-
-    print("Datos agrupados para el Gráfico 3:")
-    print(grouped_data)
-
-    # Mapa de colores forzados
-    color_map = {
-        'green': 'green',
-        'red': 'red',
-        'yellow': 'yellow',
-        'black': 'black'  # Por si hay valores inesperados
-    }
-
-    # Crear el gráfico con colores forzados
-    fig = px.bar(
-        grouped_data,
-        x='Day',
-        y='Premium',
-        color='Color',  # Usar columna Color
-        text='Strike',  # Mostrar Strike como texto
-        title=f"{selected_month} {selected_year} CALLs for {selected_symbol}",
-        labels={'Day': 'Day', 'Premium': 'Premium'},
-        color_discrete_map=color_map  # Forzar colores específicos
-    )
+    logger.debug(f"Symbol seleccionado: {selected_symbol}, Month-Year seleccionado: {selected_month} {selected_year}")
+    return selected_symbol, selected_month, selected_year
 
-    # Ajustar diseño del gráfico
-    fig.update_layout(
-        barmode='stack',  # Barras apiladas por Day
-        xaxis=dict(title=None, tickangle=-90),  # Rotar etiquetas del eje x
-        yaxis=dict(title="Premium"),
-        title=dict(font_size=18),
-        showlegend=False,  # Ocultar la leyenda de colores
-        height=700,
-        margin=dict(t=50, b=200)  # Ajustar margen para etiquetas jerárquicas
-    )
-
-    # Ajustar las barras
-    fig.update_traces(
-        texttemplate='%{text}',  # Mostrar Strike como texto
-        textposition='inside',   # Colocar texto dentro de la barra
-        insidetextanchor='middle',  # Centrar el texto
-        marker=dict(line=dict(color='black', width=1)),  # Añadir borde negro a las barras
-        textfont=dict(color='black')  # Color de texto siempre negro
+# Figura Pareto cacheada por (versión, Symbol, Month-Year, Type)
+def pareto_figure(selected_symbol_data, selected_month_data, option_type, dataset=None):
+    # Verificar selección en gráficos previos
+    if not selected_symbol_data or not selected_month_data:
+        logger.debug("No se seleccionó Symbol o Month-Year.")
+        return message_figure("Seleccione un Symbol y un Month-Year para el gráfico Pareto")
+
+    selection = parse_pareto_selection(selected_symbol_data, selected_month_data)
+    if selection is None:
+        return message_figure("Error al interpretar Month-Year seleccionado")
+    selected_symbol, selected_month, selected_year = selection
+
+    dataset = dataset or get_dataset()
+    fig = figure_cache.get_or_build(
+        (dataset.version, selected_symbol, f"{selected_month} ({selected_year})", option_type),
+        lambda: build_pareto_figure(dataset, selected_symbol, selected_month, selected_year, option_type)
     )
-
+    logger.debug(figure_cache.summary())
     return fig
 
-#Callback para el Grafico #4
+# Trabajo en segundo plano que arma juntos los Gráficos 3 y 4 de un (Symbol, Month-Year).
+# La clave incluye la versión del dataset (igual en todos los workers): los clics repetidos, los
+# sondeos y los dos gráficos comparten un único cálculo aunque cada pedido llegue a otro worker.
+# Con lookup (sondeos) primero se consulta el store y solo se lanza el trabajo si no existe o expiró.
+def pareto_job(selected_symbol_data, selected_month_data, retry=False, lookup=False):
+    selection = parse_pareto_selection(selected_symbol_data, selected_month_data)
+    if selection is None:
+        return None
+    selected_symbol, selected_month, selected_year = selection
+    dataset = get_dataset()
+    key = (dataset.version, selected_symbol, selected_month, selected_year)
+    if lookup:
+        job = job_store.get(key)
+        if job is not None:
+            return job
+
+    def build_figures(job):
+        # Corre en el proceso hijo: arma las figuras sin pasar por el cache de figuras del worker
+        figures = {}
+        for step, option_type in enumerate(('Call', 'Put')):
+            job.report(step / 2, f"Gráfico {3 + step}: {selected_symbol} {selected_month} ({selected_year})")
+            figure = build_pareto_figure(dataset, selected_symbol, selected_month, selected_year, option_type)
+            figures[option_type] = json.loads(figure.to_json())
+        return figures
+
+    return job_store.submit(key, build_figures, retry, name='pareto_job')
+
+# Barra de avance del trabajo de los Gráficos 3 y 4
+def job_progress(job):
+    return html.Div([
+        html.Progress(value=f"{job.progress:.2f}", max="1", style={'width': '200px', 'marginRight': '10px'}),
+        html.Span(f"Calculando {job.message or 'Gráficos 3 y 4'}... {job.elapsed():.1f} s")
+    ])
+
+# Callback para lanzar el trabajo de los Gráficos 3 y 4 y seguir su avance sin bloquear al worker
 @app.callback(
-    Output('graph4', 'figure'),
+    [Output('pareto-job', 'data'),
+     Output('pareto-poll', 'disabled'),
+     Output('pareto-progress', 'children')],
     [Input('graph1', 'clickData'),  # Symbol seleccionado
-     Input('graph2', 'clickData')]  # Month-Year seleccionado
+     Input('graph2', 'clickData'),  # Month-Year seleccionado
+     Input('dataset-version', 'data'),
+     Input('pareto-poll', 'n_intervals')]
 )
-def update_graph4(selected_symbol_data, selected_month_data):
-    # Verificar selección en gráficos previos
+@instrument_callback
+def update_pareto_job(selected_symbol_data, selected_month_data, dataset_version=None, n_intervals=None):
     if not selected_symbol_data or not selected_month_data:
-        print("No se seleccionó Symbol o Month-Year.")
-        return px.bar(title="Seleccione un Symbol y un Month-Year para el gráfico Pareto")
+        logger.debug("No se seleccionó Symbol o Month-Year.")
+        return {'status': 'empty'}, True, None
+    # Un clic nuevo reintenta un trabajo que falló; los sondeos solo consultan su estado
+    polling = ctx.triggered_id == 'pareto-poll'
+    job = pareto_job(selected_symbol_data, selected_month_data, retry=not polling, lookup=polling)
+    if job is None:
+        return {'status': 'error', 'error': "Error al interpretar Month-Year seleccionado"}, True, None
+
+    label = f"{job.key[1]} {job.key[2]} ({job.key[3]})"
+    if not job.done():
+        # En curso: el estado solo se publica al lanzarlo; los sondeos actualizan la barra de avance
+        state = no_update if polling else {'status': 'running', 'label': label}
+        return state, False, job_progress(job)
+    if job.failed():
+        logger.error(f"Error al calcular los Gráficos 3 y 4 de {label}: {job.error}")
+        return {'status': 'error', 'error': f"Error al calcular {label}"}, True, None
+    logger.debug(f"Gráficos 3 y 4 de {label} listos en {job.elapsed() * 1000:.0f} ms")
+    return {'status': 'done', 'label': label, 'key': list(job.key)}, True, None
+
+# Figura de un gráfico Pareto según el estado de su trabajo (solo lee el store, nunca espera el cálculo)
+def pareto_job_figure(job_state, option_type):
+    status = (job_state or {}).get('status', 'empty')
+    if status == 'empty':
+        return message_figure("Seleccione un Symbol y un Month-Year para el gráfico Pareto")
+    if status == 'error':
+        return message_figure(job_state['error'])
+    if status == 'running':
+        return message_figure(f"Calculando {job_state['label']}...")
+    # Terminado: el resultado está en el store compartido, lo haya calculado cualquier worker
+    figures = job_store.result(job_state['key'])
+    if figures is None:
+        logger.warning(f"El resultado de {job_state['label']} ya no está en el store de trabajos.")
+        return message_figure(f"El resultado de {job_state['label']} expiró; vuelva a seleccionar el Month-Year")
+    return figures[option_type]
 
-    # Obtener el Symbol seleccionado
-    selected_symbol = selected_symbol_data['points'][0]['x']
+#Callback para Grafico #3
+@app.callback(
+    Output('graph3', 'figure'),
+    Input('pareto-job', 'data')  # Estado del trabajo de los Gráficos 3 y 4
+)
+@instrument_callback
+def update_graph3(job_state):
+    return pareto_job_figure(job_state, 'Call')
 
-    # Extraer Month y Year del formato "Dec (2024)"
-    selected_month_year = selected_month_data['points'][0]['x']
-    match = re.match(r"(\w+)\s\((\d{4})\)", selected_month_year)
-    if not match:
-        print(f"Error al interpretar Month-Year: {selected_month_year}")
-        return px.bar(title="Error al interpretar Month-Year seleccionado")
+#Callback para el Grafico #4
+@app.callback(
+    Output('graph4', 'figure'),
+    Input('pareto-job', 'data')  # Estado del trabajo de los Gráficos 3 y 4
+)
+@instrument_callback
+def update_graph4(job_state):
+    return pareto_job_figure(job_state, 'Put')
 
-    selected_month, selected_year = match.groups()
-    selected_year = int(selected_year)  # Convertir Year a entero
-    print(f"Symbol seleccionado: {selected_symbol}, Month-Year seleccionado: {selected_month} {selected_year}")
-
-    # Filtrar datos por Symbol, Month-Year y Type = Put
-    filtered_data = data[
-        (data['Symbol'] == selected_symbol) &
-        (pd.to_datetime(data['Exp Date']).dt.strftime('%b') == selected_month) &
-        (pd.to_datetime(data['Exp Date']).dt.year == selected_year) &
-        (data['Type'] == 'Put')  # Filtrar solo por Put
-    ]
-
-    # Imprimir datos filtrados para depuración
-    print(f"Datos filtrados para {selected_symbol}, {selected_month} {selected_year} (Put): {filtered_data.shape}")
-    if filtered_data.empty:
-        print(f"No hay datos disponibles para Symbol: {selected_symbol}, Month-Year: {selected_month} {selected_year} (Put)")
-        return px.bar(title=f"No hay datos disponibles para {selected_symbol} en {selected_month} {selected_year}")
-
-    # Calcular Premium y Day
-    filtered_data['Premium'] = filtered_data['Last'] * filtered_data['Volume'] * 100
-    filtered_data['Day'] = pd.to_datetime(filtered_data['Exp Date']).dt.day
-
-    # Determinar color basado en la lógica
-    def determine_color(row):
-        if pd.isna(row['Last']) or pd.isna(row['Bid']) or pd.isna(row['Ask']):
-            return 'black'  # Default color for missing values
-        elif row['Last'] > row['Ask']:
-            return 'green'  # Verde para Last > Ask
-        elif row['Last'] < row['Bid']:
-            return 'red'    # Rojo para Last < Bid
-        else:
-            return 'yellow' # Amarillo para Bid <= Last <= Ask
-
-    filtered_data['Color'] = filtered_data.apply(determine_color, axis=1)
-
-    # Agrupar por Day, Strike, y Color
-    grouped_data = filtered_data.groupby(['Day', 'Strike', 'Color'], as_index=False).agg({'Premium': 'sum'})
-
-    print("Datos agrupados para el Gráfico 4:")
-    print(grouped_data)
-
-    # Mapa de colores forzados
-    color_map = {
-        'green': 'green',
-        'red': 'red',
-        'yellow': 'yellow',
-        'black': 'black'  # Por si hay valores inesperados
-    }
-
-    # Crear el gráfico con colores forzados
-    fig = px.bar(
-        grouped_data,
-        x='Day',
-        y='Premium',
-        color='Color',  # Usar columna Color
-        text='Strike',  # Mostrar Strike como texto
-        title=f"{selected_month} {selected_year} PUTs for {selected_symbol}",
-        labels={'Day': 'Day', 'Premium': 'Premium'},
-        color_discrete_map=color_map  # Forzar colores específicos
-    )
+# Callback para ajustar el slider a los snapshots del replay (los agrega el watcher del dataset)
+@app.callback(
+    [Output('replay-slider', 'max'),
+     Output('replay-slider', 'marks'),
+     Output('replay-slider', 'value')],
+    Input('dataset-version', 'data')
+)
+@instrument_callback
+def update_replay_slider(dataset_version):
+    last_position = max(len(replay_index) - 1, 0)
+    return last_position, replay_slider_marks(replay_index.times), last_position
 
-    # Ajustar diseño del gráfico
-    fig.update_layout(
-        barmode='stack',  # Barras apiladas por Day
-        xaxis=dict(title=None, tickangle=-90),  # Rotar etiquetas del eje x
-        yaxis=dict(title="Premium"),
-        title=dict(font_size=18),
-        showlegend=False,  # Ocultar la leyenda de colores
-        height=700,
-        margin=dict(t=50, b=200)  # Ajustar margen para etiquetas jerárquicas
-    )
+#Callback para el Grafico #5
+@app.callback(
+    Output('graph5', 'figure'),
+    [Input('replay-slider', 'value'),  # Momento elegido en el slider
+     Input('selected-symbol-store', 'data')]  # Symbol seleccionado en el Gráfico 1
+)
+@instrument_callback
+def update_graph5(position, selected_symbol):
+    px = plotly_express()
+    if not len(replay_index):
+        return message_figure("No hay snapshots para el flujo intradía")
+    position = min(position or 0, len(replay_index) - 1)
+    snapshot_time = replay_index.times[position]
+
+    if selected_symbol:
+        # Premium nuevo en cada snapshot del día para el Symbol seleccionado
+        flow = replay_index.symbol_flow(selected_symbol, position)
+        record_rows(len(flow), len(flow))
+        if flow.empty:
+            return message_figure(f"No hay flujo intradía para {selected_symbol}")
+        fig = px.bar(
+            flow,
+            x='Snapshot Time',
+            y='Premium Delta',
+            hover_data=['Premium Acumulado'],
+            title=f"Flujo de Premium de {selected_symbol} hasta {snapshot_time:%Y-%m-%d %H:%M}",
+            labels={'Snapshot Time': 'Snapshot', 'Premium Delta': 'Premium nuevo'}
+        )
+    else:
+        # Symbols con más Premium acumulado en el día hasta el momento elegido
+        top = replay_index.top_symbols(position, REPLAY_TOP_N)
+        record_rows(len(replay_index.symbols), len(top))
+        if top.empty:
+            return message_figure(f"Sin flujo de Premium hasta {snapshot_time:%Y-%m-%d %H:%M}")
+        fig = px.bar(
+            x=top.index,
+            y=top.to_numpy(),
+            title=f"Premium acumulado del día hasta {snapshot_time:%Y-%m-%d %H:%M} (Top {REPLAY_TOP_N})",
+            labels={'x': 'Ticker', 'y': 'Premium acumulado'}
+        )
+        fig.update_layout(xaxis_tickangle=-45)
 
-    # Ajustar las barras
-    fig.update_traces(
-        texttemplate='%{text}',  # Mostrar Strike como texto
-        textposition='inside',   # Colocar texto dentro de la barra
-        insidetextanchor='middle',  # Centrar el texto
-        marker=dict(line=dict(color='black', width=1)),  # Añadir borde negro a las barras
-        textfont=dict(color='black')  # Color de texto siempre negro
+    fig.update_layout(
+        xaxis_title=None,
+        title_font_size=18,
+        height=500
     )
-
     return fig
 
+# Callback para la tabla de contratos del Gráfico 5: flujo por contrato del snapshot elegido
+@app.callback(
+    [Output('replay-contracts-title', 'children'),
+     Output('replay-contracts', 'data'),
+     Output('replay-contracts', 'columns')],
+    [Input('replay-slider', 'value'),
+     Input('selected-symbol-store', 'data')]
+)
+@instrument_callback
+def update_replay_contracts(position, selected_symbol):
+    if not len(replay_index):
+        return None, [], []
+    position = min(position or 0, len(replay_index) - 1)
+    contracts = replay_index.top_contracts(position, selected_symbol, REPLAY_CONTRACTS_N)
+    record_rows(len(replay_index.contract_flows[position]), len(contracts))
+    contracts = contracts.drop(columns='Snapshot Time')
+    contracts['Exp Date'] = contracts['Exp Date'].dt.strftime('%Y-%m-%d')
+    title = (f"Contratos con más Premium nuevo{f' de {selected_symbol}' if selected_symbol else ''} "
+             f"en el snapshot de {replay_index.times[position]:%Y-%m-%d %H:%M}")
+    columns = [{'name': column, 'id': column} for column in contracts.columns]
+    return title, contracts.to_dict('records'), columns
+
+# Callback para el screener (botón, Enter en la expresión o dataset nuevo)
+@app.callback(
+    [Output('screener-summary', 'children'),
+     Output('screener-table', 'data'),
+     Output('screener-table', 'columns')],
+    [Input('screener-run', 'n_clicks'),
+     Input('screener-query', 'n_submit'),
+     Input('dataset-version', 'data')],
+    State('screener-query', 'value')
+)
+@instrument_callback
+def update_screener(n_clicks, n_submit, dataset_version, query):
+    if not query:
+        return "Escribe condiciones separadas por coma y presiona Filtrar.", [], []
+    try:
+        result = get_screener().run(query)
+    except ScreenerError as error:
+        return f"Error en el screener: {error}", [], []
+    record_rows(result['total_rows'], len(result['rows']))
+    columns = [{'name': column, 'id': column} for column in (result['rows'][0] if result['rows'] else [])]
+    summary = (f"{result['matches']} de {result['total_rows']} contratos en {result['symbol_count']} Symbols "
+               f"({result['elapsed_ms']:.0f} ms); se muestran los {len(result['rows'])} de mayor Premium.")
+    return summary, result['rows'], columns
+
+# Callback para el panel de depuración (no se instrumenta: no cuenta en sus propias métricas)
+@app.callback(
+    Output('metrics-panel', 'children'),
+    Input('metrics-poll', 'n_intervals')
+)
+def update_metrics_panel(n_intervals):
+    return f"{metrics.summary()}\n\n{figure_cache.summary()}"
 
 
-
-
-
-
-
-
-
+startup.mark("layout y callbacks")
 
 
 # Ejecutar la aplicación
 if __name__ == "__main__":
-    print("Iniciando servidor Dash...")
-    app.run_server(debug=False)
+    start_watcher(file_path, initial_load=FAST_START)
+    logger.info(f"Iniciando servidor Dash ({startup.total():.2f} s desde el inicio)...")
+    app.run(debug=False)
 
@@ -0,0 +1,64 @@
+// Callbacks que se ejecutan en el navegador (Dash los carga desde scripts/assets)
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    uoa: {
+        // Symbols seleccionados que no están en el Top-N ni se pidieron ya al servidor
+        graph1_missing: function (selectedSymbols, graph1Data, graph1Extra) {
+            if (!graph1Data || !selectedSymbols || !selectedSymbols.length) {
+                return window.dash_clientside.no_update;
+            }
+            var known = new Set(graph1Data.symbols);
+            if (graph1Extra) {
+                graph1Extra.symbols.forEach(function (symbol) { known.add(symbol); });
+                graph1Extra.requested.forEach(function (symbol) { known.add(symbol); });
+            }
+            var missing = selectedSymbols.filter(function (symbol) { return !known.has(symbol); });
+            return missing.length ? missing : window.dash_clientside.no_update;
+        },
+
+        // Gráfico 1: Top-N con barra "Others", o los Symbols seleccionados ordenados por Premium
+        graph1_figure: function (selectedSymbols, graph1Data, graph1Extra) {
+            if (!graph1Data) {
+                return window.dash_clientside.no_update;
+            }
+            var figure = graph1Data.figure;
+            if (!graph1Data.symbols.length) {
+                return figure;
+            }
+
+            var symbols = graph1Data.symbols.slice();
+            var premium = graph1Data.premium.slice();
+            var colors = null;
+            if (selectedSymbols && selectedSymbols.length) {
+                if (graph1Extra) {
+                    symbols = symbols.concat(graph1Extra.symbols);
+                    premium = premium.concat(graph1Extra.premium);
+                }
+                var selected = new Set(selectedSymbols);
+                var rows = [];
+                for (var i = 0; i < symbols.length; i++) {
+                    if (selected.has(symbols[i])) {
+                        rows.push([symbols[i], premium[i]]);
+                        selected.delete(symbols[i]);
+                    }
+                }
+                rows.sort(function (a, b) { return b[1] - a[1]; });
+                symbols = rows.map(function (row) { return row[0]; });
+                premium = rows.map(function (row) { return row[1]; });
+            } else if (graph1Data.others.count) {
+                // Barra gris con la suma del resto de los Symbols
+                var barColor = figure.data[0].marker.color;
+                colors = symbols.map(function () { return barColor; }).concat(['lightgray']);
+                symbols.push(graph1Data.others.label);
+                premium.push(graph1Data.others.premium);
+            }
+
+            return {
+                data: figure.data.map(function (trace) {
+                    var marker = colors ? Object.assign({}, trace.marker, {color: colors}) : trace.marker;
+                    return Object.assign({}, trace, {x: symbols, y: premium, marker: marker});
+                }),
+                layout: figure.layout
+            };
+        }
+    }
+});
@@ -0,0 +1,26 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from UOA_mock_barchart import make_server
+
+
+@pytest.fixture
+def mock_barchart():
+    """Levanta mocks de Barchart en puertos libres: start(**opciones) devuelve la URL base."""
+    servers = []
+
+    def start(**options):
+        server = make_server(port=0, **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
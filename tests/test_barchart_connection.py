@@ -0,0 +1,152 @@
+import os
+import sys
+import threading
+from urllib.parse import urljoin
+
+import pytest
+import requests
+
+pytest.importorskip("selenium")
+pytest.importorskip("webdriver_manager")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from selenium.common.exceptions import NoSuchElementException
+import UOA_Barchart_Connection as connection
+from UOA_http_fetcher import find_download_url, load_cookies, save_cookies
+from UOA_mock_barchart import DEFAULT_CSV, FOOTER, SESSION_COOKIE
+
+
+class MockElement:
+    def __init__(self, browser, role, href=None):
+        self.browser = browser
+        self.role = role
+        self.href = href
+
+    def is_displayed(self):
+        return True
+
+    def send_keys(self, text):
+        self.browser.form[self.role] = text
+
+    def click(self):
+        if self.role == "submit":
+            self.browser.load(self.browser.session.post(urljoin(self.browser.current_url, "/login"),
+                                                        data=self.browser.form))
+        else:
+            download = threading.Thread(target=self.browser.download, args=(self.href,))
+            download.start()
+            self.browser.downloads.append(download)
+
+
+class MockBrowser:
+    """Chrome sobre requests: solo lo que usan login_to_barchart y download_data."""
+
+    def __init__(self, service=None, options=None):
+        self.download_folder = options.experimental_options["prefs"]["download.default_directory"]
+        self.session = requests.Session()
+        self.current_url = ""
+        self.page_source = ""
+        self.form = {}
+        self.downloads = []
+
+    def load(self, response):
+        self.current_url = response.url
+        self.page_source = response.text
+
+    def get(self, url):
+        self.load(self.session.get(url))
+
+    def find_elements(self, by, value):
+        return []
+
+    def find_element(self, by, value):
+        if "download" in value:
+            href = find_download_url(self.current_url, self.page_source)
+            if href is None:
+                raise NoSuchElementException(value)
+            return MockElement(self, "download", href)
+        if "Login with email" not in self.page_source:
+            raise NoSuchElementException(value)
+        if "Log In" in value:
+            return MockElement(self, "submit")
+        return MockElement(self, "email" if "email" in value else "password")
+
+    def execute_script(self, script, *args):
+        if "readyState" in script:
+            return "complete"
+        args[0].click()
+
+    def download(self, url):
+        # Como Chrome: escribe el .crdownload y al terminar lo renombra al nombre final
+        final_path = os.path.join(self.download_folder, os.path.basename(url))
+        with open(final_path + ".crdownload", 'wb') as file:
+            file.write(self.session.get(url).content)
+        os.replace(final_path + ".crdownload", final_path)
+
+    def get_cookies(self):
+        return [{"name": cookie.name, "value": cookie.value, "domain": cookie.domain, "path": cookie.path}
+                for cookie in self.session.cookies]
+
+    def quit(self):
+        for download in self.downloads:
+            download.join()
+        self.session.close()
+
+
+class MockDriverManager:
+    def install(self):
+        return "chromedriver"
+
+
+@pytest.fixture
+def barchart(mock_barchart, monkeypatch, tmp_path):
+    """Conexión apuntando al mock, con las carpetas de descarga en tmp_path; devuelve los datasets."""
+    base_url = mock_barchart()
+    download_folder = str(tmp_path / "downloads")
+    os.makedirs(download_folder)
+    monkeypatch.setattr(connection, "base_url", base_url)
+    monkeypatch.setattr(connection, "download_folder", download_folder)
+    monkeypatch.setattr(connection, "metrics_file", os.path.join(download_folder, "download_metrics.jsonl"))
+    monkeypatch.setattr(connection, "cookies_file", os.path.join(download_folder, "barchart_cookies.json"))
+    monkeypatch.setattr(connection, "http_folder", os.path.join(download_folder, "http"))
+    monkeypatch.setattr(connection, "chrome_options", connection.build_chrome_options(download_folder))
+    monkeypatch.setattr(connection.webdriver, "Chrome", MockBrowser)
+    monkeypatch.setattr(connection, "ChromeDriverManager", MockDriverManager)
+    monkeypatch.setattr(connection, "Service", lambda path: None)
+    return {name: f"{base_url}/options/unusual-activity/{name.lower()}" for name in ("Stocks", "ETFs", "Indices")}
+
+
+def expected_csv():
+    with open(DEFAULT_CSV, 'rb') as file:
+        return file.read() + FOOTER.encode("utf-8")
+
+
+def test_download_datasets_with_a_pool_of_sessions(barchart):
+    paths, timings = connection.download_datasets(barchart, sessions=2)
+
+    assert set(paths) == set(barchart)
+    assert "login" in timings
+    for name, path in paths.items():
+        # Cada sesión descarga en su propia carpeta
+        assert os.path.basename(os.path.dirname(path)).startswith("session_")
+        assert os.path.basename(path) == f"{name}.csv"
+        with open(path, 'rb') as file:
+            assert file.read() == expected_csv()
+    assert set(connection.download_metrics) >= {f"{name}.csv" for name in barchart}
+
+
+def test_expired_cookies_are_dropped_and_the_next_run_logs_in(barchart):
+    save_cookies([{"name": SESSION_COOKIE, "value": "expired", "path": "/"}], connection.cookies_file)
+
+    paths, _ = connection.fetch_with_http(barchart)
+    assert paths == {name: None for name in barchart}
+    assert not os.path.exists(connection.cookies_file)
+
+    # Sin cookies se inicia sesión con el navegador, se guardan y la descarga HTTP funciona
+    paths, _ = connection.fetch_with_http(barchart)
+    assert [cookie["name"] for cookie in load_cookies(connection.cookies_file)] == [SESSION_COOKIE]
+    for name, path in paths.items():
+        assert path == os.path.join(connection.http_folder, f"{name}.csv")
+        with open(path, 'rb') as file:
+            assert file.read() == expected_csv()
@@ -0,0 +1,42 @@
+import os
+import sys
+import shutil
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from UOA_dataset import load_dataset, refresh_dataset, MODE_COMBINED
+
+DATA_FOLDER = os.path.join(os.path.dirname(__file__), "..", "data", "UOAdataToVisualize")
+COMBINED_FILES = ["UOA_Combined_20241221_095007.csv", "UOA_Combined_20241221_100856.csv"]
+
+
+def test_legacy_combined_files_get_their_own_version(tmp_path):
+    # Consolidados sin manifiesto: la versión sale del archivo, no de una lista de orígenes vacía
+    versions = set()
+    for name in COMBINED_FILES:
+        path = shutil.copy(os.path.join(DATA_FOLDER, name), tmp_path / name)
+        dataset = load_dataset(str(path), cache_folder=None)
+        assert dataset.mode == MODE_COMBINED
+        versions.add(dataset.version)
+    assert len(versions) == len(COMBINED_FILES)
+
+
+def test_combined_refresh_only_rereads_the_combined_file(tmp_path):
+    combined_file = str(tmp_path / "UOA_Combined.csv")
+    shutil.copy(os.path.join(DATA_FOLDER, COMBINED_FILES[0]), combined_file)
+    cache_folder = str(tmp_path / "cache")
+    dataset = load_dataset(combined_file, cache_folder)
+
+    # Un snapshot nuevo en la carpeta no se mezcla con el consolidado
+    shutil.copy(os.path.join(DATA_FOLDER, "UOA_20241221_092407.csv"), tmp_path)
+    assert refresh_dataset(combined_file, dataset, cache_folder) is None
+
+    # Volver a consolidar cambia el archivo: se relee completo
+    shutil.copy(os.path.join(DATA_FOLDER, COMBINED_FILES[1]), combined_file)
+    refreshed = refresh_dataset(combined_file, dataset, cache_folder)
+    assert refreshed is not None and refreshed.version != dataset.version
+    assert len(refreshed.data) == len(load_dataset(combined_file, cache_folder=None).data)
+    assert refresh_dataset(combined_file, refreshed, cache_folder) is None
+
+    # Desde el cache binario la versión coincide con la del archivo actual
+    assert load_dataset(combined_file, cache_folder).version == refreshed.version
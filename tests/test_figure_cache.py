@@ -0,0 +1,40 @@
+import os
+import sys
+
+import plotly.graph_objects as go
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from UOA_figure_cache import FigureCache
+
+
+def bar_figure(values):
+    return go.Figure(go.Bar(x=list(range(len(values))), y=values))
+
+
+def test_hit_returns_the_stored_figure_without_rebuilding():
+    cache = FigureCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return bar_figure([1, 2, 3])
+
+    figure = cache.get_or_build(('v1', 'SPY', None, None), build)
+    assert figure['data'][0]['y'] == [1, 2, 3]
+    assert cache.get_or_build(('v1', 'SPY', None, None), build) is figure
+    assert (len(builds), cache.hits, cache.misses) == (1, 1, 1)
+    assert cache.current_bytes == len(bar_figure([1, 2, 3]).to_json())
+
+
+def test_size_limit_and_version_change_evict_figures():
+    size = len(bar_figure([1]).to_json())
+    cache = FigureCache(max_bytes=2 * size)
+    for symbol in ('SPY', 'QQQ', 'IWM'):
+        cache.get_or_build(('v1', symbol, None, None), lambda: bar_figure([1]))
+    assert (len(cache), cache.evictions, cache.current_bytes) == (2, 1, 2 * size)
+    assert cache.get(('v1', 'SPY', None, None)) is None
+
+    # Una versión nueva del dataset descarta todas las figuras anteriores
+    assert cache.get(('v2', 'QQQ', None, None)) is None
+    assert (len(cache), cache.current_bytes) == (0, 0)
@@ -0,0 +1,75 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from UOA_file_selector import consolidate_files, read_consolidated
+
+COLUMNS = ['Symbol', 'Price~', 'Type', 'Strike', 'Exp Date', 'DTE', 'Bid', 'Mid', 'Ask', 'Last',
+           'Volume', 'Open Int', 'Vol/OI', 'IV', 'Delta', 'Time']
+
+
+def snapshot(tmp_path, name, rows):
+    """CSV de un snapshot con filas (Symbol, Type, Strike, Volume, Price~)."""
+    data = pd.DataFrame([{
+        'Symbol': symbol, 'Price~': price, 'Type': option_type, 'Strike': strike, 'Exp Date': '2025-01-17',
+        'DTE': 30, 'Bid': 1.0, 'Mid': 1.1, 'Ask': 1.2, 'Last': 1.1, 'Volume': volume, 'Open Int': 100,
+        'Vol/OI': volume / 100, 'IV': '30.00%', 'Delta': 0.5, 'Time': '2024-12-20',
+    } for symbol, option_type, strike, volume, price in rows], columns=COLUMNS)
+    path = str(tmp_path / name)
+    data.to_csv(path, index=False)
+    return path
+
+
+def snapshots(tmp_path):
+    return [
+        snapshot(tmp_path, "UOA_1.csv", [('SPY', 'Call', 600, 1000, 590.0), ('QQQ', 'Put', 500, 2000, 510.0)]),
+        # SPY sin cambios en el fill (solo el precio), QQQ con más volumen y un contrato nuevo
+        snapshot(tmp_path, "UOA_2.csv", [('SPY', 'Call', 600, 1000, 591.0), ('QQQ', 'Put', 500, 2500, 511.0),
+                                         ('IWM', 'Call', 230, 700, 225.0)]),
+        # IWM cambia y luego vuelve a aparecer igual en el mismo archivo
+        snapshot(tmp_path, "UOA_3.csv", [('IWM', 'Call', 230, 900, 226.0), ('IWM', 'Call', 230, 900, 226.0)]),
+    ]
+
+
+@pytest.mark.parametrize("keep", ['last', 'first'])
+def test_batch_consolidation_matches_one_file_at_a_time(tmp_path, keep):
+    files = snapshots(tmp_path)
+    batch = consolidate_files(files, str(tmp_path / "batch" / "UOA_Combined.csv"), keep)
+    one_by_one = str(tmp_path / "one" / "UOA_Combined.csv")
+    for file_path in files:
+        consolidate_files([file_path], one_by_one, keep)
+
+    with open(batch) as batch_file, open(one_by_one) as one_file:
+        assert batch_file.read() == one_file.read()
+
+    combined = read_consolidated(batch, keep).set_index('Symbol')
+    assert len(combined) == 3
+    if keep == 'last':
+        assert combined.loc['QQQ', 'Volume'] == 2500 and combined.loc['IWM', 'Volume'] == 900
+        # Cambios solo de precio no agregan filas
+        assert len(pd.read_csv(batch)) == 5
+    else:
+        assert combined.loc['QQQ', 'Volume'] == 2000 and combined.loc['IWM', 'Volume'] == 700
+
+
+def test_consolidated_files_are_skipped(tmp_path):
+    files = snapshots(tmp_path)
+    output_file = str(tmp_path / "UOA_Combined.csv")
+    consolidate_files(files[:2], output_file)
+    rows = len(pd.read_csv(output_file))
+    consolidate_files(files, output_file)
+    consolidate_files(files, output_file)
+    assert len(pd.read_csv(output_file)) == rows + 1
+
+
+def test_keep_policy_cannot_change(tmp_path):
+    files = snapshots(tmp_path)
+    output_file = str(tmp_path / "UOA_Combined.csv")
+    consolidate_files(files[:1], output_file, keep='first')
+    with pytest.raises(ValueError):
+        consolidate_files(files[1:], output_file, keep='last')
+    consolidate_files(files[1:], output_file, keep='first')
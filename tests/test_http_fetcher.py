@@ -0,0 +1,53 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from UOA_http_fetcher import create_http_session, fetch_datasets
+from UOA_mock_barchart import DEFAULT_CSV, FOOTER, SESSION_COOKIE, SESSION_ID
+
+
+def dataset_urls(base_url):
+    return {name: f"{base_url}/options/unusual-activity/{name.lower()}" for name in ("Stocks", "ETFs", "Indices")}
+
+
+def session_with(value):
+    return create_http_session([{"name": SESSION_COOKIE, "value": value}], "pytest")
+
+
+def test_fetch_datasets_downloads_every_dataset(mock_barchart, tmp_path):
+    datasets = dataset_urls(mock_barchart())
+    with session_with(SESSION_ID) as session:
+        paths, timings, session_expired = fetch_datasets(session, datasets, str(tmp_path))
+
+    assert not session_expired
+    assert set(paths) == set(timings) == set(datasets)
+    with open(DEFAULT_CSV, 'rb') as file:
+        expected = file.read() + FOOTER.encode("utf-8")
+    for name, path in paths.items():
+        assert path == os.path.join(str(tmp_path), f"{name}.csv")
+        with open(path, 'rb') as file:
+            assert file.read() == expected
+    assert sorted(os.listdir(tmp_path)) == sorted(f"{name}.csv" for name in datasets)
+
+
+def test_expired_session_is_reported(mock_barchart, tmp_path):
+    datasets = dataset_urls(mock_barchart())
+    with session_with("expired") as session:
+        paths, _, session_expired = fetch_datasets(session, datasets, str(tmp_path))
+
+    # Barchart redirige al login: nada se descarga y el llamador vuelve a iniciar sesión
+    assert session_expired
+    assert paths == {name: None for name in datasets}
+    assert os.listdir(tmp_path) == []
+
+
+def test_interrupted_download_leaves_no_partial_file(mock_barchart, tmp_path):
+    datasets = dataset_urls(mock_barchart(cut_after=1000))
+    with session_with(SESSION_ID) as session:
+        paths, _, session_expired = fetch_datasets(session, datasets, str(tmp_path))
+
+    assert not session_expired
+    assert paths == {name: None for name in datasets}
+    # Ni el .part ni un .csv truncado quedan en la carpeta
+    assert os.listdir(tmp_path) == []
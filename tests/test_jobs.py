@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from UOA_jobs import JobStore
+from UOA_metrics import MetricsRegistry, record_rows
+
+
+def wait_done(store, key, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = store.get(key)
+        if job is not None and job.done():
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"El trabajo {key} no terminó")
+
+
+def build_figures(job):
+    job.report(0.5, "mitad")
+    return {'Call': {'data': [1, 2]}, 'Put': {'data': [3]}, 'pid': os.getpid()}
+
+
+def test_job_result_is_shared_between_workers(tmp_path):
+    # Dos JobStore sobre la misma carpeta = dos workers de gunicorn
+    worker_a = JobStore(str(tmp_path))
+    worker_b = JobStore(str(tmp_path))
+    key = (1, 'SPY', 'Dec', 2024)
+
+    job = worker_a.submit(key, build_figures)
+    assert not job.done()
+    # El otro worker encuentra el mismo trabajo en lugar de lanzar otro
+    assert worker_b.submit(key, build_figures).started == job.started
+
+    finished = wait_done(worker_b, key)
+    assert not finished.failed()
+    result = worker_b.result(key)
+    assert result['Call'] == {'data': [1, 2]}
+    # Se calculó en un proceso hijo, no en el hilo del pedido
+    assert result['pid'] != os.getpid()
+    assert worker_a.submitted == 1
+    assert worker_a.deduplicated == 1
+    assert worker_b.running() == 0
+
+
+def test_failed_job_only_reruns_with_retry(tmp_path):
+    store = JobStore(str(tmp_path))
+    key = (1, 'QQQ', 'Jan', 2025)
+
+    def fail(job):
+        raise ValueError("sin datos")
+
+    store.submit(key, fail)
+    job = wait_done(store, key)
+    assert job.failed()
+    assert "sin datos" in job.error
+    assert store.result(key) is None
+
+    assert store.submit(key, build_figures).failed()
+    store.submit(key, build_figures, retry=True)
+    assert not wait_done(store, key).failed()
+    assert store.result(key)['Put'] == {'data': [3]}
+    assert store.submitted == 2
+
+
+def test_crashed_job_process_is_marked_failed(tmp_path):
+    store = JobStore(str(tmp_path))
+    key = (1, 'IWM', 'Feb', 2025)
+    store.submit(key, lambda job: os._exit(3))
+    job = wait_done(store, key)
+    assert job.failed()
+    assert "código 3" in job.error
+
+
+def test_job_duration_and_rows_go_to_the_metrics(tmp_path):
+    registry = MetricsRegistry()
+    store = JobStore(str(tmp_path), registry=registry)
+    key = (1, 'DIA', 'Mar', 2025)
+
+    def scan(job):
+        record_rows(1000, 20)
+        return {}
+
+    store.submit(key, scan, name='pareto_job')
+    wait_done(store, key)
+    # La métrica la registra el worker cuando termina el proceso hijo
+    deadline = time.time() + 20
+    while registry.stats('pareto_job').calls == 0 and time.time() < deadline:
+        time.sleep(0.05)
+    stats = registry.stats('pareto_job')
+    assert (stats.calls, stats.errors, stats.rows_scanned, stats.rows_returned) == (1, 0, 1000, 20)
+    assert stats.seconds > 0
@@ -0,0 +1,100 @@
+import os
+import sys
+import subprocess
+import pytest
+from flask import Flask
+from dash.exceptions import PreventUpdate
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from UOA_metrics import MetricsRegistry, instrument_callback, record_rows, register_metrics_route
+
+
+def test_prevent_update_is_not_an_error():
+    registry = MetricsRegistry()
+
+    @instrument_callback(registry=registry)
+    def skip():
+        raise PreventUpdate
+
+    @instrument_callback(registry=registry)
+    def fail():
+        raise ValueError("sin datos")
+
+    with pytest.raises(PreventUpdate):
+        skip()
+    with pytest.raises(ValueError):
+        fail()
+
+    assert registry.stats("skip").calls == 1
+    assert registry.stats("skip").errors == 0
+    assert registry.stats("fail").errors == 1
+
+
+def test_rows_are_recorded_per_call():
+    registry = MetricsRegistry()
+
+    @instrument_callback(registry=registry)
+    def rows():
+        record_rows(100, 5)
+        return {}
+
+    rows()
+    rows()
+    stats = registry.stats("rows")
+    assert (stats.calls, stats.rows_scanned, stats.rows_returned) == (2, 200, 10)
+
+
+def test_payload_bytes_are_measured_from_the_response():
+    registry = MetricsRegistry()
+    server = Flask(__name__)
+    register_metrics_route(server, registry=registry)
+
+    @server.route("/_dash-update-component", methods=["POST"])
+    @instrument_callback(name="graph", registry=registry)
+    def graph():
+        return {"figure": {"data": [1, 2, 3]}}
+
+    response = server.test_client().post("/_dash-update-component")
+    assert registry.stats("graph").payload_bytes == len(response.data)
+    metrics_text = server.test_client().get("/metrics").get_data(as_text=True)
+    assert f'uoa_callback_payload_bytes_total{{callback="graph"}} {float(len(response.data))}' in metrics_text
+
+
+# Cada worker de gunicorn es un fork que escribe sus métricas en PROMETHEUS_MULTIPROC_DIR
+WORKERS_SCRIPT = """
+import os
+import sys
+sys.path.insert(0, {scripts!r})
+from UOA_metrics import metrics, instrument_callback, record_rows
+
+cache_hits = [0]
+metrics.add_gauge("uoa_figure_cache_hits_total", "Hits.", lambda: cache_hits[0], "counter", combine="sum")
+metrics.add_gauge("uoa_dataset_rows", "Filas.", lambda: 7)
+
+@instrument_callback
+def update_graph():
+    record_rows(10, 2)
+    cache_hits[0] += 1
+
+for worker in range(3):
+    pid = os.fork()
+    if pid == 0:
+        update_graph()
+        update_graph()
+        os._exit(0)
+    os.waitpid(pid, 0)
+print(metrics.prometheus_text())
+"""
+
+
+def test_metrics_are_summed_across_worker_processes(tmp_path):
+    scripts = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    output = subprocess.run([sys.executable, "-c", WORKERS_SCRIPT.format(scripts=scripts)], env=env,
+                            capture_output=True, text=True, check=True).stdout
+    assert 'uoa_callback_calls_total{callback="update_graph"} 6.0' in output
+    assert 'uoa_callback_rows_scanned_total{callback="update_graph"} 60.0' in output
+    assert 'uoa_callback_duration_seconds_count{callback="update_graph"} 6.0' in output
+    assert "uoa_figure_cache_hits_total 6.0" in output
+    assert "uoa_dataset_rows 7.0" in output
@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import shutil
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from UOA_replay import ReplayIndex
+import UOA_dataset
+
+DATA_FOLDER = os.path.join(os.path.dirname(__file__), "..", "data", "UOAdataToVisualize")
+SNAPSHOTS = ["UOA_20241220_160857.csv", "UOA_20241220_165323.csv", "UOA_20241220_182548.csv",
+             "UOA_20241221_090137.csv", "UOA_20241221_090454.csv"]
+
+
+def copy_snapshots(folder, names):
+    for name in names:
+        shutil.copy(os.path.join(DATA_FOLDER, name), folder)
+    return os.path.join(folder, names[0])
+
+
+def test_incremental_refresh_matches_a_full_rebuild(tmp_path):
+    incremental_folder = tmp_path / "incremental"
+    full_folder = tmp_path / "full"
+    incremental_folder.mkdir()
+    full_folder.mkdir()
+
+    incremental = ReplayIndex(copy_snapshots(incremental_folder, SNAPSHOTS[:2]))
+    assert incremental.refresh() == 2
+    copy_snapshots(incremental_folder, SNAPSHOTS[2:])
+    assert incremental.refresh() == 3
+    assert incremental.refresh() == 0
+
+    full = ReplayIndex(copy_snapshots(full_folder, SNAPSHOTS))
+    full.refresh()
+    assert incremental.times == full.times
+    assert len(incremental.contract_flows) == len(SNAPSHOTS)
+    for position in range(len(SNAPSHOTS)):
+        expected = full.top_symbols(position, 10)
+        actual = incremental.top_symbols(position, 10)
+        assert list(actual.index) == list(expected.index)
+        assert np.allclose(actual.to_numpy(), expected.to_numpy())
+
+    # El acumulado se reinicia al cambiar de día
+    first_day = incremental.top_symbols(2, 1)
+    flow = incremental.symbol_flow(first_day.index[0], 4)
+    assert (flow['Snapshot Time'].dt.date == incremental.times[4].date()).all()
+    assert np.isclose(flow['Premium Delta'].sum(), flow['Premium Acumulado'].iloc[-1])
+
+
+def test_top_contracts_are_the_snapshot_flow_per_contract(tmp_path):
+    index = ReplayIndex(copy_snapshots(tmp_path, SNAPSHOTS[:2]))
+    index.refresh()
+    contracts = index.top_contracts(1, n=5)
+    assert len(contracts) <= 5
+    assert contracts['Premium Delta'].is_monotonic_decreasing
+    symbol = contracts['Symbol'].iloc[0]
+    assert (index.top_contracts(1, symbol)['Symbol'] == symbol).all()
+    # Premium nuevo por Symbol = suma de sus contratos
+    flows = index.contract_flows[1]
+    symbol_premium = flows.loc[flows['Symbol'] == symbol, 'Premium Delta'].sum()
+    assert np.isclose(index.symbol_flow(symbol, 1)['Premium Delta'].iloc[-1], symbol_premium)
+
+
+def test_watcher_refreshes_the_replay_before_publishing(tmp_path):
+    file_path = copy_snapshots(tmp_path, SNAPSHOTS[:1])
+    UOA_dataset.set_dataset(UOA_dataset.load_dataset(file_path, cache_folder=None))
+    index = ReplayIndex(file_path)
+    index.refresh()
+    seen = []
+    UOA_dataset.on_refresh(index.refresh)
+    UOA_dataset.on_refresh(lambda: seen.append(len(index)))
+    watcher = UOA_dataset.DatasetWatcher(file_path, interval=0.1)
+    try:
+        watcher.start()
+        copy_snapshots(tmp_path, SNAPSHOTS[1:2])
+        deadline = time.time() + 20
+        while len(index) < 2 and time.time() < deadline:
+            time.sleep(0.05)
+        assert len(index) == 2
+    finally:
+        watcher.stop()
+        watcher.join()
+        UOA_dataset._refresh_hooks.clear()
+    assert seen and seen[-1] == 2
@@ -0,0 +1,27 @@
+import logging
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from UOA_schema import compact_frame, to_compact_int
+
+SNAPSHOT_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "UOAdataToVisualize", "UOA_20241220_160857.csv")
+
+
+def test_integer_columns_have_one_dtype_with_or_without_missing_values():
+    complete = to_compact_int(pd.Series(['1', '2', '3']))
+    missing = to_compact_int(pd.Series(['1', '', None]))
+    assert complete.dtype == missing.dtype == 'Int32'
+    assert missing.isna().tolist() == [False, True, True]
+
+
+def test_memory_report_is_logged_at_info(caplog):
+    data = pd.read_csv(SNAPSHOT_FILE, thousands=',')
+    with caplog.at_level(logging.INFO, logger="uoa"):
+        data = compact_frame(data, source="snapshot")
+    assert data['Volume'].dtype == 'Int32'
+    assert any(record.levelno == logging.INFO and "Memoria snapshot" in record.getMessage()
+               for record in caplog.records)
@@ -0,0 +1,49 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from UOA_dataset import load_dataset
+from UOA_screener import Screener, ScreenerError, parse_query
+
+SNAPSHOT_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "UOAdataToVisualize", "UOA_20241220_160857.csv")
+
+
+@pytest.fixture(scope="module")
+def screener():
+    return Screener(load_dataset(SNAPSHOT_FILE, cache_folder=None))
+
+
+def test_clauses_split_on_commas_but_not_on_thousands_separators():
+    assert parse_query("premium > $1,000,000, DTE < 14; calls only and vol/oi>=2.5") == [
+        ('Premium', '>', ('$1,000,000',)),
+        ('DTE', '<', ('14',)),
+        ('Type', '=', ('Call',)),
+        ('Vol/OI', '>=', ('2.5',)),
+    ]
+    assert parse_query("DTE<14,strike = 1,500|1,600") == [('DTE', '<', ('14',)), ('Strike', '=', ('1,500', '1,600'))]
+    with pytest.raises(ScreenerError):
+        parse_query("gamma > 1")
+
+
+def test_numeric_filters(screener):
+    data = screener.data
+    result = screener.run("premium > $1,000,000, puts", limit=5)
+    assert result['matches'] == int(((data['Premium'] > 1e6) & (data['Type'] == 'Put')).sum()) > 0
+    assert len(result['rows']) == 5
+    assert all(row['Premium'] > 1e6 and row['Type'] == 'Put' for row in result['rows'])
+
+
+def test_equality_on_float32_columns(screener):
+    data = screener.data
+    assert data['Price~'].dtype == np.float32 and data['IV'].dtype == np.float32
+    # El valor tal como lo escribe el usuario: 428.4, 0.152 o 15.2%
+    price, iv = data['Price~'].iloc[0], data['IV'].iloc[0]
+    assert screener.run(f"price = {price}")['matches'] == int((data['Price~'] == price).sum()) > 0
+    assert screener.run(f"iv = {iv * 100:.2f}%")['matches'] == int((data['IV'] == iv).sum()) > 0
+    assert screener.run(f"price != {price}")['matches'] == int((data['Price~'] != price).sum())
+    # Los mismos valores no cuentan como mayores
+    assert screener.run(f"price > {price}")['matches'] == int((data['Price~'] > price).sum())
@@ -0,0 +1,37 @@
+import os
+import sys
+from datetime import datetime
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from UOA_snapshot_store import SnapshotWriter, write_snapshot, read_snapshots, list_snapshots
+
+SAMPLE_CSV = os.path.join(os.path.dirname(__file__), "..", "data", "UOAdataToVisualize", "UOA_20241220_160857.csv")
+
+
+def sample_rows(rows=200):
+    return pd.read_csv(SAMPLE_CSV, thousands=',', nrows=rows)
+
+
+def test_read_store_while_writer_is_open(tmp_path):
+    store_folder = str(tmp_path)
+    published_time = datetime(2024, 12, 20, 16, 8, 57)
+    write_snapshot(sample_rows(), published_time, store_folder)
+
+    # Snapshot de la misma partición a medio escribir: el archivo temporal ya existe en disco
+    writer = SnapshotWriter(datetime(2024, 12, 20, 17, 0, 0), store_folder)
+    with writer:
+        writer.write(sample_rows(50))
+        assert os.path.exists(writer.temp_file)
+        assert os.path.dirname(writer.temp_file) == os.path.dirname(writer.output_file)
+
+        assert list_snapshots(store_folder) == [published_time]
+        data = read_snapshots(store_folder=store_folder)
+        assert len(data) == 200
+        assert (data['Snapshot Time'] == pd.Timestamp(published_time)).all()
+
+    assert not os.path.exists(writer.temp_file)
+    assert list_snapshots(store_folder) == [published_time, writer.snapshot_time]
+    assert len(read_snapshots(store_folder=store_folder)) == 250
+    assert len(read_snapshots(snapshot_time=writer.snapshot_time, store_folder=store_folder)) == 50